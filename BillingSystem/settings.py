@@ -143,6 +143,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 TIME_ZONE = "Asia/Karachi"
 USE_TZ = True
 
+# Stock movements older than this many whole months are moved to the archive
+# by `manage.py compact_movements`; reports read monthly summaries for them.
+STOCK_MOVEMENT_HOT_MONTHS = config('STOCK_MOVEMENT_HOT_MONTHS', cast=int, default=12)
+
+# Items whose forecast days of cover drop below this are flagged as low stock.
+FORECAST_REORDER_DAYS = config('FORECAST_REORDER_DAYS', cast=int, default=7)
+
 LOGIN_URL = "/accounts/login/"
 LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/accounts/login/"
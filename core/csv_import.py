@@ -0,0 +1,32 @@
+"""
+Helpers shared by the CSV bulk imports (stock, cycle counts, supplier payments).
+"""
+import csv
+import io
+
+# What a CSV upload can raise before any row is validated
+READ_ERRORS = (csv.Error, UnicodeDecodeError)
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []  # (line number, message)
+
+    def add_error(self, line, message):
+        self.errors.append((line, message))
+
+
+def normalize_key(val):
+    """Lookup key for names and codes typed into a CSV: whitespace collapsed, lower case."""
+    return " ".join((val or "").split()).lower()
+
+
+def read_csv(fileobj):
+    """Yield (line number, row dict) from a binary or text CSV file object."""
+    data = fileobj.read()
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    reader = csv.DictReader(io.StringIO(data))
+    for row in reader:
+        yield reader.line_num, {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
@@ -2,16 +2,69 @@ from django.contrib import admin
 
 # Register your models here.
 
-from .models import InventoryItem, UnitOfMeasure, InventoryCategory, InventoryBaseItem, StockMovement
+from .models import (
+    InventoryItem, UnitOfMeasure, UnitConversion, InventoryCategory, InventoryBaseItem, StockMovement,
+    StockMovementArchive, StockMovementCube, CountSession, CountLine, AssetMovement,
+    RentalBooking, StockLocation, StockBalance,
+)
 
 @admin.register(InventoryItem)
 class InventoryItemAdmin(admin.ModelAdmin):
-    list_display = ("stock_code", "name", "quantity", "min_quantity", "payment_method", "supplier_name")
+    list_display = ("stock_code", "name", "quantity", "min_quantity", "payment_method", "supplier_name", "supplier")
     list_filter = ("payment_method", "category", "uom")
-    search_fields = ("name", "stock_code", "supplier_name")
+    search_fields = ("name", "stock_code", "barcode", "supplier_name")
+    raw_id_fields = ("base_item", "supplier")
 
 
 admin.site.register(UnitOfMeasure)
+admin.site.register(UnitConversion)
 admin.site.register(InventoryCategory)
 admin.site.register(InventoryBaseItem)
 admin.site.register(StockMovement)
+admin.site.register(StockMovementArchive)
+
+
+@admin.register(StockMovementCube)
+class StockMovementCubeAdmin(admin.ModelAdmin):
+    list_display = ("inventory_item", "month", "movement_type", "quantity", "cost", "movement_count")
+    list_filter = ("movement_type", "month")
+    raw_id_fields = ("inventory_item",)
+
+
+class CountLineInline(admin.TabularInline):
+    model = CountLine
+    extra = 0
+    readonly_fields = ("applied_quantity",)
+
+
+@admin.register(CountSession)
+class CountSessionAdmin(admin.ModelAdmin):
+    list_display = ("name", "category", "status", "created_at", "committed_at")
+    list_filter = ("status",)
+    inlines = [CountLineInline]
+
+
+@admin.register(AssetMovement)
+class AssetMovementAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "base_item", "quantity", "from_bucket", "to_bucket", "event")
+    list_filter = ("from_bucket", "to_bucket")
+    search_fields = ("base_item__name", "event__title", "note")
+
+
+@admin.register(RentalBooking)
+class RentalBookingAdmin(admin.ModelAdmin):
+    list_display = ("inventory_item", "quantity", "start_date", "end_date", "event", "status")
+    list_filter = ("status",)
+    search_fields = ("inventory_item__name", "event__title")
+
+
+@admin.register(StockLocation)
+class StockLocationAdmin(admin.ModelAdmin):
+    list_display = ("name", "is_default", "is_active")
+
+
+@admin.register(StockBalance)
+class StockBalanceAdmin(admin.ModelAdmin):
+    list_display = ("inventory_item", "location", "quantity", "updated_at")
+    list_filter = ("location",)
+    search_fields = ("inventory_item__name", "inventory_item__stock_code")
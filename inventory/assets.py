@@ -0,0 +1,96 @@
+"""
+Moving catalog quantities between the stock buckets on InventoryBaseItem
+(qty_available, qty_reserved, qty_in_use, qty_damaged).
+
+A transition moves many items at once: the rows are locked, checked against
+the source bucket, updated with a single UPDATE (one CASE per bucket column)
+and logged with one bulk insert of AssetMovement rows.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, When, F, Value, DecimalField, Sum
+from django.utils import timezone
+
+from .models import InventoryBaseItem, AssetMovement
+
+BUCKET_FIELDS = {
+    AssetMovement.AVAILABLE: "qty_available",
+    AssetMovement.RESERVED: "qty_reserved",
+    AssetMovement.IN_USE: "qty_in_use",
+    AssetMovement.DAMAGED: "qty_damaged",
+}
+
+_QTY = DecimalField(max_digits=14, decimal_places=4)
+
+
+def transition(moves, event=None, note=""):
+    """
+    Apply [(base_item_id, from_bucket, to_bucket, quantity), ...] atomically.
+    Raises ValueError (nothing is changed) if any source bucket would go
+    negative. Returns the created AssetMovement rows.
+    """
+    deltas = {}  # (item_id, field) -> change
+    clean = []
+    for item_id, src, dst, qty in moves:
+        qty = Decimal(qty)
+        if qty <= 0:
+            continue
+        if src not in BUCKET_FIELDS or dst not in BUCKET_FIELDS or src == dst:
+            raise ValueError(f"Invalid transition {src} -> {dst}.")
+        deltas[(item_id, BUCKET_FIELDS[src])] = deltas.get((item_id, BUCKET_FIELDS[src]), Decimal("0")) - qty
+        deltas[(item_id, BUCKET_FIELDS[dst])] = deltas.get((item_id, BUCKET_FIELDS[dst]), Decimal("0")) + qty
+        clean.append((item_id, src, dst, qty))
+    if not clean:
+        return []
+
+    item_ids = {m[0] for m in clean}
+    with transaction.atomic():
+        items = {
+            i["id"]: i for i in InventoryBaseItem.objects.select_for_update()
+            .filter(id__in=item_ids).values("id", "name", *BUCKET_FIELDS.values())
+        }
+        missing = item_ids - items.keys()
+        if missing:
+            raise ValueError(f"Unknown catalog item(s): {', '.join(map(str, sorted(missing)))}.")
+        for (item_id, field), change in deltas.items():
+            if items[item_id][field] + change < 0:
+                raise ValueError(
+                    f"Not enough {items[item_id]['name']} in {field.replace('qty_', '').replace('_', ' ')} "
+                    f"(have {items[item_id][field].normalize():f}, need {(-change).normalize():f})."
+                )
+
+        updates = {}
+        for field in BUCKET_FIELDS.values():
+            whens = [When(id=item_id, then=F(field) + Value(change)) for (item_id, f), change in deltas.items() if f == field and change]
+            if whens:
+                updates[field] = Case(*whens, default=F(field), output_field=_QTY)
+        InventoryBaseItem.objects.filter(id__in=item_ids).update(**updates, updated_at=timezone.now())
+
+        return AssetMovement.objects.bulk_create([
+            AssetMovement(base_item_id=item_id, from_bucket=src, to_bucket=dst, quantity=qty, event=event, note=note)
+            for item_id, src, dst, qty in clean
+        ])
+
+
+def event_balances(event):
+    """
+    {base_item_id: {"out": qty currently in use for the event, "damaged": qty
+    returned damaged}} from the event's movement log.
+    """
+    rows = (
+        AssetMovement.objects.filter(event=event)
+        .values("base_item_id", "from_bucket", "to_bucket")
+        .annotate(qty=Sum("quantity"))
+        .order_by()
+    )
+    balances = {}
+    for r in rows:
+        b = balances.setdefault(r["base_item_id"], {"out": Decimal("0"), "damaged": Decimal("0")})
+        if r["to_bucket"] == AssetMovement.IN_USE:
+            b["out"] += r["qty"]
+        if r["from_bucket"] == AssetMovement.IN_USE:
+            b["out"] -= r["qty"]
+        if r["from_bucket"] == AssetMovement.IN_USE and r["to_bucket"] == AssetMovement.DAMAGED:
+            b["damaged"] += r["qty"]
+    return balances
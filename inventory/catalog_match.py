@@ -0,0 +1,123 @@
+"""
+Link InventoryItem stock rows to InventoryBaseItem catalog entries.
+
+Names are normalised (case, whitespace, punctuation) and bucketed by blocking
+keys (each word of 3+ letters, and the first four letters of the squashed
+name), so each stock row is only compared with the few catalog entries
+sharing a key instead of the whole catalog. Within a block an exact normalised match wins;
+otherwise the closest name above `threshold` is taken, preferring entries
+with the same unit of measure.
+
+Bulk runs build their own index; single stock forms use `cached_index`, which
+is kept in process until a catalog row changes.
+"""
+import re
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+from django.db import transaction
+from django.db.models import Count, Max
+
+from .models import InventoryItem, InventoryBaseItem
+
+DEFAULT_THRESHOLD = 0.9
+BATCH_SIZE = 1000
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+_cache = {"version": None, "index": None}
+
+
+def normalize_name(name):
+    return " ".join(_NON_WORD.sub(" ", (name or "").casefold()).split())
+
+
+def blocking_keys(normalized):
+    if not normalized:
+        return set()
+    keys = {"w:" + word for word in normalized.split() if len(word) > 2}
+    keys.add("p:" + normalized.replace(" ", "")[:4])
+    return keys
+
+
+class CatalogIndex:
+    def __init__(self, base_items):
+        self.exact = {}
+        self.blocks = defaultdict(list)
+        for base_id, name, uom_id in base_items:
+            norm = normalize_name(name)
+            if not norm:
+                continue
+            self.exact.setdefault((norm, uom_id), base_id)
+            self.exact.setdefault((norm, None), base_id)
+            for key in blocking_keys(norm):
+                self.blocks[key].append((base_id, norm, uom_id))
+
+    def match(self, name, uom_id=None, threshold=DEFAULT_THRESHOLD):
+        """Return the best catalog id for a stock name, or None."""
+        norm = normalize_name(name)
+        if not norm:
+            return None
+        exact = self.exact.get((norm, uom_id)) or self.exact.get((norm, None))
+        if exact:
+            return exact
+
+        best, best_score = None, threshold
+        seen = set()
+        for key in blocking_keys(norm):
+            for base_id, cand, cand_uom in self.blocks.get(key, ()):
+                if base_id in seen:
+                    continue
+                seen.add(base_id)
+                score = SequenceMatcher(None, norm, cand).ratio()
+                if cand_uom == uom_id:
+                    score += 0.01
+                if score >= best_score:
+                    best, best_score = base_id, score
+        return best
+
+
+def build_index():
+    return CatalogIndex(InventoryBaseItem.objects.filter(is_active=True).values_list("id", "name", "uom_id"))
+
+
+def cached_index():
+    """The catalog index, rebuilt only when catalog entries are added, changed or removed."""
+    stamp = InventoryBaseItem.objects.aggregate(n=Count("id"), updated=Max("updated_at"))
+    version = (stamp["n"], stamp["updated"])
+    if _cache["version"] != version:
+        _cache["index"] = build_index()
+        _cache["version"] = version
+    return _cache["index"]
+
+
+def link_stock_items(relink=False, threshold=DEFAULT_THRESHOLD, dry_run=False, batch_size=BATCH_SIZE):
+    """
+    Match stock rows to the catalog. Only unlinked rows are considered unless
+    `relink`. Returns (matched, unmatched) counts.
+    """
+    index = build_index()
+    qs = InventoryItem.objects.order_by("id")
+    if not relink:
+        qs = qs.filter(base_item__isnull=True)
+
+    matched = unmatched = 0
+    last_id = 0
+    while True:
+        rows = list(qs.filter(id__gt=last_id).values_list("id", "name", "uom_id", "base_item_id")[:batch_size])
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        changed = []
+        for item_id, name, uom_id, current in rows:
+            base_id = index.match(name, uom_id, threshold)
+            if base_id is None:
+                unmatched += 1
+                continue
+            matched += 1
+            if base_id != current:
+                changed.append(InventoryItem(id=item_id, base_item_id=base_id))
+        if changed and not dry_run:
+            with transaction.atomic():
+                InventoryItem.objects.bulk_update(changed, ["base_item"])
+    return matched, unmatched
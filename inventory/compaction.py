@@ -0,0 +1,87 @@
+"""
+Compaction of StockMovement history.
+
+Movements older than the hot horizon are copied to StockMovementArchive and
+removed from the hot table, one batch per transaction. Monthly totals come
+from the movement cube (see cube.py), which covers both tables; reports that
+list movements read the hot table for recent dates and `archived_totals` for
+anything older, so nothing is counted twice.
+"""
+from datetime import date
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import StockMovement, StockMovementArchive
+
+DEFAULT_BATCH_SIZE = 2000
+
+
+def month_start(d):
+    return d.replace(day=1)
+
+
+def add_months(d, months):
+    """Shift the first-of-month date `d` by `months` (may be negative)."""
+    index = d.year * 12 + (d.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def horizon_cutoff(months=None, today=None):
+    """First local day that stays in the hot table (whole months are archived)."""
+    if months is None:
+        months = getattr(settings, "STOCK_MOVEMENT_HOT_MONTHS", 12)
+    today = today or timezone.localdate()
+    return add_months(month_start(today), -months)
+
+
+def compact_movements(cutoff, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """
+    Archive every StockMovement created before local date `cutoff`.
+    Returns the number of movements moved.
+    """
+    old = StockMovement.objects.filter(business_date__lt=cutoff).order_by("id")
+    if dry_run:
+        return old.count()
+
+    moved = 0
+    # every column of the movement is kept, so valuation, location and
+    # wastage history can still be rebuilt from the archive
+    fields = [
+        "id", "inventory_item_id", "movement_type", "quantity", "unit_cost", "location_id", "to_location_id",
+        "reason", "event_id", "note", "created_at", "business_date",
+    ]
+    while True:
+        with transaction.atomic():
+            rows = list(old.values(*fields)[:batch_size])
+            if not rows:
+                break
+            StockMovementArchive.objects.bulk_create([
+                StockMovementArchive(original_id=r["id"], **{f: r[f] for f in fields if f != "id"})
+                for r in rows
+            ])
+            StockMovement.objects.filter(id__in=[r["id"] for r in rows]).delete()
+        moved += len(rows)
+    return moved
+
+
+def archived_totals(movement_type, start=None, end=None):
+    """
+    Per item and month quantity and movement count of archived movements of
+    one type with local dates in [start, end]: dicts with inventory_item_id,
+    month, quantity and movement_count.
+    """
+    qs = StockMovementArchive.objects.filter(movement_type=movement_type)
+    if start:
+        qs = qs.filter(business_date__gte=start)
+    if end:
+        qs = qs.filter(business_date__lte=end)
+    return (
+        qs.annotate(month=TruncMonth("business_date"))
+        .values("inventory_item_id", "month")
+        .annotate(quantity=Sum("quantity"), movement_count=Count("id"))
+        .order_by()
+    )
@@ -0,0 +1,253 @@
+"""
+Movement cube: stock movement totals by item x month x movement type.
+
+StockMovementCube is updated on every movement write (StockMovement.save and
+StockMovement.objects.bulk_create call `record`), so summary reports read a
+few rows per item and month instead of scanning movements. It is the only
+monthly rollup: compaction leaves it alone, so it covers hot and archived
+history alike. Raw movements are only read when a report drills down into one
+item and month.
+
+Cost is quantity x the movement's unit cost, or the item's price per unit
+when the movement has none (issues, adjustments).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, PositiveIntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncMonth
+
+from .compaction import add_months, month_start
+from .models import InventoryItem, StockMovement, StockMovementArchive, StockMovementCube
+
+ZERO = Decimal("0")
+USAGE_TYPES = (StockMovement.OUT,) + StockMovement.LOSS_TYPES
+# Effect of each movement type on the item's total quantity
+NET_SIGN = {
+    StockMovement.IN: 1,
+    StockMovement.OUT: -1,
+    StockMovement.ADJUST: 1,   # adjustment quantities are already signed
+    StockMovement.TRANSFER: 0,
+    StockMovement.WASTE: -1,
+    StockMovement.DAMAGE: -1,
+}
+
+_MONEY = DecimalField(max_digits=20, decimal_places=6)
+_QTY = DecimalField(max_digits=16, decimal_places=4)
+
+
+def _money(val):
+    return Decimal(val).quantize(Decimal("0.01"))
+
+
+def _add(field, cells, index, output_field):
+    """F(field) + the cell's delta, as one CASE over (item, type)."""
+    return F(field) + Case(
+        *[When(inventory_item_id=i, movement_type=t, then=Value(d[index])) for (i, t), d in cells.items()],
+        default=Value(0),
+        output_field=output_field,
+    )
+
+
+def _apply(deltas):
+    """
+    Add {(item_id, month, type): [qty, cost, count]} to the cube, race-free:
+    missing cells are inserted empty, then each month's cells get one UPDATE.
+    """
+    if not deltas:
+        return
+    by_month = defaultdict(dict)
+    for (item_id, month, mtype), (qty, cost, count) in deltas.items():
+        by_month[month][(item_id, mtype)] = (qty, _money(cost), count)
+    with transaction.atomic():
+        StockMovementCube.objects.bulk_create(
+            [StockMovementCube(inventory_item_id=i, month=m, movement_type=t) for i, m, t in deltas],
+            ignore_conflicts=True,
+        )
+        for month, cells in by_month.items():
+            StockMovementCube.objects.filter(
+                month=month, inventory_item_id__in={i for i, _ in cells}, movement_type__in={t for _, t in cells},
+            ).update(
+                quantity=_add("quantity", cells, 0, _QTY),
+                cost=_add("cost", cells, 1, _MONEY),
+                movement_count=_add("movement_count", cells, 2, PositiveIntegerField()),
+            )
+
+
+def record(movements):
+    """Fold newly written StockMovement objects into the cube."""
+    movements = [m for m in movements if m.quantity]
+    if not movements:
+        return
+    prices = {}
+    missing = {m.inventory_item_id for m in movements if m.unit_cost is None}
+    if missing:
+        prices = dict(InventoryItem.objects.filter(id__in=missing).values_list("id", "price_per_unit"))
+    deltas = {}
+    for m in movements:
+        qty = Decimal(m.quantity)
+        unit = m.unit_cost if m.unit_cost is not None else (prices.get(m.inventory_item_id) or ZERO)
+        key = (m.inventory_item_id, month_start(m.business_date), m.movement_type)
+        d = deltas.setdefault(key, [ZERO, ZERO, 0])
+        d[0] += qty
+        d[1] += qty * unit
+        d[2] += 1
+    _apply(deltas)
+
+
+def rebuild():
+    """Recompute the whole cube from hot and archived movements. Returns the number of cube rows."""
+    price = F("inventory_item__price_per_unit")
+    grouped = {}
+    hot = (
+        StockMovement.objects.annotate(m=TruncMonth("business_date"))
+        .values("inventory_item_id", "m", "movement_type")
+        .annotate(qty=Sum("quantity"), cost=Sum(F("quantity") * Coalesce("unit_cost", price), output_field=_MONEY), n=Count("id"))
+        .order_by()
+    )
+    archived = (
+        StockMovementArchive.objects.annotate(m=TruncMonth("business_date"))
+        .values("inventory_item_id", "m", "movement_type")
+        .annotate(qty=Sum("quantity"), cost=Sum(F("quantity") * Coalesce("unit_cost", price), output_field=_MONEY), n=Count("id"))
+        .order_by()
+    )
+    for rows in (hot, archived):
+        for r in rows:
+            key = (r["inventory_item_id"], r["m"], r["movement_type"])
+            d = grouped.setdefault(key, [ZERO, ZERO, 0])
+            d[0] += r["qty"] or ZERO
+            d[1] += r["cost"] or ZERO
+            d[2] += r["n"]
+    with transaction.atomic():
+        StockMovementCube.objects.all().delete()
+        StockMovementCube.objects.bulk_create([
+            StockMovementCube(
+                inventory_item_id=item_id, month=month, movement_type=mtype,
+                quantity=qty, cost=_money(cost), movement_count=n,
+            )
+            for (item_id, month, mtype), (qty, cost, n) in grouped.items()
+        ], batch_size=2000)
+    return len(grouped)
+
+
+def _range(qs, start_month, end_month):
+    if start_month:
+        qs = qs.filter(month__gte=month_start(start_month))
+    if end_month:
+        qs = qs.filter(month__lte=month_start(end_month))
+    return qs
+
+
+def item_totals(movement_types, start_month=None, end_month=None):
+    """Per-item quantity, cost and movement count for the types and months, largest cost first."""
+    qs = _range(StockMovementCube.objects.filter(movement_type__in=movement_types), start_month, end_month)
+    return list(
+        qs.values(
+            "inventory_item_id",
+            stock_code=F("inventory_item__stock_code"),
+            name=F("inventory_item__name"),
+            category=F("inventory_item__category__name"),
+            uom=F("inventory_item__uom__abbreviation"),
+        )
+        .annotate(quantity=Sum("quantity"), cost=Sum("cost"), movements=Sum("movement_count"))
+        .order_by("-cost", "name")
+    )
+
+
+def monthly_totals(movement_types, start_month=None, end_month=None):
+    """Per-month cost and movement count for the types, newest first."""
+    qs = _range(StockMovementCube.objects.filter(movement_type__in=movement_types), start_month, end_month)
+    return list(
+        qs.values("month").annotate(cost=Sum("cost"), movements=Sum("movement_count")).order_by("-month")
+    )
+
+
+def turnover(start_month, end_month):
+    """
+    Stock turnover per item for the months [start_month, end_month].
+
+    Month-end balances are walked back from the current quantity using the
+    cube's net movement per month, so one cube query covers the whole range.
+    Average inventory is the mean of the opening balance and each month-end
+    balance; turnover is usage (issues, wastage, damage) over that average.
+    """
+    start_month, end_month = month_start(start_month), month_start(end_month)
+    months = []
+    m = start_month
+    while m <= end_month:
+        months.append(m)
+        m = add_months(m, 1)
+    period_days = (add_months(end_month, 1) - start_month).days
+
+    net = {}    # item_id -> {month: net change}
+    usage = {}  # item_id -> [qty, cost]
+    rows = StockMovementCube.objects.filter(month__gte=start_month).values_list("inventory_item_id", "month", "movement_type", "quantity", "cost")
+    for item_id, month, mtype, qty, cost in rows:
+        by_month = net.setdefault(item_id, {})
+        by_month[month] = by_month.get(month, ZERO) + NET_SIGN.get(mtype, 0) * qty
+        if mtype in USAGE_TYPES and month <= end_month:
+            u = usage.setdefault(item_id, [ZERO, ZERO])
+            u[0] += qty
+            u[1] += cost
+
+    # Items with stock but no usage in the range are listed too (turnover 0)
+    items = InventoryItem.objects.filter(Q(id__in=usage.keys()) | Q(quantity__gt=0)).values_list(
+        "id", "stock_code", "name", "category__name", "uom__abbreviation", "quantity", "price_per_unit",
+    )
+    result = []
+    total_usage_cost = total_avg_value = ZERO
+    for item_id, code, name, category, uom, quantity, price in items:
+        by_month = net.get(item_id, {})
+        # balance at the end of end_month: undo everything after it
+        closing = quantity - sum((q for mo, q in by_month.items() if mo > end_month), ZERO)
+        balances = [closing]
+        for mo in reversed(months):
+            balances.append(balances[-1] - by_month.get(mo, ZERO))
+        balances = [max(b, ZERO) for b in balances]
+        average = sum(balances, ZERO) / len(balances)
+        used_qty, used_cost = usage.get(item_id, (ZERO, ZERO))
+        turns = used_qty / average if average else None
+        price = price or ZERO
+        total_usage_cost += used_cost
+        total_avg_value += average * price
+        result.append({
+            "id": item_id,
+            "stock_code": code,
+            "name": name,
+            "category": category,
+            "uom": uom,
+            "opening": balances[-1],
+            "closing": balances[0],
+            "average": average.quantize(Decimal("0.0001")),
+            "used": used_qty,
+            "used_cost": _money(used_cost),
+            "turnover": turns.quantize(Decimal("0.01")) if turns is not None else None,
+            "days_on_hand": (Decimal(period_days) / turns).quantize(Decimal("0.1")) if turns else None,
+        })
+    result.sort(key=lambda r: (r["turnover"] is None, -(r["turnover"] or 0), r["name"]))
+    overall = total_usage_cost / total_avg_value if total_avg_value else None
+    return {
+        "items": result,
+        "period_days": period_days,
+        "totals": {
+            "used_cost": _money(total_usage_cost),
+            "average_value": _money(total_avg_value),
+            "turnover": overall.quantize(Decimal("0.01")) if overall is not None else None,
+        },
+    }
+
+
+def drill_down(item_id, movement_types, start_month, end_month):
+    """Raw hot and archived movements behind one item's cube cells for the months, newest first."""
+    window = {
+        "inventory_item_id": item_id,
+        "movement_type__in": movement_types,
+        "business_date__gte": month_start(start_month),
+        "business_date__lt": add_months(month_start(end_month), 1),
+    }
+    hot = list(StockMovement.objects.filter(**window).values("business_date", "movement_type", "quantity", "unit_cost", "note"))
+    archived = list(StockMovementArchive.objects.filter(**window).values("business_date", "movement_type", "quantity", "note"))
+    rows = hot + [dict(r, unit_cost=None, archived=True) for r in archived]
+    rows.sort(key=lambda r: r["business_date"], reverse=True)
+    return rows
@@ -0,0 +1,113 @@
+"""
+Cycle counts: snapshot expected quantities, collect counted quantities and
+commit the variances as ADJ movements in one transaction.
+
+On commit each line's variance (counted - expected) is applied as a delta on
+top of the item's current quantity, so stock that moved while the count was
+in progress is not overwritten.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Case, When, Value, DecimalField
+from django.utils import timezone
+
+from core.csv_import import read_csv
+from .models import InventoryItem, StockMovement, CountSession, CountLine
+from .locations import apply_deltas
+
+
+def start_session(name, category=None, note=""):
+    with transaction.atomic():
+        session = CountSession.objects.create(name=name, category=category, note=note)
+        items = InventoryItem.objects.all()
+        if category:
+            items = items.filter(category=category)
+        CountLine.objects.bulk_create([
+            CountLine(session=session, inventory_item_id=item_id, expected_quantity=qty)
+            for item_id, qty in items.values_list("id", "quantity")
+        ])
+    return session
+
+
+def record_counts(session, counts):
+    """Store {inventory_item_id: counted quantity or None} for an open session."""
+    if session.status != CountSession.OPEN:
+        raise ValueError("This count session is closed.")
+    lines = list(session.lines.filter(inventory_item_id__in=counts.keys()))
+    for line in lines:
+        line.counted_quantity = counts[line.inventory_item_id]
+    CountLine.objects.bulk_update(lines, ["counted_quantity"])
+    return len(lines)
+
+
+def parse_count_csv(session, fileobj):
+    """
+    Read `stock_code,counted_quantity` rows. Returns ({item_id: qty}, errors)
+    where errors is a list of (line number, message).
+    """
+    by_code = dict(session.lines.values_list("inventory_item__stock_code", "inventory_item_id"))
+    counts, errors = {}, []
+    for line, row in read_csv(fileobj):
+        code = row.get("stock_code", "")
+        item_id = by_code.get(code)
+        if item_id is None:
+            errors.append((line, f"Stock code '{code}' is not part of this count."))
+            continue
+        try:
+            qty = Decimal(row.get("counted_quantity", ""))
+        except InvalidOperation:
+            errors.append((line, f"counted_quantity must be a number, got '{row.get('counted_quantity', '')}'."))
+            continue
+        if not qty.is_finite() or qty < 0:
+            errors.append((line, "counted_quantity cannot be negative."))
+            continue
+        counts[item_id] = qty
+    return counts, errors
+
+
+def commit_session(session):
+    """Apply all counted variances. Returns the number of items adjusted."""
+    with transaction.atomic():
+        session = CountSession.objects.select_for_update().get(pk=session.pk)
+        if session.status != CountSession.OPEN:
+            raise ValueError("This count session is closed.")
+
+        lines = [l for l in session.lines.filter(counted_quantity__isnull=False) if l.variance]
+        current = dict(
+            InventoryItem.objects.select_for_update()
+            .filter(id__in=[l.inventory_item_id for l in lines])
+            .values_list("id", "quantity")
+        )
+        new_qty = {}
+        movements = []
+        for line in lines:
+            before = current[line.inventory_item_id]
+            after = max(before + line.variance, 0)
+            line.applied_quantity = after - before
+            if not line.applied_quantity:
+                continue
+            new_qty[line.inventory_item_id] = after
+            movements.append(StockMovement(
+                inventory_item_id=line.inventory_item_id,
+                movement_type=StockMovement.ADJUST,
+                quantity=line.applied_quantity,
+                note=f"Cycle count: {session.name}",
+            ))
+
+        if new_qty:
+            InventoryItem.objects.filter(id__in=new_qty.keys()).update(
+                quantity=Case(
+                    *[When(id=item_id, then=Value(qty)) for item_id, qty in new_qty.items()],
+                    output_field=DecimalField(max_digits=14, decimal_places=4),
+                ),
+                updated_at=timezone.now(),
+            )
+            StockMovement.objects.bulk_create(movements)
+            apply_deltas({l.inventory_item_id: l.applied_quantity for l in lines if l.applied_quantity})
+        CountLine.objects.bulk_update(lines, ["applied_quantity"])
+
+        session.status = CountSession.COMMITTED
+        session.committed_at = timezone.now()
+        session.save(update_fields=["status", "committed_at"])
+    return len(new_qty)
@@ -0,0 +1,41 @@
+"""
+Stock needed by customer orders.
+
+Recipe quantity x portions for menu lines plus directly ordered stock, grouped
+per (item, recipe unit) in SQL and converted to stock units once per group.
+Shared by shrinkage (orders delivered in a month) and procurement planning
+(pending orders due by a date); callers pass the order filter.
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, Sum
+
+from ordersapp.models import OrderItem, OrderMenuItem
+from .models import InventoryItem
+from .units import convert_many
+
+ZERO = Decimal("0")
+
+_QTY = DecimalField(max_digits=20, decimal_places=6)
+
+
+def stock_demand(**order_filter):
+    """{item_id: quantity in stock units} for orders matching `order_filter` (Order field lookups)."""
+    lines = {f"order__{lookup}": value for lookup, value in order_filter.items()}
+    recipe_rows = (
+        OrderMenuItem.objects.filter(**lines, menu_item__recipe_items__isnull=False)
+        .values(item_id=F("menu_item__recipe_items__inventory_item_id"), uom_id=F("menu_item__recipe_items__uom_id"))
+        .annotate(qty=Sum(F("quantity") * F("menu_item__recipe_items__quantity_per_portion"), output_field=_QTY))
+        .order_by()
+    )
+    direct_rows = OrderItem.objects.filter(**lines).values("inventory_item_id").annotate(qty=Sum("quantity")).order_by()
+
+    groups = [(r["item_id"], r["uom_id"], r["qty"] or ZERO) for r in recipe_rows]
+    groups += [(r["inventory_item_id"], None, Decimal(r["qty"] or 0)) for r in direct_rows]
+    item_uoms = dict(InventoryItem.objects.filter(id__in={g[0] for g in groups}).values_list("id", "uom_id"))
+    converted = convert_many([(qty, uom_id or item_uoms.get(item_id), item_uoms.get(item_id)) for item_id, uom_id, qty in groups])
+
+    totals = {}
+    for (item_id, _, _), qty in zip(groups, converted):
+        totals[item_id] = totals.get(item_id, ZERO) + qty
+    return totals
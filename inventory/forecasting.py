@@ -0,0 +1,148 @@
+"""
+Demand forecasting from OUT movement history.
+
+All OUT movements in the history window are loaded with one query into an
+items x days NumPy matrix; moving averages, weekday/month seasonality and
+days of cover are then computed for the whole catalog with array operations.
+
+Forecast daily demand = 28-day moving average (90-day when the last four
+weeks are empty) x this month's seasonality index; each weekday's demand is
+that x the weekday index. Days of cover walk forward from today through the
+weekday demands, so stock that will not last past the busy days shows as low.
+
+Rates use complete days only (up to yesterday), so they are computed once per
+day and cached under the date. Stock on hand changes all day: `with_stock`
+recomputes an entry's days of cover from the current quantity when read.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import InventoryItem, StockMovement
+
+HISTORY_DAYS = 365
+CACHE_SECONDS = 60 * 60 * 24
+
+
+def _seasonality(matrix, active, groups, n_groups, min_days=1):
+    """
+    Per item index of mean daily demand in each group (weekday, month) vs the
+    item's overall mean, over the days since its first recorded usage.
+    1.0 = average; groups with fewer than `min_days` observed days stay at 1.0.
+    """
+    sums = np.zeros((matrix.shape[0], n_groups))
+    days = np.zeros((matrix.shape[0], n_groups))
+    np.add.at(sums.T, groups, matrix.T)
+    np.add.at(days.T, groups, active.T)
+    means = np.divide(sums, days, out=np.zeros_like(sums), where=days > 0)
+    total_days = active.sum(axis=1, keepdims=True)
+    overall = np.divide(matrix.sum(axis=1, keepdims=True), total_days, out=np.zeros((matrix.shape[0], 1)), where=total_days > 0)
+    index = np.divide(means, overall, out=np.ones_like(means), where=(overall > 0) & (days >= min_days))
+    return index
+
+
+def _cover(quantity, weekday_demand, weekday):
+    """Days until `quantity` runs out at the per-weekday demand, counting from `weekday`."""
+    week = sum(weekday_demand)
+    if week <= 0:
+        return None
+    weeks, left = divmod(max(float(quantity), 0.0), week)
+    days = weeks * 7
+    for offset in range(7):
+        need = weekday_demand[(weekday + offset) % 7]
+        if left < need:
+            return round(days + left / need, 1)
+        left -= need
+        days += 1
+    return round(days, 1)
+
+
+def compute_forecast(today=None, history_days=HISTORY_DAYS):
+    today = today or timezone.localdate()
+    end = today - timedelta(days=1)
+    start = end - timedelta(days=history_days - 1)
+
+    items = list(InventoryItem.objects.order_by("id").values_list("id", "stock_code", "name", "uom__abbreviation", "quantity", "min_quantity"))
+    if not items:
+        return {}
+    item_ids = np.array([r[0] for r in items], dtype=np.int64)
+
+    moves = list(
+        StockMovement.objects.filter(movement_type=StockMovement.OUT, business_date__gte=start, business_date__lte=end)
+        .order_by()
+        .values_list("inventory_item_id", "business_date", "quantity")
+    )
+    matrix = np.zeros((len(items), history_days))
+    if moves:
+        rows = np.searchsorted(item_ids, np.array([m[0] for m in moves], dtype=np.int64))
+        cols = np.array([(m[1] - start).days for m in moves], dtype=np.int64)
+        np.add.at(matrix, (rows, cols), np.array([float(m[2]) for m in moves]))
+
+    # Only days on/after an item's first recorded usage count towards its averages
+    used = matrix > 0
+    first_day = np.where(used.any(axis=1), used.argmax(axis=1), history_days)
+    active = (np.arange(history_days)[None, :] >= first_day[:, None]).astype(np.float64)
+
+    day_dates = [start + timedelta(days=i) for i in range(history_days)]
+    weekday_idx = _seasonality(matrix, active, np.array([d.weekday() for d in day_dates]), 7)
+    month_idx = _seasonality(matrix, active, np.array([d.month - 1 for d in day_dates]), 12, min_days=28)
+
+    ma7 = matrix[:, -7:].mean(axis=1)
+    ma28 = matrix[:, -28:].mean(axis=1)
+    ma90 = matrix[:, -90:].mean(axis=1)
+    base = np.where(ma28 > 0, ma28, ma90)
+    daily = base * month_idx[:, today.month - 1]
+    by_weekday = daily[:, None] * weekday_idx
+
+    forecast = {}
+    for i, r in enumerate(items):
+        weekday_demand = [round(float(v), 3) for v in by_weekday[i]]
+        forecast[r[0]] = {
+            "id": r[0],
+            "stock_code": r[1],
+            "name": r[2],
+            "uom": r[3],
+            "quantity": r[4],
+            "min_quantity": r[5],
+            "ma7": round(float(ma7[i]), 3),
+            "ma28": round(float(ma28[i]), 3),
+            "ma90": round(float(ma90[i]), 3),
+            "daily_demand": round(float(daily[i]), 3),
+            "weekday_demand": weekday_demand,
+            "weekday": today.weekday(),
+            "days_of_cover": _cover(r[4], weekday_demand, today.weekday()),
+            "weekday_index": [round(float(v), 2) for v in weekday_idx[i]],
+            "month_index": round(float(month_idx[i, today.month - 1]), 2),
+        }
+    return forecast
+
+
+def get_forecast():
+    """Today's forecast keyed by inventory item id; computed once per day. Items added today are not in it."""
+    today = timezone.localdate()
+    return cache.get_or_set(f"demand_forecast:v2:{today}", lambda: compute_forecast(today), CACHE_SECONDS)
+
+
+def with_stock(entry, quantity, min_quantity):
+    """A forecast entry with the given current on-hand and minimum quantities and the days of cover they give."""
+    return {
+        **entry,
+        "quantity": quantity,
+        "min_quantity": min_quantity,
+        "days_of_cover": _cover(quantity, entry["weekday_demand"], entry["weekday"]),
+    }
+
+
+def reorder_days():
+    return getattr(settings, "FORECAST_REORDER_DAYS", 7)
+
+
+def is_low(entry, days=None):
+    """Low when at/below the fixed minimum or when forecast cover is under `days`."""
+    days = reorder_days() if days is None else days
+    if entry["quantity"] <= entry["min_quantity"]:
+        return True
+    return entry["days_of_cover"] is not None and entry["days_of_cover"] < days
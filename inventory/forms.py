@@ -1,5 +1,5 @@
 from django import forms
-from .models import InventoryBaseItem, UnitOfMeasure, InventoryCategory
+from .models import InventoryBaseItem, UnitOfMeasure, UnitConversion, InventoryCategory
 
 
 class InventoryBaseItemForm(forms.ModelForm):
@@ -46,6 +46,26 @@ class UnitOfMeasureForm(forms.ModelForm):
             field.widget.attrs["class"] = (css + " form-control").strip()
 
 
+class UnitConversionForm(forms.ModelForm):
+    class Meta:
+        model = UnitConversion
+        fields = ["from_uom", "factor", "to_uom"]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            css = field.widget.attrs.get("class", "")
+            field.widget.attrs["class"] = (css + " form-control").strip()
+
+    def clean(self):
+        cleaned = super().clean()
+        if cleaned.get("from_uom") and cleaned.get("from_uom") == cleaned.get("to_uom"):
+            raise forms.ValidationError("Pick two different units.")
+        if cleaned.get("factor") is not None and cleaned["factor"] <= 0:
+            raise forms.ValidationError("Factor must be greater than zero.")
+        return cleaned
+
+
 class InventoryCategoryForm(forms.ModelForm):
     class Meta:
         model = InventoryCategory
@@ -0,0 +1,168 @@
+"""
+Per-location stock balances.
+
+StockBalance holds the item x location matrix and is kept up to date by every
+code path that changes InventoryItem.quantity (apply_deltas), so "what is in
+the kitchen" is an indexed read, not a replay of movements. Receipts land in
+the default location; issues without an explicit location draw from the
+default location first, then the others by name.
+
+Transfers move stock between locations without changing the item total and
+are logged as TRANSFER movements.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import InventoryItem, StockLocation, StockBalance, StockMovement
+
+ZERO = Decimal("0")
+
+
+def default_location():
+    loc = StockLocation.objects.filter(is_default=True).first()
+    if loc is None:
+        loc, _ = StockLocation.objects.get_or_create(name="Main Store", defaults={"is_default": True})
+    return loc
+
+
+def _locked_balances(item_ids):
+    """{(item_id, location_id): StockBalance} for the items, locked for update."""
+    return {
+        (b.inventory_item_id, b.location_id): b
+        for b in StockBalance.objects.select_for_update().filter(inventory_item_id__in=item_ids)
+    }
+
+
+def _write(balances, changes):
+    """Apply {(item_id, location_id): delta} to the locked balances in one bulk update/insert."""
+    to_update, to_create = [], []
+    for (item_id, loc_id), delta in changes.items():
+        if not delta:
+            continue
+        bal = balances.get((item_id, loc_id))
+        if bal is None:
+            bal = StockBalance(inventory_item_id=item_id, location_id=loc_id, quantity=delta)
+            balances[(item_id, loc_id)] = bal
+            to_create.append(bal)
+        else:
+            bal.quantity += delta
+            to_update.append(bal)
+    if to_update:
+        StockBalance.objects.bulk_update(to_update, ["quantity"])
+    if to_create:
+        StockBalance.objects.bulk_create(to_create)
+
+
+def apply_deltas(deltas, location=None):
+    """
+    Mirror {item_id: signed quantity change} of InventoryItem.quantity into the
+    location balances. Positive changes go to `location` (default location if
+    None). Negative changes come out of `location`, or when None out of the
+    default location first and then the other locations. Balances never go
+    below zero; run `sync_stock_balances` if they have drifted from the totals.
+    """
+    deltas = {item_id: Decimal(d) for item_id, d in deltas.items() if d}
+    if not deltas:
+        return
+    with transaction.atomic():
+        balances = _locked_balances(deltas.keys())
+        target = location or default_location()
+        order = {loc_id: i for i, loc_id in enumerate(StockLocation.objects.order_by("-is_default", "name").values_list("id", flat=True))}
+        changes = {}
+        for item_id, delta in deltas.items():
+            if delta > 0:
+                changes[(item_id, target.id)] = changes.get((item_id, target.id), ZERO) + delta
+                continue
+            need = -delta
+            if location is not None:
+                sources = [(location.id, balances.get((item_id, location.id)))]
+            else:
+                sources = sorted(
+                    ((loc_id, b) for (i, loc_id), b in balances.items() if i == item_id),
+                    key=lambda s: (s[0] != target.id, order.get(s[0], len(order))),
+                )
+            for loc_id, bal in sources:
+                have = (bal.quantity if bal else ZERO) + changes.get((item_id, loc_id), ZERO)
+                take = min(have, need)
+                if take > 0:
+                    changes[(item_id, loc_id)] = changes.get((item_id, loc_id), ZERO) - take
+                    need -= take
+                if not need:
+                    break
+        _write(balances, changes)
+
+
+def transfer(lines, from_location, to_location, note=""):
+    """
+    Move [(item_id, quantity), ...] from one location to another. Raises
+    ValueError (nothing is moved) if the source does not hold enough.
+    Returns the TRANSFER movements created.
+    """
+    if from_location.id == to_location.id:
+        raise ValueError("Pick two different locations.")
+    qty_by_item = {}
+    for item_id, qty in lines:
+        qty = Decimal(qty)
+        if qty < 0:
+            raise ValueError("Quantities cannot be negative.")
+        if qty:
+            qty_by_item[item_id] = qty_by_item.get(item_id, ZERO) + qty
+    if not qty_by_item:
+        return []
+
+    with transaction.atomic():
+        balances = _locked_balances(qty_by_item.keys())
+        names = dict(InventoryItem.objects.filter(id__in=qty_by_item.keys()).values_list("id", "name"))
+        changes = {}
+        for item_id, qty in qty_by_item.items():
+            bal = balances.get((item_id, from_location.id))
+            have = bal.quantity if bal else ZERO
+            if qty > have:
+                raise ValueError(
+                    f"Only {have.normalize():f} {names.get(item_id, item_id)} at {from_location.name}."
+                )
+            changes[(item_id, from_location.id)] = -qty
+            changes[(item_id, to_location.id)] = qty
+        _write(balances, changes)
+        return StockMovement.objects.bulk_create([
+            StockMovement(
+                inventory_item_id=item_id,
+                movement_type=StockMovement.TRANSFER,
+                quantity=qty,
+                location=from_location,
+                to_location=to_location,
+                note=note or f"Transfer {from_location.name} -> {to_location.name}",
+            )
+            for item_id, qty in qty_by_item.items()
+        ])
+
+
+def sync_balances(dry_run=False):
+    """
+    Reconcile balances with InventoryItem.quantity: shortfalls are added to the
+    default location, surpluses drawn as in apply_deltas. Returns {item_id: delta}.
+    """
+    totals = dict(
+        StockBalance.objects.values("inventory_item_id").annotate(total=Sum("quantity")).values_list("inventory_item_id", "total")
+    )
+    drift = {}
+    for item_id, qty in InventoryItem.objects.values_list("id", "quantity"):
+        diff = qty - totals.get(item_id, ZERO)
+        if diff:
+            drift[item_id] = diff
+    if drift and not dry_run:
+        apply_deltas(drift)
+    return drift
+
+
+def matrix(items, locations):
+    """{item_id: {location_id: quantity}} for the given items and locations, one query."""
+    grid = {}
+    rows = StockBalance.objects.filter(
+        inventory_item__in=items, location__in=locations,
+    ).values_list("inventory_item_id", "location_id", "quantity")
+    for item_id, loc_id, qty in rows:
+        grid.setdefault(item_id, {})[loc_id] = qty
+    return grid
@@ -0,0 +1,115 @@
+"""
+Exact stock-code / barcode lookup for scanners.
+
+Codes are resolved through the unique indexes on `stock_code` and `barcode`.
+A small in-process LRU maps scanned codes to item ids; quantities are always
+read fresh by primary key, and a cached id whose item no longer carries the
+code (edited or deleted) is dropped and resolved again.
+"""
+from collections import OrderedDict
+from threading import Lock
+
+from django.db.models import Q
+
+from .models import InventoryItem
+
+CACHE_SIZE = 4096
+# Batches travel in the query string; 200 codes stay well inside common URL limits
+MAX_BATCH = 200
+
+_FIELDS = ("id", "stock_code", "barcode", "name", "quantity", "uom__abbreviation")
+
+
+class _LRU:
+    def __init__(self, size):
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_code_ids = _LRU(CACHE_SIZE)
+
+
+def normalize(code):
+    return (code or "").strip()
+
+
+def _as_result(code, row):
+    if row is None:
+        return {"code": code, "found": False}
+    return {
+        "code": code,
+        "found": True,
+        "id": row["id"],
+        "stock_code": row["stock_code"],
+        "barcode": row["barcode"],
+        "name": row["name"],
+        "quantity": row["quantity"],
+        "uom": row["uom__abbreviation"],
+    }
+
+
+def _matches(row, code):
+    return row is not None and code in (row["stock_code"], row["barcode"])
+
+
+def lookup_codes(codes):
+    """
+    Resolve a list of scanned codes (stock code or barcode, exact match) in at
+    most two queries. Returns one result dict per input code, in input order.
+    """
+    codes = [normalize(c) for c in codes]
+    wanted = [c for c in dict.fromkeys(codes) if c]
+
+    cached = {c: _code_ids.get(c) for c in wanted}
+    rows = {}
+    if any(v is not None for v in cached.values()):
+        rows = {r["id"]: r for r in InventoryItem.objects.filter(id__in={v for v in cached.values() if v}).values(*_FIELDS)}
+
+    by_code = {}
+    misses = []
+    for code, item_id in cached.items():
+        row = rows.get(item_id)
+        if _matches(row, code):
+            by_code[code] = row
+        else:
+            if item_id is not None:
+                _code_ids.discard(code)
+            misses.append(code)
+
+    if misses:
+        missing = set(misses)
+        found = InventoryItem.objects.filter(Q(stock_code__in=missing) | Q(barcode__in=missing)).values(*_FIELDS)
+        for row in found:
+            for code in (row["stock_code"], row["barcode"]):
+                if code in missing:
+                    by_code[code] = row
+                    _code_ids.set(code, row["id"])
+
+    return [_as_result(c, by_code.get(c)) for c in codes]
+
+
+def lookup_code(code):
+    return lookup_codes([code])[0]
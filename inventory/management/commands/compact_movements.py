@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from inventory import compaction
+
+
+class Command(BaseCommand):
+    help = "Move stock movements older than the hot horizon into the archive table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months",
+            type=int,
+            default=None,
+            help="Whole months to keep in the hot table (default: settings.STOCK_MOVEMENT_HOT_MONTHS)",
+        )
+        parser.add_argument("--batch-size", type=int, default=compaction.DEFAULT_BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Only count the movements that would move")
+
+    def handle(self, *args, **options):
+        cutoff = compaction.horizon_cutoff(options["months"])
+        moved = compaction.compact_movements(cutoff, batch_size=options["batch_size"], dry_run=options["dry_run"])
+        verb = "Would archive" if options["dry_run"] else "Archived"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {moved} movement(s) created before {cutoff}."))
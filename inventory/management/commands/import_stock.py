@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.csv_import import READ_ERRORS, read_csv
+from inventory import stock_import
+
+
+class Command(BaseCommand):
+    help = "Bulk import stock items (with initial IN movements) from a CSV file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with a header row")
+        parser.add_argument("--chunk-size", type=int, default=stock_import.DEFAULT_CHUNK_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Validate rows without writing")
+        parser.add_argument("--note", default="Bulk import", help="Note for the initial stock movements")
+
+    def handle(self, *args, **options):
+        try:
+            fh = open(options["path"], "rb")
+        except OSError as e:
+            raise CommandError(f"Cannot open {options['path']}: {e}")
+        with fh:
+            try:
+                result = stock_import.import_stock(
+                    read_csv(fh),
+                    chunk_size=options["chunk_size"],
+                    dry_run=options["dry_run"],
+                    note=options["note"],
+                )
+            except READ_ERRORS as e:
+                raise CommandError(f"Cannot read {options['path']} as CSV: {e}")
+
+        for line, error in result.errors:
+            self.stderr.write(f"Line {line}: {error}")
+        verb = "Validated" if options["dry_run"] else "Imported"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {result.created} item(s), skipped {len(result.errors)} row(s)."))
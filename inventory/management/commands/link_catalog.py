@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from inventory import catalog_match
+
+
+class Command(BaseCommand):
+    help = "Link stock rows (InventoryItem) to catalog entries (InventoryBaseItem) by normalised name"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--relink", action="store_true", help="Re-match rows that are already linked")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=catalog_match.DEFAULT_THRESHOLD,
+            help="Minimum name similarity (0-1) for a non-exact match",
+        )
+        parser.add_argument("--batch-size", type=int, default=catalog_match.BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Report matches without saving them")
+
+    def handle(self, *args, **options):
+        matched, unmatched = catalog_match.link_stock_items(
+            relink=options["relink"],
+            threshold=options["threshold"],
+            dry_run=options["dry_run"],
+            batch_size=options["batch_size"],
+        )
+        verb = "Would link" if options["dry_run"] else "Linked"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {matched} stock row(s); {unmatched} had no catalog match."))
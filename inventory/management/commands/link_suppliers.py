@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from inventory import supplier_link
+
+
+class Command(BaseCommand):
+    help = "Link stock rows (InventoryItem) to Supplier records by normalised phone and name"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--relink", action="store_true", help="Re-match rows that are already linked")
+        parser.add_argument("--no-create", action="store_true", help="Leave rows without a matching supplier unlinked")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=supplier_link.DEFAULT_THRESHOLD,
+            help="Minimum name similarity (0-1) for a non-exact match",
+        )
+        parser.add_argument("--batch-size", type=int, default=supplier_link.BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Report matches without saving them")
+
+    def handle(self, *args, **options):
+        matched, created, unmatched = supplier_link.link_stock_items(
+            relink=options["relink"],
+            create=not options["no_create"],
+            threshold=options["threshold"],
+            dry_run=options["dry_run"],
+            batch_size=options["batch_size"],
+        )
+        verb = "Would link" if options["dry_run"] else "Linked"
+        made = "would be created" if options["dry_run"] else "created"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {matched} stock row(s) ({created} new supplier(s) {made}); {unmatched} left unlinked."
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from inventory import cube
+
+
+class Command(BaseCommand):
+    help = "Recompute the item x month x movement type cube from hot and archived stock movements"
+
+    def handle(self, *args, **options):
+        rows = cube.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt movement cube: {rows} row(s)."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from inventory import locations
+
+
+class Command(BaseCommand):
+    help = "Reconcile per-location stock balances with each item's total quantity"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report items whose balances have drifted")
+
+    def handle(self, *args, **options):
+        drift = locations.sync_balances(dry_run=options["dry_run"])
+        verb = "Would adjust" if options["dry_run"] else "Adjusted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} location balances for {len(drift)} item(s)."))
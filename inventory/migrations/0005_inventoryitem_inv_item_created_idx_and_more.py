@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_inventoryitem_min_quantity_stockmovement'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['created_at'], name='inv_item_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['movement_type', 'created_at'], name='stock_mv_type_created_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:09
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_inventoryitem_inv_item_created_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovementArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True)),
+                ('movement_type', models.CharField(choices=[('IN', 'In'), ('OUT', 'Out'), ('ADJ', 'Adjust')], max_length=4)),
+                ('quantity', models.DecimalField(decimal_places=4, max_digits=14)),
+                ('note', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('inventory_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_movements', to='inventory.inventoryitem')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['inventory_item', 'created_at'], name='stock_mv_arch_item_created_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockMovementMonthly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('movement_type', models.CharField(choices=[('IN', 'In'), ('OUT', 'Out'), ('ADJ', 'Adjust')], max_length=4)),
+                ('quantity', models.DecimalField(decimal_places=4, default=Decimal('0.0000'), max_digits=16)),
+                ('movement_count', models.PositiveIntegerField(default=0)),
+                ('inventory_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_movements', to='inventory.inventoryitem')),
+            ],
+            options={
+                'ordering': ['-month'],
+                'indexes': [models.Index(fields=['movement_type', 'month'], name='stock_mv_month_type_idx')],
+                'unique_together': {('inventory_item', 'month', 'movement_type')},
+            },
+        ),
+    ]
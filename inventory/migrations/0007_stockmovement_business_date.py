@@ -0,0 +1,63 @@
+from collections import defaultdict
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+BATCH_SIZE = 5000
+
+
+def backfill_business_date(apps, schema_editor):
+    """Fill business_date from created_at in batches, one UPDATE per distinct local date."""
+    for model_name in ("StockMovement", "StockMovementArchive"):
+        model = apps.get_model("inventory", model_name)
+        last_id = 0
+        while True:
+            rows = list(
+                model.objects.filter(id__gt=last_id, business_date__isnull=True)
+                .order_by("id")
+                .values_list("id", "created_at")[:BATCH_SIZE]
+            )
+            if not rows:
+                break
+            by_date = defaultdict(list)
+            for pk, created_at in rows:
+                by_date[timezone.localdate(created_at)].append(pk)
+            for day, ids in by_date.items():
+                model.objects.filter(id__in=ids).update(business_date=day)
+            last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_stockmovementarchive_stockmovementmonthly'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockmovement',
+            name='business_date',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='stockmovementarchive',
+            name='business_date',
+            field=models.DateField(null=True),
+        ),
+        migrations.RunPython(backfill_business_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='business_date',
+            field=models.DateField(default=django.utils.timezone.localdate, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='stockmovementarchive',
+            name='business_date',
+            field=models.DateField(),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['movement_type', 'business_date'], name='stock_mv_type_bdate_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_stockmovement_business_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockmovement',
+            name='unit_cost',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text='Purchase cost per unit for IN movements (used for stock valuation)', max_digits=12, null=True),
+        ),
+    ]
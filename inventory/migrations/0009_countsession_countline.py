@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_stockmovement_unit_cost'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CountSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('OPEN', 'Open'), ('COMMITTED', 'Committed'), ('CANCELLED', 'Cancelled')], default='OPEN', max_length=20)),
+                ('note', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('committed_at', models.DateTimeField(blank=True, null=True)),
+                ('category', models.ForeignKey(blank=True, help_text='Limit the count to one category (blank = all items)', null=True, on_delete=django.db.models.deletion.SET_NULL, to='inventory.inventorycategory')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CountLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expected_quantity', models.PositiveIntegerField()),
+                ('counted_quantity', models.PositiveIntegerField(blank=True, null=True)),
+                ('applied_quantity', models.IntegerField(blank=True, help_text='Adjustment applied on commit', null=True)),
+                ('inventory_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='count_lines', to='inventory.inventoryitem')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='inventory.countsession')),
+            ],
+            options={
+                'unique_together': {('session', 'inventory_item')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_countsession_countline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='barcode',
+            field=models.CharField(blank=True, help_text='Printed/manufacturer barcode', max_length=64, null=True, unique=True),
+        ),
+    ]
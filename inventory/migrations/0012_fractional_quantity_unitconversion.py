@@ -0,0 +1,61 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:18
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+DEFAULT_CONVERSIONS = [("kg", "g", Decimal("1000")), ("L", "ml", Decimal("1000"))]
+
+
+def seed_conversions(apps, schema_editor):
+    UnitOfMeasure = apps.get_model("inventory", "UnitOfMeasure")
+    UnitConversion = apps.get_model("inventory", "UnitConversion")
+    units = {u.abbreviation: u for u in UnitOfMeasure.objects.all()}
+    for src, dst, factor in DEFAULT_CONVERSIONS:
+        if src in units and dst in units:
+            UnitConversion.objects.get_or_create(from_uom=units[src], to_uom=units[dst], defaults={"factor": factor})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_inventoryitem_base_item'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='countline',
+            name='applied_quantity',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text='Adjustment applied on commit', max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='countline',
+            name='counted_quantity',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='countline',
+            name='expected_quantity',
+            field=models.DecimalField(decimal_places=4, max_digits=14),
+        ),
+        migrations.AlterField(
+            model_name='inventoryitem',
+            name='quantity',
+            field=models.DecimalField(decimal_places=4, default=Decimal('1'), help_text="Stock on hand in this item's UOM", max_digits=14),
+        ),
+        migrations.CreateModel(
+            name='UnitConversion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('factor', models.DecimalField(decimal_places=10, max_digits=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('from_uom', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversions_from', to='inventory.unitofmeasure')),
+                ('to_uom', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversions_to', to='inventory.unitofmeasure')),
+            ],
+            options={
+                'unique_together': {('from_uom', 'to_uom')},
+            },
+        ),
+        migrations.RunPython(seed_conversions, migrations.RunPython.noop),
+    ]
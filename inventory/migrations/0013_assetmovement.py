@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_fractional_quantity_unitconversion'),
+        ('ordersapp', '0008_recipeitem_uom'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_bucket', models.CharField(choices=[('available', 'Available'), ('reserved', 'Reserved'), ('in_use', 'In Use'), ('damaged', 'Damaged')], max_length=20)),
+                ('to_bucket', models.CharField(choices=[('available', 'Available'), ('reserved', 'Reserved'), ('in_use', 'In Use'), ('damaged', 'Damaged')], max_length=20)),
+                ('quantity', models.DecimalField(decimal_places=4, max_digits=14)),
+                ('note', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('business_date', models.DateField(default=django.utils.timezone.localdate, editable=False)),
+                ('base_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='asset_movements', to='inventory.inventorybaseitem')),
+                ('event', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='asset_movements', to='ordersapp.event')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['event', 'base_item'], name='asset_mv_event_item_idx')],
+            },
+        ),
+    ]
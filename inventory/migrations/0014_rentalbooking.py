@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_assetmovement'),
+        ('ordersapp', '0008_recipeitem_uom'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RentalBooking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('quantity', models.DecimalField(decimal_places=4, max_digits=14)),
+                ('status', models.CharField(choices=[('BOOKED', 'Booked'), ('CANCELLED', 'Cancelled')], default='BOOKED', max_length=10)),
+                ('note', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rental_bookings', to='ordersapp.event')),
+                ('inventory_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rental_bookings', to='inventory.inventoryitem')),
+            ],
+            options={
+                'ordering': ['start_date', 'id'],
+                'indexes': [models.Index(fields=['inventory_item', 'status', 'start_date', 'end_date'], name='rental_item_range_idx'), models.Index(fields=['start_date', 'end_date'], name='rental_range_idx')],
+            },
+        ),
+    ]
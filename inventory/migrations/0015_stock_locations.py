@@ -0,0 +1,96 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:22
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+DEFAULT_LOCATIONS = ["Main Store", "Kitchen", "Event Site"]
+BATCH_SIZE = 2000
+
+
+def seed_locations(apps, schema_editor):
+    """Create the standard locations and put all existing stock in the main store."""
+    StockLocation = apps.get_model("inventory", "StockLocation")
+    StockBalance = apps.get_model("inventory", "StockBalance")
+    InventoryItem = apps.get_model("inventory", "InventoryItem")
+
+    main = None
+    for i, name in enumerate(DEFAULT_LOCATIONS):
+        loc, _ = StockLocation.objects.get_or_create(name=name, defaults={"is_default": i == 0})
+        main = main or loc
+
+    last_id = 0
+    while True:
+        rows = list(
+            InventoryItem.objects.filter(id__gt=last_id).order_by("id").values_list("id", "quantity")[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        StockBalance.objects.bulk_create(
+            [StockBalance(location=main, inventory_item_id=item_id, quantity=qty) for item_id, qty in rows if qty],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_rentalbooking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('is_default', models.BooleanField(default=False, help_text='Receives new stock and is drawn from first')),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['-is_default', 'name'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='movement_type',
+            field=models.CharField(choices=[('IN', 'In'), ('OUT', 'Out'), ('ADJ', 'Adjust'), ('XFER', 'Transfer')], max_length=4),
+        ),
+        migrations.AlterField(
+            model_name='stockmovementarchive',
+            name='movement_type',
+            field=models.CharField(choices=[('IN', 'In'), ('OUT', 'Out'), ('ADJ', 'Adjust'), ('XFER', 'Transfer')], max_length=4),
+        ),
+        migrations.AlterField(
+            model_name='stockmovementmonthly',
+            name='movement_type',
+            field=models.CharField(choices=[('IN', 'In'), ('OUT', 'Out'), ('ADJ', 'Adjust'), ('XFER', 'Transfer')], max_length=4),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movements_out', to='inventory.stocklocation'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='to_location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movements_in', to='inventory.stocklocation'),
+        ),
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('inventory_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='inventory.inventoryitem')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='balances', to='inventory.stocklocation')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['inventory_item', 'location'], name='stock_bal_item_loc_idx')],
+                'unique_together': {('location', 'inventory_item')},
+            },
+        ),
+        migrations.RunPython(seed_locations, migrations.RunPython.noop),
+    ]
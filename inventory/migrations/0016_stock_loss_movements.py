@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0015_stock_locations'),
+        ('ordersapp', '0008_recipeitem_uom'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockmovement',
+            name='event',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='ordersapp.event'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='reason',
+            field=models.CharField(blank=True, choices=[('spoiled', 'Spoiled'), ('expired', 'Expired'), ('overproduction', 'Over-production'), ('broken', 'Broken'), ('lost', 'Lost / missing'), ('other', 'Other')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='movement_type',
+            field=models.CharField(choices=[('IN', 'In'), ('OUT', 'Out'), ('ADJ', 'Adjust'), ('XFER', 'Transfer'), ('WST', 'Wastage'), ('DMG', 'Damage')], max_length=4),
+        ),
+        migrations.AlterField(
+            model_name='stockmovementarchive',
+            name='movement_type',
+            field=models.CharField(choices=[('IN', 'In'), ('OUT', 'Out'), ('ADJ', 'Adjust'), ('XFER', 'Transfer'), ('WST', 'Wastage'), ('DMG', 'Damage')], max_length=4),
+        ),
+        migrations.AlterField(
+            model_name='stockmovementmonthly',
+            name='movement_type',
+            field=models.CharField(choices=[('IN', 'In'), ('OUT', 'Out'), ('ADJ', 'Adjust'), ('XFER', 'Transfer'), ('WST', 'Wastage'), ('DMG', 'Damage')], max_length=4),
+        ),
+    ]
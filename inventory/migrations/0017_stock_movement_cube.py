@@ -0,0 +1,64 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:27
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+
+
+def backfill_cube(apps, schema_editor):
+    StockMovement = apps.get_model("inventory", "StockMovement")
+    StockMovementArchive = apps.get_model("inventory", "StockMovementArchive")
+    StockMovementCube = apps.get_model("inventory", "StockMovementCube")
+    money = DecimalField(max_digits=20, decimal_places=6)
+    price = F("inventory_item__price_per_unit")
+
+    grouped = {}
+    for model, cost in ((StockMovement, Coalesce("unit_cost", price)), (StockMovementArchive, price)):
+        rows = (
+            model.objects.annotate(m=TruncMonth("business_date"))
+            .values("inventory_item_id", "m", "movement_type")
+            .annotate(qty=Sum("quantity"), cost=Sum(F("quantity") * cost, output_field=money), n=Count("id"))
+            .order_by()
+        )
+        for r in rows:
+            d = grouped.setdefault((r["inventory_item_id"], r["m"], r["movement_type"]), [Decimal("0"), Decimal("0"), 0])
+            d[0] += r["qty"] or 0
+            d[1] += r["cost"] or 0
+            d[2] += r["n"]
+    StockMovementCube.objects.bulk_create([
+        StockMovementCube(
+            inventory_item_id=item_id, month=month, movement_type=mtype,
+            quantity=qty, cost=Decimal(cost).quantize(Decimal("0.01")), movement_count=n,
+        )
+        for (item_id, month, mtype), (qty, cost, n) in grouped.items()
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0016_stock_loss_movements'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovementCube',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('movement_type', models.CharField(choices=[('IN', 'In'), ('OUT', 'Out'), ('ADJ', 'Adjust'), ('XFER', 'Transfer'), ('WST', 'Wastage'), ('DMG', 'Damage')], max_length=4)),
+                ('quantity', models.DecimalField(decimal_places=4, default=Decimal('0.0000'), max_digits=16)),
+                ('cost', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text="Movement unit cost, or the item's price per unit when none was recorded", max_digits=16)),
+                ('movement_count', models.PositiveIntegerField(default=0)),
+                ('inventory_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movement_cube', to='inventory.inventoryitem')),
+            ],
+            options={
+                'ordering': ['-month'],
+                'indexes': [models.Index(fields=['movement_type', 'month'], name='stock_cube_type_month_idx')],
+                'unique_together': {('inventory_item', 'month', 'movement_type')},
+            },
+        ),
+        migrations.RunPython(backfill_cube, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0017_stock_movement_cube'),
+        ('suppliers', '0006_payment_allocation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='supplier',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_items', to='suppliers.supplier'),
+        ),
+    ]
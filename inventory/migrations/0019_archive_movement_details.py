@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0018_inventoryitem_supplier'),
+        ('ordersapp', '0008_recipeitem_uom'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockmovementarchive',
+            name='event',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_stock_movements', to='ordersapp.event'),
+        ),
+        migrations.AddField(
+            model_name='stockmovementarchive',
+            name='location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_movements_out', to='inventory.stocklocation'),
+        ),
+        migrations.AddField(
+            model_name='stockmovementarchive',
+            name='reason',
+            field=models.CharField(blank=True, choices=[('spoiled', 'Spoiled'), ('expired', 'Expired'), ('overproduction', 'Over-production'), ('broken', 'Broken'), ('lost', 'Lost / missing'), ('other', 'Other')], max_length=20),
+        ),
+        migrations.AddField(
+            model_name='stockmovementarchive',
+            name='to_location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_movements_in', to='inventory.stocklocation'),
+        ),
+        migrations.AddField(
+            model_name='stockmovementarchive',
+            name='unit_cost',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0019_archive_movement_details'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='stockmovementmonthly',
+            unique_together=None,
+        ),
+        migrations.RemoveField(
+            model_name='stockmovementmonthly',
+            name='inventory_item',
+        ),
+        migrations.DeleteModel(
+            name='StockMovementMonthly',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0020_drop_monthly_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockmovementarchive',
+            index=models.Index(fields=['movement_type', 'business_date'], name='stock_mv_arch_type_date_idx'),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.functions import Length
+from django.utils import timezone
 from decimal import Decimal
 from core.models import TimeStampedModel
 
@@ -74,6 +76,21 @@ class UnitOfMeasure(models.Model):
         verbose_name_plural = "Units of Measure"
 
 
+class UnitConversion(models.Model):
+    """One edge of the unit graph: 1 `from_uom` = `factor` `to_uom` (the reverse is implied)."""
+
+    from_uom = models.ForeignKey(UnitOfMeasure, on_delete=models.CASCADE, related_name="conversions_from")
+    to_uom = models.ForeignKey(UnitOfMeasure, on_delete=models.CASCADE, related_name="conversions_to")
+    factor = models.DecimalField(max_digits=20, decimal_places=10)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("from_uom", "to_uom")
+
+    def __str__(self):
+        return f"1 {self.from_uom.abbreviation} = {self.factor.normalize():f} {self.to_uom.abbreviation}"
+
+
 # -----------------------------
 # Inventory Category Model (NEW)
 # -----------------------------
@@ -109,17 +126,33 @@ class InventoryItem(models.Model):
 
     # Stock Info
     stock_code = models.CharField(max_length=20, unique=True, editable=False)
+    barcode = models.CharField(max_length=64, unique=True, blank=True, null=True, help_text="Printed/manufacturer barcode")
     name = models.CharField(max_length=255)
 
     # ✅ ForeignKey to dynamic category instead of static choices
     category = models.ForeignKey(InventoryCategory, on_delete=models.PROTECT, related_name="items")
+    # Catalog entry this stock row belongs to (set by the `link_catalog` matcher)
+    base_item = models.ForeignKey(
+        InventoryBaseItem,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="stock_items",
+    )
 
-    quantity = models.PositiveIntegerField(default=1)
+    quantity = models.DecimalField(max_digits=14, decimal_places=4, default=Decimal("1"), help_text="Stock on hand in this item's UOM")
     price_per_unit = models.DecimalField(max_digits=12, decimal_places=2)
     uom = models.ForeignKey(UnitOfMeasure, on_delete=models.PROTECT)
     description = models.TextField(blank=True, null=True)
 
-    # Supplier Info
+    # Supplier Info (free text as entered; `supplier` is set by the `link_suppliers` matcher)
+    supplier = models.ForeignKey(
+        "suppliers.Supplier",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="stock_items",
+    )
     supplier_name = models.CharField(max_length=255)
     supplier_phone = models.CharField(max_length=20, blank=True, null=True)
     supplier_cnic = models.CharField(max_length=20, blank=True, null=True)
@@ -142,10 +175,26 @@ class InventoryItem(models.Model):
     def save(self, *args, **kwargs):
         """Auto-generate stock code if not exists."""
         if not self.stock_code:
-            last_id = InventoryItem.objects.count() + 1
-            self.stock_code = f"STK-{last_id:04d}"
+            self.stock_code = InventoryItem.allocate_stock_codes(1)[0]
+        # Blank barcodes are stored as NULL so the unique index allows many of them
+        self.barcode = (self.barcode or "").strip() or None
         super().save(*args, **kwargs)
 
+    @classmethod
+    def allocate_stock_codes(cls, count):
+        """Return `count` consecutive unused stock codes after the highest STK-NNNN."""
+        last = (
+            cls.objects.filter(stock_code__startswith="STK-")
+            .order_by(Length("stock_code").desc(), "-stock_code")
+            .values_list("stock_code", flat=True)
+            .first()
+        )
+        try:
+            start = int(last.split("-", 1)[1]) + 1 if last else 1
+        except ValueError:
+            start = cls.objects.count() + 1
+        return [f"STK-{n:04d}" for n in range(start, start + count)]
+
     @property
     def remaining(self):
         """Return remaining amount = total - paid"""
@@ -156,26 +205,307 @@ class InventoryItem(models.Model):
 
     class Meta:
         verbose_name_plural = "Inventory Items"
+        indexes = [
+            models.Index(fields=["created_at"], name="inv_item_created_idx"),
+        ]
+
+
+class StockLocation(models.Model):
+    """A place stock is kept: main store, kitchen, a truck or event site."""
+
+    name = models.CharField(max_length=100, unique=True)
+    is_default = models.BooleanField(default=False, help_text="Receives new stock and is drawn from first")
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ["-is_default", "name"]
+
+    def __str__(self):
+        return self.name
+
+
+class StockBalance(models.Model):
+    """Quantity of one item at one location; summed over locations it equals InventoryItem.quantity."""
+
+    location = models.ForeignKey(StockLocation, on_delete=models.PROTECT, related_name="balances")
+    inventory_item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name="balances")
+    quantity = models.DecimalField(max_digits=14, decimal_places=4, default=Decimal("0"))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("location", "inventory_item")
+        indexes = [
+            models.Index(fields=["inventory_item", "location"], name="stock_bal_item_loc_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.inventory_item} @ {self.location}: {self.quantity}"
+
+
+class StockMovementQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        from .cube import record
+
+        objs = super().bulk_create(objs, *args, **kwargs)
+        record(objs)
+        return objs
 
 
 class StockMovement(models.Model):
     IN = "IN"
     OUT = "OUT"
     ADJUST = "ADJ"
+    TRANSFER = "XFER"
+    WASTE = "WST"
+    DAMAGE = "DMG"
     TYPES = [
         (IN, "In"),
         (OUT, "Out"),
         (ADJUST, "Adjust"),
+        (TRANSFER, "Transfer"),
+        (WASTE, "Wastage"),
+        (DAMAGE, "Damage"),
+    ]
+    LOSS_TYPES = (WASTE, DAMAGE)
+
+    REASONS = [
+        ("spoiled", "Spoiled"),
+        ("expired", "Expired"),
+        ("overproduction", "Over-production"),
+        ("broken", "Broken"),
+        ("lost", "Lost / missing"),
+        ("other", "Other"),
     ]
 
     inventory_item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name="movements")
     movement_type = models.CharField(max_length=4, choices=TYPES)
     quantity = models.DecimalField(max_digits=14, decimal_places=4)
+    unit_cost = models.DecimalField(
+        max_digits=12, decimal_places=4, blank=True, null=True,
+        help_text="Purchase cost per unit for IN movements (used for stock valuation)",
+    )
+    # Source and destination of TRANSFER movements
+    location = models.ForeignKey(StockLocation, on_delete=models.PROTECT, null=True, blank=True, related_name="movements_out")
+    to_location = models.ForeignKey(StockLocation, on_delete=models.PROTECT, null=True, blank=True, related_name="movements_in")
+    # Wastage / damage details
+    reason = models.CharField(max_length=20, choices=REASONS, blank=True)
+    event = models.ForeignKey(
+        "ordersapp.Event",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="stock_movements",
+    )
     note = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Local (TIME_ZONE) calendar date of created_at, stored so reports can filter
+    # and group by day/month without converting every row's timestamp.
+    business_date = models.DateField(default=timezone.localdate, editable=False)
+
+    # bulk_create and save() both fold new movements into StockMovementCube
+    objects = StockMovementQuerySet.as_manager()
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["movement_type", "created_at"], name="stock_mv_type_created_idx"),
+            models.Index(fields=["movement_type", "business_date"], name="stock_mv_type_bdate_idx"),
+        ]
 
     def __str__(self):
         return f"{self.inventory_item} {self.movement_type} {self.quantity}"
+
+    def save(self, *args, **kwargs):
+        from .cube import record
+
+        is_new = self._state.adding
+        super().save(*args, **kwargs)
+        if is_new:
+            record([self])
+
+
+class StockMovementArchive(models.Model):
+    """Movements moved out of StockMovement by the `compact_movements` job."""
+
+    original_id = models.BigIntegerField(unique=True)
+    inventory_item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name="archived_movements")
+    movement_type = models.CharField(max_length=4, choices=StockMovement.TYPES)
+    quantity = models.DecimalField(max_digits=14, decimal_places=4)
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=4, blank=True, null=True)
+    location = models.ForeignKey(StockLocation, on_delete=models.PROTECT, null=True, blank=True, related_name="archived_movements_out")
+    to_location = models.ForeignKey(StockLocation, on_delete=models.PROTECT, null=True, blank=True, related_name="archived_movements_in")
+    reason = models.CharField(max_length=20, choices=StockMovement.REASONS, blank=True)
+    event = models.ForeignKey(
+        "ordersapp.Event",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="archived_stock_movements",
+    )
+    note = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    business_date = models.DateField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["inventory_item", "created_at"], name="stock_mv_arch_item_created_idx"),
+            models.Index(fields=["movement_type", "business_date"], name="stock_mv_arch_type_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.inventory_item} {self.movement_type} {self.quantity} (archived)"
+
+
+class StockMovementCube(models.Model):
+    """
+    Per item, per (local) month, per movement type totals of all movements,
+    hot and archived, maintained as movements are written.
+    """
+
+    inventory_item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name="movement_cube")
+    month = models.DateField(help_text="First day of the month")
+    movement_type = models.CharField(max_length=4, choices=StockMovement.TYPES)
+    quantity = models.DecimalField(max_digits=16, decimal_places=4, default=Decimal("0.0000"))
+    cost = models.DecimalField(
+        max_digits=16, decimal_places=2, default=Decimal("0.00"),
+        help_text="Movement unit cost, or the item's price per unit when none was recorded",
+    )
+    movement_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-month"]
+        unique_together = ("inventory_item", "month", "movement_type")
+        indexes = [
+            models.Index(fields=["movement_type", "month"], name="stock_cube_type_month_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.inventory_item} {self.month:%Y-%m} {self.movement_type} {self.quantity}"
+
+
+class CountSession(models.Model):
+    """A physical stock count: expected quantities are snapshotted at start."""
+
+    OPEN = "OPEN"
+    COMMITTED = "COMMITTED"
+    CANCELLED = "CANCELLED"
+    STATUS_CHOICES = [
+        (OPEN, "Open"),
+        (COMMITTED, "Committed"),
+        (CANCELLED, "Cancelled"),
+    ]
+
+    name = models.CharField(max_length=255)
+    category = models.ForeignKey(
+        InventoryCategory, on_delete=models.SET_NULL, null=True, blank=True,
+        help_text="Limit the count to one category (blank = all items)",
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=OPEN)
+    note = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    committed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
+
+
+class CountLine(models.Model):
+    session = models.ForeignKey(CountSession, on_delete=models.CASCADE, related_name="lines")
+    inventory_item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name="count_lines")
+    expected_quantity = models.DecimalField(max_digits=14, decimal_places=4)
+    counted_quantity = models.DecimalField(max_digits=14, decimal_places=4, blank=True, null=True)
+    applied_quantity = models.DecimalField(max_digits=14, decimal_places=4, blank=True, null=True, help_text="Adjustment applied on commit")
+
+    class Meta:
+        unique_together = ("session", "inventory_item")
+
+    @property
+    def variance(self):
+        if self.counted_quantity is None:
+            return None
+        return self.counted_quantity - self.expected_quantity
+
+    def __str__(self):
+        return f"{self.session} - {self.inventory_item}"
+
+
+class AssetMovement(models.Model):
+    """A quantity of a catalog item moved between stock buckets (e.g. out to an event)."""
+
+    AVAILABLE = "available"
+    RESERVED = "reserved"
+    IN_USE = "in_use"
+    DAMAGED = "damaged"
+    BUCKETS = [
+        (AVAILABLE, "Available"),
+        (RESERVED, "Reserved"),
+        (IN_USE, "In Use"),
+        (DAMAGED, "Damaged"),
+    ]
+
+    base_item = models.ForeignKey(InventoryBaseItem, on_delete=models.CASCADE, related_name="asset_movements")
+    from_bucket = models.CharField(max_length=20, choices=BUCKETS)
+    to_bucket = models.CharField(max_length=20, choices=BUCKETS)
+    quantity = models.DecimalField(max_digits=14, decimal_places=4)
+    event = models.ForeignKey(
+        "ordersapp.Event",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="asset_movements",
+    )
+    note = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    business_date = models.DateField(default=timezone.localdate, editable=False)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["event", "base_item"], name="asset_mv_event_item_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.base_item} {self.quantity} {self.from_bucket} -> {self.to_bucket}"
+
+
+class RentalBooking(models.Model):
+    """Rental equipment committed to an event for an inclusive date range."""
+
+    BOOKED = "BOOKED"
+    CANCELLED = "CANCELLED"
+    STATUSES = [
+        (BOOKED, "Booked"),
+        (CANCELLED, "Cancelled"),
+    ]
+
+    inventory_item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name="rental_bookings")
+    event = models.ForeignKey(
+        "ordersapp.Event",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="rental_bookings",
+    )
+    start_date = models.DateField()
+    end_date = models.DateField()
+    quantity = models.DecimalField(max_digits=14, decimal_places=4)
+    status = models.CharField(max_length=10, choices=STATUSES, default=BOOKED)
+    note = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["start_date", "id"]
+        indexes = [
+            models.Index(fields=["inventory_item", "status", "start_date", "end_date"], name="rental_item_range_idx"),
+            models.Index(fields=["start_date", "end_date"], name="rental_range_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.inventory_item} x {self.quantity} ({self.start_date} - {self.end_date})"
+
@@ -0,0 +1,182 @@
+"""
+Rental equipment bookings and availability.
+
+Bookings are inclusive [start_date, end_date] ranges. The database side is
+served by the (item, status, start_date, end_date) index: an overlap query is
+`start_date <= end AND end_date >= start`. For repeated availability checks
+each item's current and future bookings are also kept in process as a static
+interval tree, rebuilt only when that item's bookings change, so "are 20
+free on 12-14 Dec" touches only the overlapping bookings.
+
+An item's capacity is its stock quantity; availability on a day is capacity
+minus the quantity booked that day, and for a range the busiest day counts.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .models import InventoryItem, RentalBooking
+
+# Bookings that ended before this many days ago are left out of the in-process trees
+TREE_HISTORY_DAYS = 90
+
+_trees = {}  # item id -> (version, IntervalTree, horizon)
+
+
+class IntervalTree:
+    """
+    Static interval tree over (start, end, quantity, id) tuples: intervals are
+    sorted by start and read as an implicit balanced BST in which every node
+    also stores the largest end date of its subtree.
+    """
+
+    def __init__(self, intervals):
+        self.items = sorted(intervals, key=lambda i: (i[0], i[1]))
+        self.max_end = [None] * len(self.items)
+        self._build(0, len(self.items))
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        best = self.items[mid][1]
+        for child in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if child is not None and child > best:
+                best = child
+        self.max_end[mid] = best
+        return best
+
+    def overlapping(self, start, end):
+        out = []
+        self._query(0, len(self.items), start, end, out)
+        return out
+
+    def _query(self, lo, hi, start, end, out):
+        if lo >= hi:
+            return
+        mid = (lo + hi) // 2
+        if self.max_end[mid] < start:
+            return  # everything below ends before the range
+        self._query(lo, mid, start, end, out)
+        s, e = self.items[mid][0], self.items[mid][1]
+        if s <= end:
+            if e >= start:
+                out.append(self.items[mid])
+            self._query(mid + 1, hi, start, end, out)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def booked_overlapping(item_id, start, end, exclude_id=None):
+    """(start, end, quantity, id) of BOOKED bookings overlapping the range, straight from the DB."""
+    qs = RentalBooking.objects.filter(
+        inventory_item_id=item_id, status=RentalBooking.BOOKED, start_date__lte=end, end_date__gte=start,
+    )
+    if exclude_id:
+        qs = qs.exclude(id=exclude_id)
+    return list(qs.values_list("start_date", "end_date", "quantity", "id"))
+
+
+def _tree_for(item_id):
+    version = RentalBooking.objects.filter(inventory_item_id=item_id).aggregate(n=Count("id"), updated=Max("updated_at"))
+    version = (version["n"], version["updated"])
+    horizon = timezone.localdate() - timedelta(days=TREE_HISTORY_DAYS)
+    cached = _trees.get(item_id)
+    if cached and cached[0] == version and cached[2] == horizon:
+        return cached[1], horizon
+    tree = IntervalTree(
+        RentalBooking.objects.filter(inventory_item_id=item_id, status=RentalBooking.BOOKED, end_date__gte=horizon)
+        .values_list("start_date", "end_date", "quantity", "id")
+    )
+    _trees[item_id] = (version, tree, horizon)
+    return tree, horizon
+
+
+def peak_booked(intervals, start, end):
+    """Largest total quantity booked on any single day of [start, end]."""
+    points = []
+    for s, e, qty, _ in intervals:
+        points.append((max(s, start), qty))
+        points.append((min(e, end) + timedelta(days=1), -qty))
+    points.sort(key=lambda p: (p[0], p[1]))  # releases before bookings on the same day
+    peak = running = Decimal("0")
+    for _, qty in points:
+        running += qty
+        peak = max(peak, running)
+    return peak
+
+
+def free_quantity(item, start, end):
+    """Quantity of `item` free on every day of [start, end]."""
+    tree, horizon = _tree_for(item.id)
+    if start >= horizon:
+        intervals = tree.overlapping(start, end)
+    else:
+        intervals = booked_overlapping(item.id, start, end)
+    return max(Decimal(item.quantity) - peak_booked(intervals, start, end), Decimal("0"))
+
+
+def is_available(item, quantity, start, end):
+    return free_quantity(item, start, end) >= Decimal(quantity)
+
+
+def book(item, quantity, start, end, event=None, note=""):
+    """
+    Create a booking after re-checking availability under a row lock on the
+    item; the lock serialises bookings of the item, so the tree's version
+    check sees every committed booking.
+    """
+    quantity = Decimal(quantity)
+    if quantity <= 0:
+        raise ValueError("Quantity must be greater than zero.")
+    if end < start:
+        raise ValueError("End date cannot be before start date.")
+    with transaction.atomic():
+        item = InventoryItem.objects.select_for_update().get(pk=item.pk)
+        free = free_quantity(item, start, end)
+        if quantity > free:
+            raise ValueError(f"Only {free.normalize():f} {item.name} free between {start} and {end}.")
+        return RentalBooking.objects.create(
+            inventory_item=item, event=event, start_date=start, end_date=end, quantity=quantity, note=note,
+        )
+
+
+def rentable_items():
+    return InventoryItem.objects.filter(Q(rent_price__isnull=False) | (Q(rent_type__isnull=False) & ~Q(rent_type="")))
+
+
+def month_grid(month_start, items):
+    """
+    Availability per item per day of the month starting at `month_start`.
+    One indexed range query loads every booking overlapping the month; daily
+    totals come from a difference array per item.
+    """
+    next_month = (month_start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    month_end = next_month - timedelta(days=1)
+    days = [month_start + timedelta(days=i) for i in range((month_end - month_start).days + 1)]
+
+    items = list(items)
+    diff = {item.id: [Decimal("0")] * (len(days) + 1) for item in items}
+    bookings = RentalBooking.objects.filter(
+        inventory_item_id__in=diff.keys(), status=RentalBooking.BOOKED,
+        start_date__lte=month_end, end_date__gte=month_start,
+    ).values_list("inventory_item_id", "start_date", "end_date", "quantity")
+    for item_id, s, e, qty in bookings:
+        first = (max(s, month_start) - month_start).days
+        last = (min(e, month_end) - month_start).days
+        diff[item_id][first] += qty
+        diff[item_id][last + 1] -= qty
+
+    rows = []
+    for item in items:
+        running = Decimal("0")
+        cells = []
+        for i in range(len(days)):
+            running += diff[item.id][i]
+            cells.append({"booked": running, "free": Decimal(item.quantity) - running})
+        rows.append({"item": item, "cells": cells})
+    return days, rows
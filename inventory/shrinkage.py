@@ -0,0 +1,185 @@
+"""
+Shrinkage analytics: wastage/damage and theoretical vs actual usage.
+
+Figures are computed one calendar month at a time with grouped queries:
+
+- losses: WASTE/DAMAGE movements, hot and archived, grouped by event and type
+- actual usage: OUT + WASTE + DAMAGE totals per item from the movement cube
+- theoretical usage: stock needed by the orders delivered in the month (see
+  demand.stock_demand)
+
+Months that have closed are cached under a stamp of their usage movements and
+delivered orders (count and highest id; movements are never edited in place),
+so late rows and compaction invalidate them; the current month is always
+recomputed.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, F, Max, Sum
+from django.utils import timezone
+
+from ordersapp.models import Order
+from .compaction import add_months, month_start
+from .demand import stock_demand
+from .models import InventoryItem, StockMovement, StockMovementArchive, StockMovementCube
+
+CLOSED_MONTH_CACHE_SECONDS = 60 * 60 * 24 * 31
+USAGE_TYPES = (StockMovement.OUT,) + StockMovement.LOSS_TYPES
+ZERO = Decimal("0")
+
+_QTY = DecimalField(max_digits=20, decimal_places=6)
+
+
+def _theoretical(month, next_month):
+    return stock_demand(status=Order.STATUS_DELIVERED, delivered_date__gte=month, delivered_date__lt=next_month)
+
+
+def _movements(month, next_month):
+    """Usage per item from the movement cube; losses per event from hot and archived movements."""
+    by_item = {}   # item_id -> {type: qty}
+    by_event = {}  # (event_id, event title) -> {type: qty, "cost": value}
+
+    cells = StockMovementCube.objects.filter(month=month, movement_type__in=USAGE_TYPES)
+    for item_id, mtype, qty in cells.values_list("inventory_item_id", "movement_type", "quantity"):
+        by_item.setdefault(item_id, {})[mtype] = qty
+
+    window = {
+        "movement_type__in": StockMovement.LOSS_TYPES, "event__isnull": False,
+        "business_date__gte": month, "business_date__lt": next_month,
+    }
+    losses = [
+        r
+        for model in (StockMovement, StockMovementArchive)
+        for r in model.objects.filter(**window)
+        .values("event_id", "event__title", "event__event_date", "movement_type")
+        .annotate(
+            qty=Sum("quantity"),
+            cost=Sum(F("quantity") * F("inventory_item__price_per_unit"), output_field=_QTY),
+        )
+        .order_by()
+    ]
+    for r in losses:
+        ev = by_event.setdefault(r["event_id"], {
+            "event_id": r["event_id"],
+            "event": r["event__title"],
+            "event_date": r["event__event_date"],
+            StockMovement.WASTE: ZERO,
+            StockMovement.DAMAGE: ZERO,
+            "cost": ZERO,
+        })
+        ev[r["movement_type"]] += r["qty"]
+        ev["cost"] += r["cost"] or ZERO
+    return by_item, list(by_event.values())
+
+
+def compute_month(month):
+    month = month_start(month)
+    next_month = add_months(month, 1)
+    by_item, by_event = _movements(month, next_month)
+    theoretical = _theoretical(month, next_month)
+
+    item_ids = by_item.keys() | theoretical.keys()
+    info = {
+        r[0]: r for r in InventoryItem.objects.filter(id__in=item_ids)
+        .values_list("id", "stock_code", "name", "category__name", "uom__abbreviation", "price_per_unit")
+    }
+    items = []
+    for item_id in item_ids:
+        if item_id not in info:
+            continue
+        _, code, name, category, uom, price = info[item_id]
+        types = by_item.get(item_id, {})
+        wasted = types.get(StockMovement.WASTE, ZERO)
+        damaged = types.get(StockMovement.DAMAGE, ZERO)
+        actual = types.get(StockMovement.OUT, ZERO) + wasted + damaged
+        theo = theoretical.get(item_id, ZERO)
+        price = price or ZERO
+        items.append({
+            "id": item_id,
+            "stock_code": code,
+            "name": name,
+            "category": category,
+            "uom": uom,
+            "wasted": wasted,
+            "damaged": damaged,
+            "loss_cost": ((wasted + damaged) * price).quantize(Decimal("0.01")),
+            "theoretical": theo,
+            "actual": actual,
+            "variance": actual - theo,
+            "variance_cost": ((actual - theo) * price).quantize(Decimal("0.01")),
+        })
+    for ev in by_event:
+        ev["cost"] = ev["cost"].quantize(Decimal("0.01"))
+    return {"month": month, "items": items, "events": by_event}
+
+
+def _stamp(month):
+    next_month = add_months(month, 1)
+    moves = StockMovement.objects.filter(
+        movement_type__in=USAGE_TYPES, business_date__gte=month, business_date__lt=next_month,
+    ).aggregate(n=Count("id"), last=Max("id"))
+    orders = Order.objects.filter(
+        status=Order.STATUS_DELIVERED, delivered_date__gte=month, delivered_date__lt=next_month,
+    ).aggregate(n=Count("id"), last=Max("id"))
+    return f"{moves['n']}.{moves['last']}.{orders['n']}.{orders['last']}"
+
+
+def get_month(month):
+    month = month_start(month)
+    if month >= month_start(timezone.localdate()):
+        return compute_month(month)
+    key = f"shrinkage:{month:%Y-%m}:{_stamp(month)}"
+    return cache.get_or_set(key, lambda: compute_month(month), CLOSED_MONTH_CACHE_SECONDS)
+
+
+def _merge(rows, key, sum_fields):
+    merged = {}
+    for r in rows:
+        k = r[key]
+        if k not in merged:
+            merged[k] = dict(r)
+        else:
+            for f in sum_fields:
+                merged[k][f] += r[f]
+    return list(merged.values())
+
+
+def report(start_month, end_month):
+    """Shrinkage for the months [start_month, end_month], by month, item, category and event."""
+    months = []
+    m = month_start(start_month)
+    while m <= end_month:
+        months.append(get_month(m))
+        m = add_months(m, 1)
+
+    item_fields = ["wasted", "damaged", "loss_cost", "theoretical", "actual", "variance", "variance_cost"]
+    items = _merge([r for mo in months for r in mo["items"]], "id", item_fields)
+    items.sort(key=lambda r: (-r["loss_cost"], -abs(r["variance_cost"]), r["name"]))
+
+    categories = {}
+    for r in items:
+        c = categories.setdefault(r["category"], {"category": r["category"], "loss_cost": ZERO, "variance_cost": ZERO, "items": 0})
+        c["loss_cost"] += r["loss_cost"]
+        c["variance_cost"] += r["variance_cost"]
+        c["items"] += 1
+
+    events = _merge([e for mo in months for e in mo["events"]], "event_id", [StockMovement.WASTE, StockMovement.DAMAGE, "cost"])
+    events.sort(key=lambda e: -e["cost"])
+
+    monthly = [{
+        "month": mo["month"],
+        "loss_cost": sum((r["loss_cost"] for r in mo["items"]), ZERO),
+        "variance_cost": sum((r["variance_cost"] for r in mo["items"]), ZERO),
+    } for mo in months]
+
+    return {
+        "items": items,
+        "categories": sorted(categories.values(), key=lambda c: -c["loss_cost"]),
+        "events": events,
+        "monthly": monthly,
+        "totals": {
+            "loss_cost": sum((m["loss_cost"] for m in monthly), ZERO),
+            "variance_cost": sum((m["variance_cost"] for m in monthly), ZERO),
+        },
+    }
@@ -0,0 +1,210 @@
+"""
+Bulk stock intake from CSV.
+
+Used by the `import_stock` upload view and the `import_stock` management
+command. Rows are validated up front (categories, UOMs and suppliers are
+resolved with one query each), then written chunk by chunk: every chunk gets
+a block of stock codes, one `bulk_create` for the items and one for their
+initial IN movements, inside its own transaction.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from core.csv_import import ImportResult, normalize_key
+from suppliers.models import Supplier
+from .models import InventoryItem, InventoryCategory, UnitOfMeasure, StockMovement
+from .catalog_match import build_index
+from . import supplier_link
+from .locations import apply_deltas
+
+DEFAULT_CHUNK_SIZE = 500
+
+COLUMNS = [
+    "name",
+    "category",
+    "quantity",
+    "price_per_unit",
+    "uom",
+    "description",
+    "barcode",
+    "supplier_name",
+    "supplier_phone",
+    "supplier_cnic",
+    "supplier_address",
+    "total_amount",
+    "paid_amount",
+    "payment_method",
+    "min_quantity",
+]
+
+
+def _decimal(val, field, default=None):
+    val = (val or "").strip()
+    if not val:
+        if default is None:
+            raise ValueError(f"{field} is required.")
+        return Decimal(default)
+    try:
+        return Decimal(val)
+    except InvalidOperation:
+        raise ValueError(f"{field} must be a number, got '{val}'.")
+
+
+def _int(val, field, default=None):
+    val = (val or "").strip()
+    if not val:
+        if default is None:
+            raise ValueError(f"{field} is required.")
+        return default
+    try:
+        return int(val)
+    except ValueError:
+        raise ValueError(f"{field} must be a whole number, got '{val}'.")
+
+
+def _lookups():
+    """Load categories, UOMs and suppliers once, keyed by normalised name."""
+    categories = {normalize_key(c.name): c for c in InventoryCategory.objects.all()}
+    uoms = {}
+    for u in UnitOfMeasure.objects.all():
+        uoms[normalize_key(u.name)] = u
+        uoms[normalize_key(u.abbreviation)] = u
+    suppliers = {}
+    for s in Supplier.objects.filter(is_active=True):
+        suppliers.setdefault(normalize_key(s.name), s)
+        if s.supplier_id:
+            suppliers.setdefault(normalize_key(s.supplier_id), s)
+    return categories, uoms, suppliers
+
+
+def build_item(row, categories, uoms, suppliers):
+    """Validate one CSV row and return an unsaved InventoryItem (raises ValueError)."""
+    name = row.get("name", "")
+    if not name:
+        raise ValueError("name is required.")
+
+    category = categories.get(normalize_key(row.get("category")))
+    if not category:
+        raise ValueError(f"Unknown category '{row.get('category', '')}'.")
+    uom = uoms.get(normalize_key(row.get("uom")))
+    if not uom:
+        raise ValueError(f"Unknown unit of measure '{row.get('uom', '')}'.")
+
+    quantity = _decimal(row.get("quantity"), "quantity")
+    if quantity <= 0:
+        raise ValueError("quantity must be greater than zero.")
+    price_per_unit = _decimal(row.get("price_per_unit"), "price_per_unit")
+    total_amount = _decimal(row.get("total_amount"), "total_amount", default=price_per_unit * quantity)
+    paid_amount = _decimal(row.get("paid_amount"), "paid_amount", default="0")
+    if paid_amount > total_amount:
+        raise ValueError("Paid amount cannot exceed total amount.")
+
+    min_quantity = _int(row.get("min_quantity"), "min_quantity", default=0)
+    if min_quantity < 0:
+        raise ValueError("min_quantity cannot be negative.")
+
+    payment_method = (row.get("payment_method") or "cash").lower()
+    if payment_method not in dict(InventoryItem.PAYMENT_METHODS):
+        raise ValueError(f"Unknown payment method '{payment_method}'.")
+
+    # Link to a known supplier when the name matches; otherwise keep the free text.
+    supplier_name = row.get("supplier_name", "")
+    supplier = suppliers.get(normalize_key(supplier_name))
+    if supplier:
+        supplier_name = supplier.name
+
+    return InventoryItem(
+        name=name,
+        category=category,
+        quantity=quantity,
+        price_per_unit=price_per_unit,
+        uom=uom,
+        description=row.get("description") or None,
+        barcode=row.get("barcode") or None,
+        supplier=supplier,
+        supplier_name=supplier_name,
+        supplier_phone=row.get("supplier_phone") or (supplier.phone if supplier else None) or None,
+        supplier_cnic=row.get("supplier_cnic") or None,
+        supplier_address=row.get("supplier_address") or (supplier.address if supplier else None) or None,
+        total_amount=total_amount,
+        paid_amount=paid_amount,
+        payment_method=payment_method,
+        min_quantity=min_quantity,
+    )
+
+
+def _write_chunk(items, note, linker=None):
+    with transaction.atomic():
+        if linker is not None:
+            linker.create_pending(items)
+        codes = InventoryItem.allocate_stock_codes(len(items))
+        for item, code in zip(items, codes):
+            item.stock_code = code
+        InventoryItem.objects.bulk_create(items)
+        # MySQL does not return primary keys from bulk inserts.
+        if any(item.pk is None for item in items):
+            ids = dict(InventoryItem.objects.filter(stock_code__in=codes).values_list("stock_code", "id"))
+            for item in items:
+                item.pk = ids[item.stock_code]
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                inventory_item=item,
+                movement_type=StockMovement.IN,
+                quantity=item.quantity,
+                unit_cost=item.price_per_unit,
+                note=note,
+            )
+            for item in items
+        ])
+        apply_deltas({item.pk: item.quantity for item in items})
+
+
+def import_stock(rows, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False, note="Bulk import"):
+    """
+    Import (line number, row dict) pairs. Invalid rows are reported and skipped;
+    valid rows are written in chunks of `chunk_size`.
+    """
+    result = ImportResult()
+    categories, uoms, suppliers = _lookups()
+
+    pending = []
+    for line, row in rows:
+        try:
+            pending.append((line, build_item(row, categories, uoms, suppliers)))
+        except ValueError as e:
+            result.add_error(line, str(e))
+
+    # Barcodes are unique: reject rows that clash with stock or with earlier rows
+    barcodes = {item.barcode for _, item in pending if item.barcode}
+    taken = set(InventoryItem.objects.filter(barcode__in=barcodes).values_list("barcode", flat=True)) if barcodes else set()
+    valid = []
+    for line, item in pending:
+        if item.barcode and item.barcode in taken:
+            result.add_error(line, f"Barcode '{item.barcode}' is already in use.")
+            continue
+        if item.barcode:
+            taken.add(item.barcode)
+        valid.append(item)
+    pending = valid
+
+    catalog = build_index()
+    for item in pending:
+        item.base_item_id = catalog.match(item.name, item.uom_id)
+
+    if dry_run:
+        result.created = len(pending)
+        return result
+
+    # Rows whose supplier name did not match exactly: match on phone/fuzzy name.
+    # Suppliers that do not exist yet are created with the first chunk using them.
+    linker = supplier_link.build_index()
+    for item in pending:
+        if item.supplier_id is None:
+            item.supplier_id = linker.resolve(item.supplier_name, item.supplier_phone, item.supplier_address)
+
+    for i in range(0, len(pending), chunk_size):
+        chunk = pending[i:i + chunk_size]
+        _write_chunk(chunk, note, linker)
+        result.created += len(chunk)
+    return result
@@ -0,0 +1,186 @@
+"""
+Link InventoryItem stock rows to Supplier records.
+
+Stock rows carry the supplier as free text (name, phone, CNIC, address). Each
+row is matched on, in order: phone (last 10 digits), the normalised name
+(case, punctuation and "pvt"/"ltd"-style suffixes dropped), and finally the
+closest name above `threshold` among suppliers sharing a blocking key with it
+(see catalog_match.blocking_keys). The CNIC is not used: suppliers have no
+CNIC field, and their tax number is the GST/NTN.
+
+Bulk runs (`link_stock_items`, the CSV import) load every supplier into a
+SupplierIndex. Rows nothing matches get a pending Supplier built from their
+own details, indexed under a placeholder id so later rows with the same phone
+or name share it; `create_pending` inserts the pending suppliers a batch needs
+in one go, inside that batch's transaction. Single-row forms use
+`find_existing`, which only links to suppliers that already exist.
+"""
+import re
+from collections import defaultdict
+from difflib import SequenceMatcher
+from uuid import uuid4
+
+from django.db import transaction
+from django.db.models import Q
+
+from suppliers.models import Supplier
+from .catalog_match import blocking_keys
+from .models import InventoryItem
+
+DEFAULT_THRESHOLD = 0.9
+BATCH_SIZE = 1000
+
+_NON_DIGIT = re.compile(r"\D+")
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+_SUFFIXES = {"pvt", "private", "ltd", "limited", "co", "company", "the", "and", "m", "s"}
+
+
+def normalize_phone(phone):
+    """Last 10 digits, so +92 300..., 0300... and 300... agree; None when too short to trust."""
+    digits = _NON_DIGIT.sub("", phone or "")
+    return digits[-10:] if len(digits) >= 7 else None
+
+
+def normalize_name(name):
+    words = _NON_WORD.sub(" ", (name or "").casefold()).split()
+    return " ".join(w for w in words if w not in _SUFFIXES) or " ".join(words)
+
+
+class SupplierIndex:
+    def __init__(self, suppliers):
+        self.by_phone = {}
+        self.by_name = {}
+        self.blocks = defaultdict(list)
+        self.pending = {}  # placeholder id (< 0) -> unsaved Supplier
+        self.created = {}  # placeholder id -> id of the Supplier created for it
+        for supplier_id, name, phone in suppliers:
+            self.add(supplier_id, name, phone)
+
+    def add(self, supplier_id, name, phone=None):
+        phone, norm = normalize_phone(phone), normalize_name(name)
+        if phone:
+            self.by_phone.setdefault(phone, supplier_id)
+        if norm and norm not in self.by_name:
+            self.by_name[norm] = supplier_id
+            for key in blocking_keys(norm):
+                self.blocks[key].append((supplier_id, norm))
+
+    def match(self, name, phone=None, threshold=DEFAULT_THRESHOLD):
+        """Return the supplier id for a stock row's supplier details, or None."""
+        phone, norm = normalize_phone(phone), normalize_name(name)
+        if phone and phone in self.by_phone:
+            return self.by_phone[phone]
+        if not norm:
+            return None
+        if norm in self.by_name:
+            return self.by_name[norm]
+
+        best, best_score = None, threshold
+        seen = set()
+        for key in blocking_keys(norm):
+            for supplier_id, cand in self.blocks.get(key, ()):
+                if supplier_id in seen:
+                    continue
+                seen.add(supplier_id)
+                score = SequenceMatcher(None, norm, cand).ratio()
+                if score >= best_score:
+                    best, best_score = supplier_id, score
+        return best
+
+    def resolve(self, name, phone=None, address=None, threshold=DEFAULT_THRESHOLD):
+        """
+        Matching supplier id or, when none matches, the placeholder id of a new
+        pending Supplier (see `create_pending`); None without a name.
+        """
+        supplier_id = self.match(name, phone, threshold)
+        name = " ".join((name or "").split())
+        if supplier_id is None and normalize_name(name):
+            supplier_id = -(len(self.pending) + 1)
+            self.pending[supplier_id] = Supplier(name=name, phone=(phone or "").strip(), address=(address or "").strip())
+            self.add(supplier_id, name, phone)
+        return supplier_id
+
+    def create_pending(self, items):
+        """
+        Create the pending suppliers that `items` (stock rows) point at with one
+        bulk insert and repoint the rows at them. Call inside the transaction
+        that saves the rows.
+        """
+        keys = sorted({i.supplier_id for i in items if i.supplier_id is not None and i.supplier_id < 0} - self.created.keys())
+        if keys:
+            suppliers = [self.pending[key] for key in keys]
+            # MySQL does not return primary keys from bulk inserts: tag the rows to find them again
+            for supplier in suppliers:
+                supplier.supplier_id = f"NEW-{uuid4().hex}"
+            Supplier.objects.bulk_create(suppliers)
+            ids = dict(Supplier.objects.filter(supplier_id__in=[s.supplier_id for s in suppliers]).values_list("supplier_id", "id"))
+            for key, supplier in zip(keys, suppliers):
+                supplier.pk = ids[supplier.supplier_id]
+                supplier.supplier_id = f"SUP-{supplier.pk:04d}"
+                self.created[key] = supplier.pk
+            Supplier.objects.bulk_update(suppliers, ["supplier_id"])
+        for item in items:
+            if item.supplier_id is not None and item.supplier_id < 0:
+                item.supplier_id = self.created[item.supplier_id]
+
+
+def build_index():
+    return SupplierIndex(Supplier.objects.order_by("-is_active", "pk").values_list("id", "name", "phone"))
+
+
+def find_existing(name, phone=None, threshold=DEFAULT_THRESHOLD):
+    """
+    Existing supplier id for one stock row's details, or None. Only suppliers
+    whose name equals the row's (ignoring case) or whose phone is stored as
+    given are considered, so both lookups use the name/phone indexes.
+    """
+    name = " ".join((name or "").split())
+    phone = (phone or "").strip()
+    cond = Q()
+    if name:
+        cond |= Q(name__iexact=name)
+    if phone:
+        cond |= Q(phone__in={phone, _NON_DIGIT.sub("", phone)})
+    if not cond:
+        return None
+    candidates = Supplier.objects.filter(cond).order_by("-is_active", "pk").values_list("id", "name", "phone")[:50]
+    return SupplierIndex(candidates).match(name, phone, threshold)
+
+
+def link_stock_items(relink=False, create=True, threshold=DEFAULT_THRESHOLD, dry_run=False, batch_size=BATCH_SIZE):
+    """
+    Match stock rows to suppliers. Only unlinked rows are considered unless
+    `relink`; unmatched rows get a new Supplier when `create`. Returns
+    (matched, created, unmatched) counts.
+    """
+    index = build_index()
+    qs = InventoryItem.objects.order_by("id")
+    if not relink:
+        qs = qs.filter(supplier__isnull=True)
+
+    matched = unmatched = 0
+    last_id = 0
+    while True:
+        rows = list(qs.filter(id__gt=last_id).values_list(
+            "id", "supplier_name", "supplier_phone", "supplier_address", "supplier_id",
+        )[:batch_size])
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        changed = []
+        with transaction.atomic():
+            for item_id, name, phone, address, current in rows:
+                if create:
+                    supplier_id = index.resolve(name, phone, address, threshold)
+                else:
+                    supplier_id = index.match(name, phone, threshold)
+                if supplier_id is None:
+                    unmatched += 1
+                    continue
+                matched += 1
+                if supplier_id != current:
+                    changed.append(InventoryItem(id=item_id, supplier_id=supplier_id))
+            if changed and not dry_run:
+                index.create_pending(changed)
+                InventoryItem.objects.bulk_update(changed, ["supplier"])
+    return matched, len(index.pending), unmatched
@@ -1,3 +1,482 @@
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
 from django.test import TestCase
 
-# Create your tests here.
+from customers.models import Customer
+from ordersapp.models import Event, MenuItem, Order, OrderItem, OrderMenuItem, RecipeItem
+from suppliers.models import Supplier
+from . import assets, catalog_match, cube, cycle_count, forecasting, locations, rentals, shrinkage, stock_import, supplier_link, units, valuation
+from .demand import stock_demand
+from .compaction import compact_movements
+from .models import AssetMovement, InventoryBaseItem, InventoryCategory, InventoryItem, StockBalance, StockLocation, StockMovement, StockMovementArchive, StockMovementCube, UnitConversion, UnitOfMeasure
+
+
+class InventoryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.uom, _ = UnitOfMeasure.objects.get_or_create(name="Kilogram", defaults={"abbreviation": "kg"})
+        cls.category, _ = InventoryCategory.objects.get_or_create(name="General")
+        cls.item = InventoryItem.objects.create(
+            name="Rice", category=cls.category, uom=cls.uom, quantity=Decimal("0"),
+            price_per_unit=Decimal("1"), total_amount=Decimal("0"), supplier_name="Test",
+        )
+        cls.user = User.objects.create_user("tester", password="x")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+
+class CompactionTests(InventoryTestCase):
+    def test_archive_keeps_cost_location_and_reason(self):
+        store = StockLocation.objects.create(name="Test Store")
+        kitchen = StockLocation.objects.create(name="Test Kitchen")
+        moves = [
+            StockMovement.objects.create(inventory_item=self.item, movement_type=StockMovement.IN, quantity=Decimal("5"), unit_cost=Decimal("2.5"), location=store),
+            StockMovement.objects.create(inventory_item=self.item, movement_type=StockMovement.TRANSFER, quantity=Decimal("2"), location=store, to_location=kitchen),
+            StockMovement.objects.create(inventory_item=self.item, movement_type=StockMovement.WASTE, quantity=Decimal("1"), reason="spoiled"),
+        ]
+        StockMovement.objects.filter(pk__in=[m.pk for m in moves]).update(business_date=date(2020, 1, 15))
+
+        self.assertEqual(compact_movements(date(2020, 2, 1)), 3)
+        archived = {a.original_id: a for a in StockMovementArchive.objects.all()}
+        self.assertEqual(archived[moves[0].pk].unit_cost, Decimal("2.5"))
+        self.assertEqual(archived[moves[0].pk].location, store)
+        self.assertEqual((archived[moves[1].pk].location, archived[moves[1].pk].to_location), (store, kitchen))
+        self.assertEqual(archived[moves[2].pk].reason, "spoiled")
+
+    def test_report_ignores_invalid_month(self):
+        response = self.client.get("/inventory/reports/usage/", {"start": "2025-13", "end": "2025-02-30"})
+        self.assertEqual(response.status_code, 200)
+
+
+class CubeTests(InventoryTestCase):
+    def snapshot(self):
+        return sorted(StockMovementCube.objects.values_list("inventory_item_id", "month", "movement_type", "quantity", "cost", "movement_count"))
+
+    def test_record_matches_rebuild(self):
+        flour = InventoryItem.objects.create(
+            name="Flour", category=self.category, uom=self.uom, quantity=Decimal("0"),
+            price_per_unit=Decimal("3"), total_amount=Decimal("0"), supplier_name="Test",
+        )
+        StockMovement.objects.create(inventory_item=self.item, movement_type=StockMovement.IN, quantity=Decimal("4"), unit_cost=Decimal("2.5"), business_date=date(2025, 1, 31))
+        StockMovement.objects.bulk_create([
+            StockMovement(inventory_item=item, movement_type=mtype, quantity=Decimal(qty), unit_cost=cost, business_date=day)
+            for item, mtype, qty, cost, day in [
+                (self.item, StockMovement.IN, "6", Decimal("2"), date(2025, 1, 5)),
+                (self.item, StockMovement.OUT, "3", None, date(2025, 1, 20)),
+                (self.item, StockMovement.OUT, "1.5", None, date(2025, 2, 1)),
+                (flour, StockMovement.WASTE, "2", None, date(2025, 2, 14)),
+                (flour, StockMovement.ADJUST, "-1", None, date(2025, 3, 2)),
+            ]
+        ])
+        compact_movements(date(2025, 2, 1))
+        StockMovement.objects.create(inventory_item=flour, movement_type=StockMovement.IN, quantity=Decimal("5"), unit_cost=Decimal("3.2"), business_date=date(2025, 2, 3))
+
+        incremental = self.snapshot()
+        self.assertEqual(len(incremental), 6)
+        cube.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+
+class AssetTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.chairs = InventoryBaseItem.objects.create(name="Chair", uom=self.uom, price=Decimal("1"), qty_available=Decimal("50"))
+        self.tables = InventoryBaseItem.objects.create(name="Table", uom=self.uom, price=Decimal("1"), qty_available=Decimal("10"))
+        customer = Customer(name="Test")
+        customer.save()
+        self.event = Event.objects.create(customer=customer, title="Wedding", event_date=date(2026, 5, 1), location="Hall")
+
+    def buckets(self, item):
+        item.refresh_from_db()
+        return item.qty_available, item.qty_reserved, item.qty_in_use, item.qty_damaged
+
+    def test_check_out_and_return(self):
+        A, R, U, D = AssetMovement.AVAILABLE, AssetMovement.RESERVED, AssetMovement.IN_USE, AssetMovement.DAMAGED
+        assets.transition([(self.chairs.pk, A, R, 40), (self.tables.pk, A, R, 8)], event=self.event)
+        moved = assets.transition([(self.chairs.pk, R, U, 40), (self.tables.pk, R, U, 8), (self.tables.pk, A, U, 0)], event=self.event, note="Out")
+        self.assertEqual(len(moved), 2)
+        self.assertEqual(assets.event_balances(self.event)[self.chairs.pk], {"out": Decimal("40"), "damaged": Decimal("0")})
+
+        assets.transition([(self.chairs.pk, U, A, 37), (self.chairs.pk, U, D, 3), (self.tables.pk, U, A, 8)], event=self.event)
+        self.assertEqual(self.buckets(self.chairs), (Decimal("47"), Decimal("0"), Decimal("0"), Decimal("3")))
+        self.assertEqual(self.buckets(self.tables), (Decimal("10"), Decimal("0"), Decimal("0"), Decimal("0")))
+        self.assertEqual(assets.event_balances(self.event)[self.chairs.pk], {"out": Decimal("0"), "damaged": Decimal("3")})
+
+        log = list(AssetMovement.objects.filter(base_item=self.chairs, event=self.event).order_by("pk").values_list("from_bucket", "to_bucket", "quantity"))
+        self.assertEqual(log, [(A, R, Decimal("40")), (R, U, Decimal("40")), (U, A, Decimal("37")), (U, D, Decimal("3"))])
+
+    def test_rejected_transition_changes_nothing(self):
+        A, U = AssetMovement.AVAILABLE, AssetMovement.IN_USE
+        with self.assertRaisesMessage(ValueError, "Not enough Table in available (have 10, need 12)"):
+            assets.transition([(self.chairs.pk, A, U, 5), (self.tables.pk, A, U, 7), (self.tables.pk, A, U, 5)])
+        with self.assertRaises(ValueError):
+            assets.transition([(self.chairs.pk, A, A, 1)])
+        with self.assertRaises(ValueError):
+            assets.transition([(self.chairs.pk, A, "lost", 1)])
+        self.assertEqual(self.buckets(self.chairs), (Decimal("50"), Decimal("0"), Decimal("0"), Decimal("0")))
+        self.assertEqual(self.buckets(self.tables)[0], Decimal("10"))
+        self.assertFalse(AssetMovement.objects.exists())
+
+
+class CycleCountTests(InventoryTestCase):
+    def stock(self, name, quantity):
+        return InventoryItem.objects.create(
+            name=name, category=self.category, uom=self.uom, quantity=Decimal(quantity),
+            price_per_unit=Decimal("1"), total_amount=Decimal("0"), supplier_name="Test",
+        )
+
+    def quantity(self, item):
+        return InventoryItem.objects.get(pk=item.pk).quantity
+
+    def test_commit_applies_variances_on_top_of_current_stock(self):
+        flour, salt, oil, sugar = self.stock("Flour", "5"), self.stock("Salt", "3"), self.stock("Oil", "4"), self.stock("Sugar", "2")
+        InventoryItem.objects.filter(pk=self.item.pk).update(quantity=Decimal("10"))
+        session = cycle_count.start_session("March count")
+        # Stock moves while the count is in progress
+        InventoryItem.objects.filter(pk=self.item.pk).update(quantity=Decimal("12"))
+        InventoryItem.objects.filter(pk=oil.pk).update(quantity=Decimal("1"))
+
+        counts, errors = cycle_count.parse_count_csv(session, BytesIO(
+            f"stock_code,counted_quantity\n{self.item.stock_code},8\n{flour.stock_code},7\n"
+            f"{oil.stock_code},0\n{sugar.stock_code},2\nNOPE,1\n{salt.stock_code},-1\n".encode()
+        ))
+        self.assertEqual([line for line, _ in errors], [6, 7])
+        self.assertEqual(cycle_count.record_counts(session, counts), 4)
+
+        self.assertEqual(cycle_count.commit_session(session), 3)
+        # Rice 12 - 2, flour 5 + 2, oil 1 - 4 stops at 0; sugar matched, salt uncounted
+        self.assertEqual(
+            [self.quantity(i) for i in (self.item, flour, oil, sugar, salt)],
+            [Decimal("10"), Decimal("7"), Decimal("0"), Decimal("2"), Decimal("3")],
+        )
+        adjustments = dict(StockMovement.objects.filter(movement_type=StockMovement.ADJUST).values_list("inventory_item_id", "quantity"))
+        self.assertEqual(adjustments, {self.item.pk: Decimal("-2"), flour.pk: Decimal("2"), oil.pk: Decimal("-1")})
+        self.assertEqual(session.lines.get(inventory_item=oil).applied_quantity, Decimal("-1"))
+
+        session.refresh_from_db()
+        self.assertEqual(session.status, session.COMMITTED)
+        with self.assertRaises(ValueError):
+            cycle_count.commit_session(session)
+        with self.assertRaises(ValueError):
+            cycle_count.record_counts(session, {flour.pk: Decimal("1")})
+        self.assertEqual(self.quantity(flour), Decimal("7"))
+
+
+class ValuationTests(InventoryTestCase):
+    def stock(self, name, quantity, price, receipts=()):
+        item = InventoryItem.objects.create(
+            name=name, category=self.category, uom=self.uom, quantity=Decimal(quantity),
+            price_per_unit=Decimal(price), total_amount=Decimal("0"), supplier_name="Test",
+        )
+        for qty, cost in receipts:  # oldest first
+            StockMovement.objects.create(
+                inventory_item=item, movement_type=StockMovement.IN, quantity=Decimal(qty), unit_cost=cost and Decimal(cost),
+            )
+        return item
+
+    def test_fifo_and_average_against_layers(self):
+        # 10 @ 2.00 then 5 @ 3.00, 8 on hand: FIFO = 5 x 3 + 3 x 2 = 21; average = 35 / 15 = 2.3333
+        self.stock("Flour", "8", "9", [("10", "2"), ("5", "3")])
+        # 4 @ 1.10 then 2 without a cost (item price 1.25), 10 on hand: 4 uncovered units at the item price
+        self.stock("Sugar", "10", "1.25", [("4", "1.10"), ("2", None)])
+        empty = self.stock("Salt", "0", "4", [("6", "3.5")])
+        self.stock("Oil", "3", "2.50")
+
+        data = valuation.compute_valuation()
+        rows = {r["name"]: r for r in data["items"]}
+        self.assertEqual(
+            (rows["Flour"]["fifo_value"], rows["Flour"]["avg_cost"], rows["Flour"]["average_value"]),
+            (Decimal("21.00"), Decimal("2.3333"), Decimal("18.67")),
+        )
+        self.assertEqual(rows["Sugar"]["fifo_value"], Decimal("11.90"))  # 2 x 1.25 + 4 x 1.10 + 4 x 1.25
+        self.assertEqual(rows["Sugar"]["avg_cost"], Decimal("1.1500"))   # (4.40 + 2.50) / 6
+        self.assertEqual(rows["Sugar"]["average_value"], Decimal("11.50"))
+        self.assertEqual((rows["Salt"]["fifo_value"], rows["Salt"]["average_value"], rows["Salt"]["avg_cost"]), (Decimal("0.00"), Decimal("0.00"), Decimal("3.5000")))
+        self.assertEqual((rows["Oil"]["fifo_value"], rows["Oil"]["avg_cost"]), (Decimal("7.50"), Decimal("2.5000")))
+        self.assertEqual(rows["Rice"]["fifo_value"], Decimal("0.00"))
+
+        self.assertEqual(data["totals"], {"fifo": Decimal("40.40"), "average": Decimal("37.67")})
+        self.assertEqual(data["categories"], [{"category": "General", "items": 5, "fifo_value": Decimal("40.40"), "average_value": Decimal("37.67")}])
+
+
+class UnitsTests(InventoryTestCase):
+    def test_convert_many_walks_the_graph(self):
+        gram, _ = UnitOfMeasure.objects.get_or_create(name="Gram", defaults={"abbreviation": "g"})
+        sack = UnitOfMeasure.objects.create(name="Sack", abbreviation="sack")
+        litre, _ = UnitOfMeasure.objects.get_or_create(name="Litre", defaults={"abbreviation": "L"})
+        units.load_default_conversions()
+        UnitConversion.objects.create(from_uom=sack, to_uom=self.uom, factor=Decimal("25"))
+
+        rows = [("2", sack.id, gram.id), (500, gram.id, self.uom.id), ("1.5", self.uom.id, self.uom.id), (3, None, gram.id)]
+        self.assertEqual(units.convert_many(rows), [Decimal("50000"), Decimal("0.5"), Decimal("1.5"), Decimal("3")])
+        self.assertEqual(units.convert_many([]), [])
+        with self.assertRaises(units.ConversionError):
+            units.convert_many([(1, self.uom.id, self.uom.id), (1, self.uom.id, litre.id)])
+
+        conversion = UnitConversion.objects.get(from_uom=sack)
+        conversion.factor = Decimal("50")
+        conversion.save()
+        self.assertEqual(units.convert(1, sack.id, self.uom.id), Decimal("50"))
+
+
+class LocationTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.main = locations.default_location()
+        self.kitchen = StockLocation.objects.create(name="Test Kitchen")
+        self.bar = StockLocation.objects.create(name="Test Bar")
+
+    def balances(self):
+        grid = locations.matrix([self.item], [self.main, self.kitchen, self.bar]).get(self.item.pk, {})
+        return [grid.get(loc.pk, Decimal("0")) for loc in (self.main, self.kitchen, self.bar)]
+
+    def set_total(self, quantity):
+        InventoryItem.objects.filter(pk=self.item.pk).update(quantity=Decimal(quantity))
+
+    def assertTotalOnHand(self):
+        total = sum(StockBalance.objects.filter(inventory_item=self.item).values_list("quantity", flat=True), Decimal("0"))
+        self.assertEqual(total, InventoryItem.objects.get(pk=self.item.pk).quantity)
+
+    def test_transfers_keep_the_total(self):
+        self.set_total("10")
+        self.assertEqual(locations.sync_balances(), {self.item.pk: Decimal("10")})
+        self.assertEqual(self.balances(), [Decimal("10"), Decimal("0"), Decimal("0")])
+
+        moved = locations.transfer([(self.item.pk, "4"), (self.item.pk, "2")], self.main, self.kitchen)
+        self.assertEqual([(m.quantity, m.location, m.to_location) for m in moved], [(Decimal("6"), self.main, self.kitchen)])
+        locations.transfer([(self.item.pk, "2")], self.kitchen, self.bar)
+        self.assertEqual(self.balances(), [Decimal("4"), Decimal("4"), Decimal("2")])
+        self.assertTotalOnHand()
+
+        with self.assertRaisesMessage(ValueError, "Only 4 Rice at Test Kitchen."):
+            locations.transfer([(self.item.pk, "5")], self.kitchen, self.bar)
+        with self.assertRaises(ValueError):
+            locations.transfer([(self.item.pk, "1")], self.bar, self.bar)
+        self.assertEqual(self.balances(), [Decimal("4"), Decimal("4"), Decimal("2")])
+        self.assertEqual(StockMovement.objects.filter(movement_type=StockMovement.TRANSFER).count(), 2)
+
+        # An issue without a location drains the default location, then the others by name
+        self.set_total("3")
+        locations.apply_deltas({self.item.pk: Decimal("-7")})
+        self.assertEqual(self.balances(), [Decimal("0"), Decimal("3"), Decimal("0")])
+        self.assertTotalOnHand()
+
+        self.set_total("5")
+        self.assertEqual(locations.sync_balances(dry_run=True), {self.item.pk: Decimal("2")})
+        locations.sync_balances()
+        self.assertEqual(self.balances(), [Decimal("2"), Decimal("3"), Decimal("0")])
+        self.assertTotalOnHand()
+
+
+class RentalTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        InventoryItem.objects.filter(pk=self.item.pk).update(quantity=Decimal("10"), rent_price=Decimal("5"))
+        self.item.refresh_from_db()
+
+    def test_book_refuses_more_than_free(self):
+        rentals.book(self.item, 6, date(2026, 12, 12), date(2026, 12, 14))
+        with self.assertRaises(ValueError):
+            rentals.book(self.item, 5, date(2026, 12, 14), date(2026, 12, 16))
+        rentals.book(self.item, 4, date(2026, 12, 14), date(2026, 12, 16))
+        self.assertEqual(rentals.free_quantity(self.item, date(2026, 12, 10), date(2026, 12, 20)), Decimal("0"))
+        self.assertEqual(rentals.free_quantity(self.item, date(2026, 12, 15), date(2026, 12, 20)), Decimal("6"))
+
+    def test_availability_endpoint(self):
+        rentals.book(self.item, 7, date(2026, 12, 12), date(2026, 12, 14))
+        response = self.client.get("/inventory/rentals/availability/", {
+            "item": self.item.pk, "start": "2026-12-13", "end": "2026-12-20", "quantity": "4",
+        })
+        self.assertEqual(response.json()["free"], "3")
+        self.assertFalse(response.json()["available"])
+        response = self.client.get("/inventory/rentals/availability/", {"item": self.item.pk, "start": "2026-13-01"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_calendar_ignores_invalid_month(self):
+        self.assertEqual(self.client.get("/inventory/rentals/", {"month": "2025-13"}).status_code, 200)
+
+
+class SupplierLinkTests(InventoryTestCase):
+    def row(self, name, **extra):
+        return {"name": name, "category": "General", "uom": "kg", "quantity": "1", "price_per_unit": "2", **extra}
+
+    def test_find_existing_never_creates(self):
+        known = Supplier.objects.create(name="Karachi Traders", phone="0300-1234567", tax_number="4210112345671")
+        self.assertEqual(supplier_link.find_existing("karachi  traders"), known.pk)
+        self.assertEqual(supplier_link.find_existing("Someone Else", "0300-1234567"), known.pk)
+        self.assertIsNone(supplier_link.find_existing("Lahore Foods", "0321-7654321"))
+        self.assertEqual(Supplier.objects.count(), 1)
+
+    def test_import_creates_each_new_supplier_once(self):
+        known = Supplier.objects.create(name="Karachi Traders", tax_number="4210112345671")
+        rows = [
+            (2, self.row("Flour", supplier_name="Lahore Foods", supplier_phone="+92 321 7654321")),
+            (3, self.row("Sugar", supplier_name="Lahore Foods Pvt Ltd", supplier_cnic="4210112345671")),
+            (4, self.row("Salt", supplier_name="Other", supplier_phone="03217654321")),
+        ]
+        result = stock_import.import_stock(rows, chunk_size=1, dry_run=True)
+        self.assertEqual((result.created, Supplier.objects.count()), (3, 1))
+
+        result = stock_import.import_stock(rows, chunk_size=1)
+        self.assertEqual(result.created, 3)
+        created = Supplier.objects.exclude(pk=known.pk).get()
+        self.assertEqual(created.supplier_id, f"SUP-{created.pk:04d}")
+        linked = set(InventoryItem.objects.filter(name__in=["Flour", "Sugar", "Salt"]).values_list("supplier_id", flat=True))
+        self.assertEqual(linked, {created.pk})
+
+
+class StockImportTests(InventoryTestCase):
+    def test_negative_min_quantity_is_a_row_error(self):
+        rows = [
+            (2, {"name": "Flour", "category": "General", "uom": "kg", "quantity": "1", "price_per_unit": "2", "min_quantity": "-1"}),
+            (3, {"name": "Sugar", "category": "General", "uom": "kg", "quantity": "1", "price_per_unit": "2", "min_quantity": "3"}),
+        ]
+        result = stock_import.import_stock(rows)
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors, [(2, "min_quantity cannot be negative.")])
+        self.assertEqual(InventoryItem.objects.get(name="Sugar").min_quantity, 3)
+
+    def test_command_reports_unreadable_file(self):
+        with tempfile.NamedTemporaryFile(suffix=".csv") as fh:
+            fh.write(b"name,category\n\xff\xfe,General\n")
+            fh.flush()
+            with self.assertRaisesMessage(CommandError, "as CSV"):
+                call_command("import_stock", fh.name, stdout=StringIO(), stderr=StringIO())
+
+
+class CatalogMatchTests(InventoryTestCase):
+    def test_cached_index_follows_catalog_changes(self):
+        rice = InventoryBaseItem.objects.create(name="Basmati Rice", uom=self.uom, price=Decimal("1"))
+        index = catalog_match.cached_index()
+        self.assertIs(catalog_match.cached_index(), index)
+        self.assertEqual(index.match("basmati rice", self.uom.id), rice.pk)
+
+        flour = InventoryBaseItem.objects.create(name="Wheat Flour", uom=self.uom, price=Decimal("1"))
+        self.assertEqual(catalog_match.cached_index().match("Wheat  Flour", self.uom.id), flour.pk)
+        rice.delete()
+        self.assertIsNone(catalog_match.cached_index().match("basmati rice", self.uom.id))
+
+    def test_rename_relinks_catalog_item(self):
+        rice = InventoryBaseItem.objects.create(name="Rice", uom=self.uom, price=Decimal("1"))
+        flour = InventoryBaseItem.objects.create(name="Wheat Flour", uom=self.uom, price=Decimal("1"))
+        InventoryItem.objects.filter(pk=self.item.pk).update(base_item=rice)
+
+        def edit(name, description=""):
+            return self.client.post(f"/inventory/edit/{self.item.pk}/", {
+                "name": name, "category": self.category.pk, "uom": self.uom.pk, "quantity": "0", "price_per_unit": "1",
+                "total_amount": "0", "paid_amount": "0", "payment_method": "cash", "description": description, "supplier_name": "Test",
+            })
+
+        self.assertEqual(edit("Rice", "long grain").status_code, 302)
+        self.assertEqual(InventoryItem.objects.get(pk=self.item.pk).base_item_id, rice.pk)
+        edit("Wheat  flour")
+        self.assertEqual(InventoryItem.objects.get(pk=self.item.pk).base_item_id, flour.pk)
+        edit("Chilli Powder")
+        self.assertIsNone(InventoryItem.objects.get(pk=self.item.pk).base_item_id)
+
+
+class DemandTests(InventoryTestCase):
+    def order(self, status, day, portions, direct):
+        order = Order.objects.create(
+            order_date=day, customer_name="Test", phone_number="0", delivery_date=day, total_amount=Decimal("0"),
+            status=status, delivered_date=day if status == Order.STATUS_DELIVERED else None,
+        )
+        OrderMenuItem.objects.create(order=order, menu_item=self.dish, quantity=portions)
+        OrderItem.objects.create(order=order, inventory_item=self.item, quantity=direct)
+        return order
+
+    def test_recipe_and_direct_lines_in_stock_units(self):
+        gram, _ = UnitOfMeasure.objects.get_or_create(name="Gram", defaults={"abbreviation": "g"})
+        units.load_default_conversions()
+        self.dish = MenuItem.objects.create(name="Biryani")
+        RecipeItem.objects.create(menu_item=self.dish, inventory_item=self.item, quantity_per_portion=Decimal("250"), uom=gram)
+        self.order(Order.STATUS_DELIVERED, date(2026, 3, 5), portions=8, direct=1)
+        self.order(Order.STATUS_PENDING, date(2026, 3, 20), portions=4, direct=2)
+
+        delivered = stock_demand(status=Order.STATUS_DELIVERED, delivered_date__gte=date(2026, 3, 1), delivered_date__lt=date(2026, 4, 1))
+        self.assertEqual(delivered, {self.item.pk: Decimal("3")})
+        pending = stock_demand(status=Order.STATUS_PENDING, delivery_date__lte=date(2026, 3, 31))
+        self.assertEqual(pending, {self.item.pk: Decimal("3")})
+        self.assertEqual(stock_demand(status=Order.STATUS_PENDING, delivery_date__lte=date(2026, 3, 19)), {})
+
+
+class ForecastTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_cached_for_the_day_with_live_cover(self):
+        today = date.today()
+        for days_ago in range(1, 29):
+            move = StockMovement.objects.create(inventory_item=self.item, movement_type=StockMovement.OUT, quantity=Decimal("2"))
+            StockMovement.objects.filter(pk=move.pk).update(business_date=today - timedelta(days=days_ago))
+        InventoryItem.objects.filter(pk=self.item.pk).update(quantity=Decimal("20"))
+
+        entry = forecasting.get_forecast()[self.item.pk]
+        self.assertEqual(entry["ma28"], 2.0)
+        StockMovement.objects.create(inventory_item=self.item, movement_type=StockMovement.OUT, quantity=Decimal("50"))
+        with self.assertNumQueries(0):
+            cached = forecasting.get_forecast()[self.item.pk]
+        self.assertEqual(cached["ma28"], 2.0)
+
+        self.assertEqual(forecasting.with_stock(cached, Decimal("6"), 0)["days_of_cover"], round(6 / cached["daily_demand"], 1))
+        self.assertFalse(forecasting.is_low(forecasting.with_stock(cached, Decimal("1000"), 0), 7))
+        self.assertTrue(forecasting.is_low(forecasting.with_stock(cached, Decimal("1"), 0), 7))
+
+
+    def test_cover_follows_weekday_demand(self):
+        today = date.today()
+        # 4 units every 7th day, on today's weekday only
+        for weeks_ago in range(1, 5):
+            move = StockMovement.objects.create(inventory_item=self.item, movement_type=StockMovement.OUT, quantity=Decimal("4"))
+            StockMovement.objects.filter(pk=move.pk).update(business_date=today - timedelta(weeks=weeks_ago))
+
+        entry = forecasting.compute_forecast(today)[self.item.pk]
+        self.assertEqual(entry["weekday_index"][today.weekday()], 7.0)
+        self.assertEqual(sum(entry["weekday_demand"]), 4.0)
+        self.assertEqual(forecasting.with_stock(entry, Decimal("2"), 0)["days_of_cover"], 0.5)
+        self.assertEqual(forecasting.with_stock(entry, Decimal("4"), 0)["days_of_cover"], 7.0)
+        self.assertEqual(forecasting.with_stock(entry, Decimal("6"), 0)["days_of_cover"], 7.5)
+
+
+class ShrinkageTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def waste(self, quantity, day):
+        return StockMovement.objects.create(
+            inventory_item=self.item, movement_type=StockMovement.WASTE, quantity=Decimal(quantity), business_date=day,
+        )
+
+    def wasted(self, month):
+        return {r["id"]: r["wasted"] for r in shrinkage.get_month(month)["items"]}.get(self.item.pk)
+
+    def test_closed_month_cache_follows_late_movements(self):
+        month = date(2025, 3, 1)
+        self.waste("2", date(2025, 3, 10))
+        self.assertEqual(self.wasted(month), Decimal("2"))
+        with self.assertNumQueries(2):  # just the stamp
+            self.wasted(month)
+
+        self.waste("3", date(2025, 3, 11))
+        self.assertEqual(self.wasted(month), Decimal("5"))
+        compact_movements(date(2025, 4, 1))
+        self.assertEqual(self.wasted(month), Decimal("5"))
+
+
+class LookupTests(InventoryTestCase):
+    def test_get_batch_and_post_refused(self):
+        InventoryItem.objects.filter(pk=self.item.pk).update(barcode="123456")
+        self.item.refresh_from_db()
+        response = self.client.get("/inventory/lookup/", {"code": f"{self.item.stock_code},123456,NOPE"})
+        self.assertEqual(response.json()["found"], 2)
+        self.assertEqual(response.json()["missing"], ["NOPE"])
+        self.assertEqual(self.client.post("/inventory/lookup/", {"codes": "123456"}).status_code, 405)
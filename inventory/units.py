@@ -0,0 +1,94 @@
+"""
+Unit-of-measure conversions.
+
+UnitConversion rows are edges of a graph (1 from = factor to, reverse
+implied). The full conversion matrix - a factor for every connected pair of
+units, e.g. kg -> g via kg -> g, or box -> pc via box -> dozen -> pc - is
+precomputed once and kept in process until a conversion row changes.
+"""
+from collections import deque
+from decimal import Decimal
+
+from django.db.models import Count, Max
+
+from .models import UnitOfMeasure, UnitConversion
+
+DEFAULT_CONVERSIONS = [("kg", "g", Decimal("1000")), ("L", "ml", Decimal("1000"))]
+
+_cache = {"version": None, "matrix": {}}
+
+
+class ConversionError(ValueError):
+    pass
+
+
+def load_default_conversions():
+    """Create the standard kg/g and L/ml conversions when those units exist."""
+    units = {u.abbreviation: u for u in UnitOfMeasure.objects.filter(abbreviation__in={a for c in DEFAULT_CONVERSIONS for a in c[:2]})}
+    for src, dst, factor in DEFAULT_CONVERSIONS:
+        if src in units and dst in units:
+            UnitConversion.objects.get_or_create(from_uom=units[src], to_uom=units[dst], defaults={"factor": factor})
+
+
+def _build_matrix():
+    graph = {}
+    for src, dst, factor in UnitConversion.objects.values_list("from_uom_id", "to_uom_id", "factor"):
+        if not factor:
+            continue
+        graph.setdefault(src, {})[dst] = factor
+        graph.setdefault(dst, {})[src] = 1 / factor
+
+    # Breadth-first walk from every unit; each reachable unit gets the product of edge factors
+    matrix = {}
+    for start in graph:
+        seen = {start: Decimal("1")}
+        queue = deque([start])
+        while queue:
+            unit = queue.popleft()
+            for nxt, factor in graph[unit].items():
+                if nxt not in seen:
+                    seen[nxt] = seen[unit] * factor
+                    queue.append(nxt)
+        for unit, factor in seen.items():
+            matrix[(start, unit)] = factor
+    return matrix
+
+
+def conversion_matrix():
+    """{(from_uom_id, to_uom_id): factor}; rebuilt only when conversions change."""
+    stamp = UnitConversion.objects.aggregate(n=Count("id"), updated=Max("updated_at"))
+    version = (stamp["n"], stamp["updated"])
+    if _cache["version"] != version:
+        _cache["matrix"] = _build_matrix()
+        _cache["version"] = version
+    return _cache["matrix"]
+
+
+def _unit_label(uom_id):
+    return UnitOfMeasure.objects.filter(id=uom_id).values_list("abbreviation", flat=True).first() or f"#{uom_id}"
+
+
+def convert_many(rows):
+    """
+    Convert [(quantity, from_uom_id, to_uom_id), ...] in one pass and return
+    the converted Decimal quantities in the same order. Raises ConversionError
+    when two units are not connected.
+    """
+    matrix = None
+    out = []
+    for qty, src, dst in rows:
+        qty = Decimal(qty)
+        if src is None or dst is None or src == dst:
+            out.append(qty)
+            continue
+        if matrix is None:
+            matrix = conversion_matrix()
+        factor = matrix.get((src, dst))
+        if factor is None:
+            raise ConversionError(f"No conversion from {_unit_label(src)} to {_unit_label(dst)}.")
+        out.append(qty * factor)
+    return out
+
+
+def convert(qty, from_uom_id, to_uom_id):
+    return convert_many([(qty, from_uom_id, to_uom_id)])[0]
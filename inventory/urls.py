@@ -4,6 +4,8 @@ from . import views
 urlpatterns = [
     path("add/", views.add_stock, name="add_stock"),
     path("list/", views.list_stock, name="list_stock"),
+    path("import/", views.import_stock, name="import_stock"),
+    path("lookup/", views.stock_lookup, name="stock_lookup"),
     path("add_inventory/", views.add_inventory, name="add_inventory"),
     path("list_inventory/", views.list_inventory, name="list_inventory"),
     path("live_stock/", views.live_stock, name="live_stock"),
@@ -13,6 +15,14 @@ urlpatterns = [
     path("delete/<int:pk>/", views.delete_stock, name="delete_stock"),
     path("payment/<int:pk>/", views.add_payment, name="add_payment"),
     path("restock/<int:pk>/", views.restock_item, name="restock_item"),
+    path("wastage/<int:pk>/", views.record_wastage, name="record_wastage"),
+
+    # Cycle counts
+    path("counts/", views.count_session_list, name="count_session_list"),
+    path("counts/create/", views.count_session_create, name="count_session_create"),
+    path("counts/<int:pk>/", views.count_session_detail, name="count_session_detail"),
+    path("counts/<int:pk>/import/", views.count_session_import, name="count_session_import"),
+    path("counts/<int:pk>/commit/", views.count_session_commit, name="count_session_commit"),
 
     # Inventory Base Items (catalog)
     path("baseitems/", views.base_item_list, name="baseitem_list"),
@@ -20,10 +30,24 @@ urlpatterns = [
     path("baseitems/<int:pk>/edit/", views.base_item_update, name="baseitem_update"),
     path("baseitems/<int:pk>/delete/", views.base_item_delete, name="baseitem_delete"),
 
+    # Asset check-out / check-in per event
+    path("assets/event/<int:event_id>/", views.event_assets, name="event_assets"),
+
+    # Stock locations
+    path("locations/", views.stock_locations, name="stock_locations"),
+    path("locations/transfer/", views.stock_transfer, name="stock_transfer"),
+
+    # Rental bookings
+    path("rentals/", views.rental_calendar, name="rental_calendar"),
+    path("rentals/availability/", views.rental_availability, name="rental_availability"),
+    path("rentals/book/", views.rental_booking_create, name="rental_booking_create"),
+    path("rentals/<int:pk>/cancel/", views.rental_booking_cancel, name="rental_booking_cancel"),
+
     # Units and Categories management
     path("units/", views.uom_list, name="uom_list"),
     path("units/create/", views.uom_create, name="uom_create"),
     path("units/<int:pk>/edit/", views.uom_update, name="uom_update"),
+    path("units/conversions/create/", views.uom_conversion_create, name="uom_conversion_create"),
 
     path("categories/", views.category_list, name="inventory_category_list"),
     path("categories/create/", views.category_create, name="inventory_category_create"),
@@ -32,4 +56,8 @@ urlpatterns = [
     # Reports
     path("reports/purchases/", views.stock_purchase_report, name="stock_purchase_report"),
     path("reports/usage/", views.stock_usage_report, name="stock_usage_report"),
+    path("reports/turnover/", views.stock_turnover_report, name="stock_turnover_report"),
+    path("reports/valuation/", views.inventory_valuation_report, name="inventory_valuation_report"),
+    path("reports/forecast/", views.demand_forecast_report, name="demand_forecast_report"),
+    path("reports/shrinkage/", views.shrinkage_report, name="shrinkage_report"),
 ]
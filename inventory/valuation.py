@@ -0,0 +1,126 @@
+"""
+Closing stock valuation (FIFO and weighted average).
+
+The whole catalog is valued in one pass: items and IN movements are loaded
+with one query each into NumPy arrays and the per-item figures are computed
+with grouped array operations.
+
+- FIFO: stock on hand is made of the most recent receipts, so the closing
+  quantity is covered by walking IN layers newest-first.
+- Weighted average: total receipt cost / total received quantity per item.
+
+Receipts without a recorded unit cost, and closing stock not covered by any
+receipt (opening balances, archived history), are valued at the item's
+current price_per_unit.
+
+The array math runs in float64; each item's figures are rounded back to
+Decimal (unit costs at StockMovement.unit_cost's 4 places, values at 2) and
+category and grand totals are summed from those Decimals, so they add up.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import InventoryItem, StockMovement
+
+CACHE_SECONDS = 60 * 60
+ZERO = Decimal("0.00")
+UNIT_COST = Decimal(1).scaleb(-StockMovement._meta.get_field("unit_cost").decimal_places)
+
+
+def _decimal(val, exp):
+    # repr() is the shortest string that round-trips, so 2.675 stays 2.675 rather than 2.67499...
+    return Decimal(repr(float(val))).quantize(exp, rounding=ROUND_HALF_UP)
+
+
+def _money(val):
+    return _decimal(val, Decimal("0.01"))
+
+
+def compute_valuation():
+    items = list(
+        InventoryItem.objects.order_by("id").values_list(
+            "id", "stock_code", "name", "category_id", "category__name", "uom__abbreviation", "quantity", "price_per_unit",
+        )
+    )
+    if not items:
+        return {"items": [], "categories": [], "totals": {"fifo": ZERO, "average": ZERO}}
+
+    item_ids = np.array([r[0] for r in items], dtype=np.int64)
+    closing = np.array([r[6] for r in items], dtype=np.float64)
+    price = np.array([float(r[7] or 0) for r in items], dtype=np.float64)
+    n = len(items)
+
+    # IN layers grouped by item, newest first within each item
+    moves = list(
+        StockMovement.objects.filter(movement_type=StockMovement.IN)
+        .order_by("inventory_item_id", "-created_at", "-id")
+        .values_list("inventory_item_id", "quantity", "unit_cost")
+    )
+    if moves:
+        idx = np.searchsorted(item_ids, np.array([m[0] for m in moves], dtype=np.int64))
+        qty = np.array([float(m[1]) for m in moves], dtype=np.float64)
+        cost = np.array([np.nan if m[2] is None else float(m[2]) for m in moves], dtype=np.float64)
+        cost = np.where(np.isnan(cost), price[idx], cost)
+
+        # Weighted average over all receipts
+        in_qty = np.bincount(idx, weights=qty, minlength=n)
+        in_value = np.bincount(idx, weights=qty * cost, minlength=n)
+
+        # FIFO: quantity received before each layer (newer layers) within its item group
+        cum_before = np.cumsum(qty) - qty
+        group_start = np.r_[True, idx[1:] != idx[:-1]]
+        group_no = np.cumsum(group_start) - 1
+        within_before = cum_before - cum_before[group_start][group_no]
+        taken = np.clip(closing[idx] - within_before, 0, qty)
+        fifo_value = np.bincount(idx, weights=taken * cost, minlength=n)
+        covered = np.bincount(idx, weights=taken, minlength=n)
+    else:
+        in_qty = in_value = fifo_value = covered = np.zeros(n)
+
+    avg_cost = np.where(in_qty > 0, in_value / np.where(in_qty > 0, in_qty, 1), price)
+    average_value = closing * avg_cost
+    fifo_value = fifo_value + np.maximum(closing - covered, 0) * price
+
+    item_rows = [{
+        "id": r[0],
+        "stock_code": r[1],
+        "name": r[2],
+        "category": r[4],
+        "uom": r[5],
+        "quantity": r[6],
+        "avg_cost": _decimal(avg_cost[i], UNIT_COST),
+        "fifo_value": _money(fifo_value[i]),
+        "average_value": _money(average_value[i]),
+    } for i, r in enumerate(items)]
+
+    # Per category totals
+    categories = {}
+    for r, row in zip(items, item_rows):
+        c = categories.setdefault(r[3], {"category": r[4], "items": 0, "fifo_value": ZERO, "average_value": ZERO})
+        c["items"] += 1
+        c["fifo_value"] += row["fifo_value"]
+        c["average_value"] += row["average_value"]
+
+    return {
+        "items": item_rows,
+        "categories": sorted(categories.values(), key=lambda r: r["category"]),
+        "totals": {
+            "fifo": sum((row["fifo_value"] for row in item_rows), ZERO),
+            "average": sum((row["average_value"] for row in item_rows), ZERO),
+        },
+    }
+
+
+def _cache_key():
+    """Changes whenever items are added/removed/edited or a movement is logged."""
+    mv = StockMovement.objects.aggregate(last=Max("id"), n=Count("id"))
+    it = InventoryItem.objects.aggregate(updated=Max("updated_at"), n=Count("id"))
+    updated = it["updated"].timestamp() if it["updated"] else 0
+    return f"inventory_valuation:{mv['last']}:{mv['n']}:{it['n']}:{updated}"
+
+
+def get_valuation():
+    return cache.get_or_set(_cache_key(), compute_valuation, CACHE_SECONDS)
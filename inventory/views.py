@@ -1,17 +1,29 @@
 import csv
 from datetime import timedelta, datetime, time
 
+from django.db import transaction
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db.models import Q, F
+from django.urls import reverse
+from django.core.paginator import Paginator
+from django.db.models import Q, F, Sum, Count, Value, CharField, DecimalField, TextField
+from django.db.models.functions import Cast, Coalesce
 from django.contrib import messages
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from django.utils.dateparse import parse_date
 from django.utils import timezone
-from decimal import Decimal
+from django.views.decorators.http import require_GET
+from decimal import Decimal, InvalidOperation
 from collections import defaultdict
-from .models import InventoryItem, UnitOfMeasure, InventoryCategory, InventoryBaseItem, StockMovement
-from .forms import InventoryBaseItemForm, UnitOfMeasureForm, InventoryCategoryForm
+from .models import (
+    InventoryItem, UnitOfMeasure, UnitConversion, InventoryCategory, InventoryBaseItem, StockMovement,
+    CountSession, AssetMovement, RentalBooking, StockLocation, StockBalance,
+)
+from .forms import InventoryBaseItemForm, UnitOfMeasureForm, UnitConversionForm, InventoryCategoryForm
+from . import stock_import, valuation, cycle_count, forecasting, lookup, catalog_match, supplier_link, units, assets, rentals, locations, shrinkage, cube
+from .compaction import archived_totals, add_months
+from core.csv_import import read_csv
 from suppliers.models import Supplier
+from ordersapp.models import Event
 
 
 # ---- Utility: Add default Units of Measure if none exist ----
@@ -27,6 +39,7 @@ def load_default_uoms():
     if UnitOfMeasure.objects.count() == 0:  # only load if empty
         for d in defaults:
             UnitOfMeasure.objects.create(name=d["name"], abbreviation=d["abbreviation"])
+        units.load_default_conversions()
 
 
 # ---- Utility: Add default Categories if none exist ----
@@ -65,10 +78,11 @@ def add_stock(request):
         try:
             name = request.POST.get("name")
             category_id = request.POST.get("category")
-            quantity = int(request.POST.get("quantity", 1))
+            quantity = Decimal(request.POST.get("quantity", 1))
             price_per_unit = Decimal(request.POST.get("price_per_unit", 0))
             uom_id = request.POST.get("uom")
             description = request.POST.get("description")
+            barcode = request.POST.get("barcode")
 
             supplier_name = request.POST.get("supplier_name")
             supplier_phone = request.POST.get("supplier_phone")
@@ -97,6 +111,9 @@ def add_stock(request):
                 price_per_unit=price_per_unit,
                 uom=uom,
                 description=description,
+                barcode=barcode,
+                base_item_id=catalog_match.cached_index().match(name, uom.id),
+                supplier_id=supplier_link.find_existing(supplier_name, supplier_phone),
                 supplier_name=supplier_name,
                 supplier_phone=supplier_phone,
                 supplier_cnic=supplier_cnic,
@@ -113,8 +130,10 @@ def add_stock(request):
                 inventory_item=stock,
                 movement_type=StockMovement.IN,
                 quantity=quantity,
+                unit_cost=price_per_unit,
                 note="Initial stock entry",
             )
+            locations.apply_deltas({stock.id: quantity})
 
             messages.success(request, f"Stock '{name}' added successfully!")
             return redirect("list_stock")
@@ -130,24 +149,60 @@ def add_stock(request):
     })
 
 
+def import_stock(request):
+    """Bulk stock intake from an uploaded CSV file."""
+    result = None
+    if request.method == "POST":
+        upload = request.FILES.get("file")
+        if not upload:
+            messages.error(request, "Please choose a CSV file to upload.")
+        else:
+            try:
+                result = stock_import.import_stock(
+                    read_csv(upload),
+                    dry_run=bool(request.POST.get("dry_run")),
+                )
+                if result.created:
+                    messages.success(request, f"Imported {result.created} stock item(s).")
+                if result.errors:
+                    messages.error(request, f"{len(result.errors)} row(s) were skipped.")
+            except Exception as e:
+                messages.error(request, f"Error importing stock: {str(e)}")
+
+    return render(request, "inventory/import_stock.html", {
+        "result": result,
+        "columns": stock_import.COLUMNS,
+    })
+
+
 def list_stock(request):
     """List all stock items with filters and search."""
     query = request.GET.get("q")
     status = request.GET.get("status")
+    supplier = Supplier.objects.filter(pk=request.GET.get("supplier")).first() if request.GET.get("supplier", "").isdigit() else None
 
-    stocks = InventoryItem.objects.all().order_by("-created_at")
+    stocks = InventoryItem.objects.select_related("category", "uom").order_by("-created_at")
 
+    if supplier:
+        stocks = stocks.filter(supplier=supplier)
     if query:
         stocks = stocks.filter(
             Q(stock_code__icontains=query) |
+            Q(barcode=query) |
             Q(name__icontains=query) |
             Q(supplier_name__icontains=query) |
             Q(description__icontains=query)
         )
 
+    forecast = forecasting.get_forecast()
+    cover_days = forecasting.reorder_days()
+
     # Add calculated fields for each stock
     stock_list = []
     for s in stocks:
+        fc = forecast.get(s.id)
+        if fc:
+            fc = forecasting.with_stock(fc, s.quantity, s.min_quantity)
         remaining = s.total_amount - s.paid_amount
         if s.paid_amount >= s.total_amount:
             payment_status = "Paid"
@@ -170,7 +225,8 @@ def list_stock(request):
             "status": payment_status,
             "payment_method": s.get_payment_method_display() if hasattr(s, "get_payment_method_display") else s.payment_method,
             "supplier_name": s.supplier_name,
-            "low_stock": s.quantity <= getattr(s, "min_quantity", 0),
+            "low_stock": forecasting.is_low(fc, cover_days) if fc else s.quantity <= getattr(s, "min_quantity", 0),
+            "days_of_cover": fc["days_of_cover"] if fc else None,
         })
 
     # Apply filter
@@ -185,6 +241,7 @@ def list_stock(request):
         "stocks": stock_list,
         "query": query,
         "status": status,
+        "supplier": supplier,
     })
 
 
@@ -192,6 +249,8 @@ def edit_stock(request, pk):
     """Edit stock item (same template as add_stock)."""
     stock = get_object_or_404(InventoryItem, pk=pk)
     old_qty = stock.quantity
+    old_supplier = (stock.supplier_name, stock.supplier_phone)
+    old_catalog = (stock.name, stock.uom_id)
     load_default_uoms()
     load_default_categories()
     uoms = UnitOfMeasure.objects.all().order_by("name")
@@ -203,10 +262,11 @@ def edit_stock(request, pk):
             stock.name = request.POST.get("name")
             category_id = request.POST.get("category")
             stock.category = get_object_or_404(InventoryCategory, id=category_id)
-            stock.quantity = int(request.POST.get("quantity", 1))
+            stock.quantity = Decimal(request.POST.get("quantity", 1))
             stock.price_per_unit = Decimal(request.POST.get("price_per_unit", 0))
             stock.uom = get_object_or_404(UnitOfMeasure, id=request.POST.get("uom"))
             stock.description = request.POST.get("description")
+            stock.barcode = request.POST.get("barcode")
 
             stock.supplier_name = request.POST.get("supplier_name")
             stock.supplier_phone = request.POST.get("supplier_phone")
@@ -224,6 +284,11 @@ def edit_stock(request, pk):
             stock.rent_price = request.POST.get("rent_price") or None
             stock.rent_type = request.POST.get("rent_type") or None
             stock.rent_condition = request.POST.get("rent_condition") or None
+            # Keep the current supplier and catalog links unless what they were matched on changed
+            if (stock.supplier_name, stock.supplier_phone) != old_supplier:
+                stock.supplier_id = supplier_link.find_existing(stock.supplier_name, stock.supplier_phone)
+            if (stock.name, stock.uom_id) != old_catalog:
+                stock.base_item_id = catalog_match.cached_index().match(stock.name, stock.uom_id)
 
             stock.save()
             # Log movement if quantity changed
@@ -232,9 +297,11 @@ def edit_stock(request, pk):
                 StockMovement.objects.create(
                     inventory_item=stock,
                     movement_type=StockMovement.IN if delta > 0 else StockMovement.OUT,
-                    quantity=abs(Decimal(delta)),
+                    quantity=abs(delta),
+                    unit_cost=stock.price_per_unit if delta > 0 else None,
                     note="Manual edit adjustment",
                 )
+                locations.apply_deltas({stock.id: delta})
             messages.success(request, f"Stock '{stock.name}' updated successfully!")
             return redirect("list_stock")
 
@@ -281,6 +348,7 @@ def restock_item(request, pk):
     if request.method == "POST":
         try:
             qty = Decimal(request.POST.get("restock_quantity", "0"))
+            unit_cost = Decimal(request.POST.get("unit_cost") or stock.price_per_unit)
             note = (request.POST.get("note") or "").strip()
             if qty <= 0:
                 messages.error(request, "Quantity must be greater than zero.")
@@ -290,8 +358,10 @@ def restock_item(request, pk):
                 inventory_item=stock,
                 movement_type=StockMovement.IN,
                 quantity=qty,
+                unit_cost=unit_cost,
                 note=note or "Restock",
             )
+            locations.apply_deltas({stock.id: qty})
             messages.success(request, f"Restocked '{stock.name}' by {qty}.")
             return redirect("list_stock")
         except Exception as e:
@@ -299,6 +369,190 @@ def restock_item(request, pk):
     return render(request, "inventory/restock_item.html", {"stock": stock})
 
 
+def record_wastage(request, pk):
+    """Write off spoiled or damaged stock, optionally against an event and location."""
+    stock = get_object_or_404(InventoryItem.objects.select_related("uom"), pk=pk)
+    all_locations = StockLocation.objects.filter(is_active=True)
+    if request.method == "POST":
+        try:
+            qty = Decimal(request.POST.get("quantity") or "0")
+            movement_type = request.POST.get("movement_type")
+            reason = request.POST.get("reason") or ""
+            if qty <= 0:
+                raise ValueError("Quantity must be greater than zero.")
+            if movement_type not in StockMovement.LOSS_TYPES:
+                raise ValueError("Pick wastage or damage.")
+            if reason and reason not in dict(StockMovement.REASONS):
+                raise ValueError("Unknown reason.")
+            event_id = request.POST.get("event")
+            event = get_object_or_404(Event, pk=event_id) if event_id else None
+            location_id = request.POST.get("location")
+            location = get_object_or_404(StockLocation, pk=location_id) if location_id else None
+
+            with transaction.atomic():
+                stock = InventoryItem.objects.select_for_update().get(pk=pk)
+                if qty > stock.quantity:
+                    raise ValueError(f"Only {stock.quantity.normalize():f} in stock.")
+                InventoryItem.objects.filter(id=stock.id).update(quantity=F("quantity") - qty, updated_at=timezone.now())
+                StockMovement.objects.create(
+                    inventory_item=stock,
+                    movement_type=movement_type,
+                    quantity=qty,
+                    reason=reason,
+                    event=event,
+                    location=location,
+                    note=(request.POST.get("note") or "").strip(),
+                )
+                locations.apply_deltas({stock.id: -qty}, location=location)
+            messages.success(request, f"Recorded {qty.normalize():f} {stock.name} as {dict(StockMovement.TYPES)[movement_type].lower()}.")
+            return redirect("list_stock")
+        except InvalidOperation:
+            messages.error(request, "Quantity must be a number.")
+        except ValueError as e:
+            messages.error(request, str(e))
+    return render(request, "inventory/record_wastage.html", {
+        "stock": stock,
+        "reasons": StockMovement.REASONS,
+        "locations": all_locations,
+        "events": Event.objects.filter(event_date__gte=timezone.localdate() - timedelta(days=30)).order_by("-event_date"),
+    })
+
+
+# ---------------- SCANNER LOOKUP ---------------- #
+
+@require_GET
+def stock_lookup(request):
+    """
+    Exact stock code / barcode lookup for scanners (JSON).
+
+    GET ?code=STK-0001 (repeat `code` or comma-separate for a batch). Read-only,
+    so scanners need only the session cookie, not a CSRF token.
+    """
+    codes = [c for value in request.GET.getlist("code") for c in value.split(",")]
+
+    codes = [c for c in (lookup.normalize(c) for c in codes) if c]
+    if not codes:
+        return JsonResponse({"error": "No codes given."}, status=400)
+    if len(codes) > lookup.MAX_BATCH:
+        return JsonResponse({"error": f"At most {lookup.MAX_BATCH} codes per request."}, status=400)
+
+    results = lookup.lookup_codes(codes)
+    return JsonResponse({
+        "results": results,
+        "found": sum(1 for r in results if r["found"]),
+        "missing": [r["code"] for r in results if not r["found"]],
+    })
+
+
+# ---------------- CYCLE COUNTS ---------------- #
+
+def count_session_list(request):
+    sessions = CountSession.objects.select_related("category").annotate(line_count=Count("lines"))
+    categories = InventoryCategory.objects.order_by("name")
+    return render(request, "inventory/count_session_list.html", {"sessions": sessions, "categories": categories})
+
+
+def count_session_create(request):
+    if request.method == "POST":
+        name = (request.POST.get("name") or "").strip()
+        category_id = request.POST.get("category") or None
+        if not name:
+            messages.error(request, "Please give the count a name.")
+            return redirect("count_session_list")
+        category = get_object_or_404(InventoryCategory, id=category_id) if category_id else None
+        session = cycle_count.start_session(name, category=category, note=(request.POST.get("note") or "").strip())
+        messages.success(request, f"Count '{session.name}' started.")
+        return redirect("count_session_detail", pk=session.pk)
+    return redirect("count_session_list")
+
+
+def count_session_detail(request, pk):
+    """Enter counted quantities and review variances for a count session."""
+    session = get_object_or_404(CountSession, pk=pk)
+
+    if request.method == "POST":
+        counts = {}
+        for key, val in request.POST.items():
+            if not key.startswith("count_"):
+                continue
+            val = val.strip()
+            try:
+                counts[int(key[len("count_"):])] = Decimal(val) if val else None
+            except (ValueError, InvalidOperation):
+                messages.error(request, f"Invalid count '{val}'.")
+                return redirect("count_session_detail", pk=pk)
+        try:
+            saved = cycle_count.record_counts(session, counts)
+            messages.success(request, f"Saved counts for {saved} item(s).")
+        except ValueError as e:
+            messages.error(request, str(e))
+        return redirect("count_session_detail", pk=pk)
+
+    lines = session.lines.select_related("inventory_item", "inventory_item__uom", "inventory_item__category").order_by("inventory_item__name")
+    rows = []
+    counted = 0
+    total_variance_value = Decimal("0.00")
+    for line in lines:
+        variance = line.variance
+        value = None
+        if variance is not None:
+            counted += 1
+            value = (Decimal(variance) * line.inventory_item.price_per_unit).quantize(Decimal("0.01"))
+            total_variance_value += value
+        rows.append({"line": line, "item": line.inventory_item, "variance": variance, "variance_value": value})
+
+    if request.GET.get("download") == "csv":
+        resp = HttpResponse(content_type="text/csv")
+        resp["Content-Disposition"] = f'attachment; filename="count_{session.pk}_variance.csv"'
+        writer = csv.writer(resp)
+        writer.writerow(["Stock Code", "Item", "Category", "UOM", "Expected", "Counted", "Variance", "Variance Value", "Applied"])
+        for r in rows:
+            writer.writerow([
+                r["item"].stock_code, r["item"].name, r["item"].category.name, r["item"].uom.abbreviation,
+                r["line"].expected_quantity, r["line"].counted_quantity, r["variance"], r["variance_value"],
+                r["line"].applied_quantity,
+            ])
+        return resp
+
+    return render(request, "inventory/count_session_detail.html", {
+        "session": session,
+        "rows": rows,
+        "counted": counted,
+        "total_variance_value": total_variance_value,
+    })
+
+
+def count_session_import(request, pk):
+    """Upload counted quantities as CSV (stock_code, counted_quantity)."""
+    session = get_object_or_404(CountSession, pk=pk)
+    if request.method == "POST":
+        upload = request.FILES.get("file")
+        if not upload:
+            messages.error(request, "Please choose a CSV file to upload.")
+            return redirect("count_session_detail", pk=pk)
+        try:
+            counts, errors = cycle_count.parse_count_csv(session, upload)
+            saved = cycle_count.record_counts(session, counts)
+            messages.success(request, f"Imported counts for {saved} item(s).")
+            for line, error in errors[:20]:
+                messages.error(request, f"Line {line}: {error}")
+        except Exception as e:
+            messages.error(request, f"Error importing counts: {e}")
+    return redirect("count_session_detail", pk=pk)
+
+
+def count_session_commit(request, pk):
+    """Apply the session's variances as ADJ movements."""
+    session = get_object_or_404(CountSession, pk=pk)
+    if request.method == "POST":
+        try:
+            adjusted = cycle_count.commit_session(session)
+            messages.success(request, f"Count committed. {adjusted} item(s) adjusted.")
+        except Exception as e:
+            messages.error(request, f"Could not commit count: {e}")
+    return redirect("count_session_detail", pk=pk)
+
+
 # ---------------- INVENTORY VIEWS ---------------- #
 
 def add_inventory(request):
@@ -313,14 +567,14 @@ def add_inventory(request):
             name = request.POST.get("name")
             category_id = request.POST.get("category")
             uom_id = request.POST.get("uom")
-            quantity = int(request.POST.get("quantity", 1))
+            quantity = Decimal(request.POST.get("quantity", 1))
             price_per_unit = Decimal(request.POST.get("price_per_unit", 0))
             description = request.POST.get("description")
 
             category = get_object_or_404(InventoryCategory, id=category_id)
             uom = get_object_or_404(UnitOfMeasure, id=uom_id)
 
-            InventoryItem.objects.create(
+            item = InventoryItem.objects.create(
                 name=name,
                 category=category,   # ✅ save FK directly
                 uom=uom,
@@ -330,6 +584,7 @@ def add_inventory(request):
                 total_amount=price_per_unit * quantity,
                 paid_amount=Decimal(0)
             )
+            locations.apply_deltas({item.id: quantity})
 
             messages.success(request, f"Inventory item '{name}' added successfully!")
             return redirect("list_inventory")
@@ -354,18 +609,24 @@ def list_inventory(request):
 def live_stock(request):
     """
     Show combined live stock (Stock + Inventory).
-    If same item name exists, quantities will be summed.
+    Stock rows linked to a catalog item are summed per catalog item; rows not
+    linked yet (see the `link_catalog` command) are summed by exact name.
     """
-    combined = defaultdict(int)
-
-    # Collect all inventory items (both stock and inventory)
-    items = InventoryItem.objects.all()
-
-    for item in items:
-        combined[item.name] += item.quantity
-
-    # Convert dict into list of dicts for template
-    live_items = [{"name": k, "quantity": v} for k, v in combined.items()]
+    linked = (
+        InventoryItem.objects.filter(base_item__isnull=False)
+        .values("base_item_id", "base_item__name")
+        .annotate(quantity=Sum("quantity"), rows=Count("id"))
+        .order_by("base_item__name")
+    )
+    unlinked = (
+        InventoryItem.objects.filter(base_item__isnull=True)
+        .values("name")
+        .annotate(quantity=Sum("quantity"), rows=Count("id"))
+        .order_by("name")
+    )
+
+    live_items = [{"name": r["base_item__name"], "quantity": r["quantity"], "rows": r["rows"], "linked": True} for r in linked]
+    live_items += [{"name": r["name"], "quantity": r["quantity"], "rows": r["rows"], "linked": False} for r in unlinked]
 
     return render(request, "inventory/live_stock.html", {"live_items": live_items})
 
@@ -412,10 +673,272 @@ def base_item_delete(request, pk):
     return render(request, "inventory/baseitem_confirm_delete.html", {"item": item})
 
 
+# ---------------- EVENT ASSETS ---------------- #
+
+def _posted_quantities(request, prefix):
+    """{base_item_id: Decimal} from `<prefix><id>` POST fields, skipping blanks/zeros."""
+    out = {}
+    for key, val in request.POST.items():
+        if not key.startswith(prefix) or not val.strip():
+            continue
+        qty = Decimal(val.strip())
+        if qty < 0:
+            raise ValueError("Quantities cannot be negative.")
+        if qty:
+            out[int(key[len(prefix):])] = qty
+    return out
+
+
+def event_assets(request, event_id):
+    """Check catalog assets out to an event and back in (available / in use / damaged)."""
+    event = get_object_or_404(Event.objects.select_related("customer"), pk=event_id)
+
+    if request.method == "POST":
+        action = request.POST.get("action")
+        try:
+            if action == "checkout":
+                moves = [(i, AssetMovement.AVAILABLE, AssetMovement.IN_USE, q) for i, q in _posted_quantities(request, "out_").items()]
+                done = "checked out"
+            elif action == "checkin":
+                returned = _posted_quantities(request, "ret_")
+                damaged = _posted_quantities(request, "dmg_")
+                balances = assets.event_balances(event)
+                names = dict(InventoryBaseItem.objects.filter(id__in=returned.keys() | damaged.keys()).values_list("id", "name"))
+                for item_id in returned.keys() | damaged.keys():
+                    back = returned.get(item_id, 0) + damaged.get(item_id, 0)
+                    out = balances.get(item_id, {}).get("out", 0)
+                    if back > out:
+                        raise ValueError(f"Only {Decimal(out).normalize():f} {names.get(item_id, '')} is out for this event.")
+                moves = [(i, AssetMovement.IN_USE, AssetMovement.AVAILABLE, q) for i, q in returned.items()]
+                moves += [(i, AssetMovement.IN_USE, AssetMovement.DAMAGED, q) for i, q in damaged.items()]
+                done = "checked in"
+            else:
+                raise ValueError("Unknown action.")
+            created = assets.transition(moves, event=event, note=(request.POST.get("note") or "").strip())
+            if created:
+                messages.success(request, f"{len(created)} line(s) {done}.")
+            else:
+                messages.info(request, "Nothing to do: enter at least one quantity.")
+        except InvalidOperation:
+            messages.error(request, "Quantities must be numbers.")
+        except ValueError as e:
+            messages.error(request, str(e))
+        return redirect("event_assets", event_id=event.id)
+
+    balances = assets.event_balances(event)
+    items = (
+        InventoryBaseItem.objects.filter(Q(item_type=InventoryBaseItem.ASSET, is_active=True) | Q(id__in=balances.keys()))
+        .select_related("uom")
+        .order_by("name")
+    )
+    rows = [{
+        "item": item,
+        "out": balances.get(item.id, {}).get("out", Decimal("0")),
+        "damaged": balances.get(item.id, {}).get("damaged", Decimal("0")),
+    } for item in items]
+    history = event.asset_movements.select_related("base_item")[:50]
+
+    return render(request, "inventory/event_assets.html", {"event": event, "rows": rows, "history": history})
+
+
+# ---------------- STOCK LOCATIONS ---------------- #
+
+def stock_locations(request):
+    """Item x location stock matrix; `?location=<id>` lists what is at one location."""
+    if request.method == "POST":
+        name = (request.POST.get("name") or "").strip()
+        if not name:
+            messages.error(request, "Location name is required.")
+        elif StockLocation.objects.filter(name__iexact=name).exists():
+            messages.error(request, f"Location '{name}' already exists.")
+        else:
+            StockLocation.objects.create(name=name)
+            messages.success(request, f"Location '{name}' added.")
+        return redirect("stock_locations")
+
+    all_locations = list(StockLocation.objects.filter(is_active=True))
+    selected = request.GET.get("location")
+    location = next((l for l in all_locations if str(l.id) == selected), None)
+
+    if location:
+        balances = (
+            StockBalance.objects.filter(location=location, quantity__gt=0)
+            .select_related("inventory_item", "inventory_item__uom")
+            .order_by("inventory_item__name")
+        )
+        return render(request, "inventory/stock_locations.html", {
+            "locations": all_locations,
+            "location": location,
+            "balances": balances,
+        })
+
+    items = InventoryItem.objects.select_related("uom").order_by("name")
+    grid = locations.matrix(items, all_locations)
+    rows = [{
+        "item": item,
+        "cells": [grid.get(item.id, {}).get(loc.id, Decimal("0")) for loc in all_locations],
+        "unplaced": item.quantity - sum(grid.get(item.id, {}).values(), Decimal("0")),
+    } for item in items]
+
+    return render(request, "inventory/stock_locations.html", {
+        "locations": all_locations,
+        "rows": rows,
+    })
+
+
+def stock_transfer(request):
+    """Move stock of several items from one location to another."""
+    all_locations = list(StockLocation.objects.filter(is_active=True))
+    from_location = next((l for l in all_locations if str(l.id) == (request.POST.get("from") or request.GET.get("from"))), None)
+    from_location = from_location or (all_locations[0] if all_locations else None)
+
+    if request.method == "POST":
+        to_location = next((l for l in all_locations if str(l.id) == request.POST.get("to")), None)
+        try:
+            if not from_location or not to_location:
+                raise ValueError("Pick both locations.")
+            lines = []
+            for key, val in request.POST.items():
+                if key.startswith("qty_") and val.strip():
+                    lines.append((int(key[len("qty_"):]), Decimal(val.strip())))
+            moved = locations.transfer(lines, from_location, to_location, note=(request.POST.get("note") or "").strip())
+            if moved:
+                messages.success(request, f"Moved {len(moved)} item(s) from {from_location.name} to {to_location.name}.")
+                return redirect(f"{reverse('stock_locations')}?location={to_location.id}")
+            messages.info(request, "Nothing to move: enter at least one quantity.")
+        except InvalidOperation:
+            messages.error(request, "Quantities must be numbers.")
+        except ValueError as e:
+            messages.error(request, str(e))
+        return redirect(f"{reverse('stock_transfer')}?from={from_location.id if from_location else ''}")
+
+    balances = []
+    if from_location:
+        balances = (
+            StockBalance.objects.filter(location=from_location, quantity__gt=0)
+            .select_related("inventory_item", "inventory_item__uom")
+            .order_by("inventory_item__name")
+        )
+    return render(request, "inventory/stock_transfer.html", {
+        "locations": all_locations,
+        "from_location": from_location,
+        "balances": balances,
+    })
+
+
+# ---------------- RENTAL BOOKINGS ---------------- #
+
+def rental_calendar(request):
+    """Month availability grid for rental equipment plus the booking form."""
+    today = timezone.localdate()
+    month = _parse_date_any(f"{request.GET.get('month', '')}-01") or today.replace(day=1)
+    days, rows = rentals.month_grid(month, rentals.rentable_items().select_related("uom").order_by("name"))
+    prev_month = (month - timedelta(days=1)).replace(day=1)
+    next_month = (month + timedelta(days=32)).replace(day=1)
+    bookings = (
+        RentalBooking.objects.filter(status=RentalBooking.BOOKED, end_date__gte=month, start_date__lt=next_month)
+        .select_related("inventory_item", "event")
+    )
+
+    return render(request, "inventory/rental_calendar.html", {
+        "month": month,
+        "prev_month": prev_month,
+        "next_month": next_month,
+        "days": days,
+        "rows": rows,
+        "bookings": bookings,
+        "items": [r["item"] for r in rows],
+        "events": Event.objects.filter(event_date__gte=today - timedelta(days=30)).order_by("event_date"),
+    })
+
+
+def rental_availability(request):
+    """
+    Is a quantity of an item free on every day of a range (JSON).
+
+    GET ?item=<id>&start=YYYY-MM-DD&end=YYYY-MM-DD&quantity=N (end defaults to start, quantity to 1)
+    """
+    item_id = request.GET.get("item", "")
+    item = get_object_or_404(InventoryItem, pk=item_id) if item_id.isdigit() else None
+    if item is None:
+        return JsonResponse({"error": "An item id is required."}, status=400)
+    start = _parse_date_any(request.GET.get("start"))
+    end = _parse_date_any(request.GET.get("end")) or start
+    if not start:
+        return JsonResponse({"error": "A valid start date is required."}, status=400)
+    if end < start:
+        return JsonResponse({"error": "End date cannot be before start date."}, status=400)
+    try:
+        quantity = Decimal(request.GET.get("quantity") or "1")
+    except InvalidOperation:
+        return JsonResponse({"error": "Quantity must be a number."}, status=400)
+
+    free = rentals.free_quantity(item, start, end)
+    return JsonResponse({
+        "item": item.id,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "quantity": f"{quantity.normalize():f}",
+        "free": f"{free.normalize():f}",
+        "available": free >= quantity,
+    })
+
+
+def rental_booking_create(request):
+    if request.method != "POST":
+        return redirect("rental_calendar")
+    try:
+        item = get_object_or_404(InventoryItem, pk=request.POST.get("inventory_item"))
+        start = parse_date(request.POST.get("start_date") or "")
+        end = parse_date(request.POST.get("end_date") or "") or start
+        if not start:
+            raise ValueError("Start date is required.")
+        event_id = request.POST.get("event")
+        event = get_object_or_404(Event, pk=event_id) if event_id else None
+        booking = rentals.book(
+            item, Decimal(request.POST.get("quantity") or "0"), start, end,
+            event=event, note=(request.POST.get("note") or "").strip(),
+        )
+        messages.success(request, f"Booked {booking.quantity.normalize():f} {item.name} for {start} to {end}.")
+        return redirect(f"{reverse('rental_calendar')}?month={start:%Y-%m}")
+    except InvalidOperation:
+        messages.error(request, "Quantity must be a number.")
+    except ValueError as e:
+        messages.error(request, str(e))
+    return redirect("rental_calendar")
+
+
+def rental_booking_cancel(request, pk):
+    booking = get_object_or_404(RentalBooking, pk=pk)
+    if request.method == "POST" and booking.status == RentalBooking.BOOKED:
+        booking.status = RentalBooking.CANCELLED
+        booking.save(update_fields=["status", "updated_at"])
+        messages.success(request, f"Booking for {booking.inventory_item.name} cancelled.")
+    return redirect(f"{reverse('rental_calendar')}?month={booking.start_date:%Y-%m}")
+
+
 # ---------------- UOM & CATEGORY MGMT ---------------- #
 def uom_list(request):
     uoms = UnitOfMeasure.objects.order_by("name")
-    return render(request, "inventory/uom_list.html", {"uoms": uoms})
+    conversions = UnitConversion.objects.select_related("from_uom", "to_uom").order_by("from_uom__name", "to_uom__name")
+    return render(request, "inventory/uom_list.html", {
+        "uoms": uoms,
+        "conversions": conversions,
+        "conversion_form": UnitConversionForm(),
+    })
+
+
+def uom_conversion_create(request):
+    """Add an edge to the unit conversion graph (1 from = factor to)."""
+    if request.method == "POST":
+        form = UnitConversionForm(request.POST)
+        if form.is_valid():
+            form.save()
+            messages.success(request, "Conversion added.")
+        else:
+            for err in form.errors.values():
+                messages.error(request, err.as_text())
+    return redirect("uom_list")
 
 
 def uom_create(request):
@@ -478,11 +1001,17 @@ def category_update(request, pk):
 
 
 # ---------------- REPORTS ---------------- #
+PURCHASE_REPORT_PAGE_SIZE = 100
+
+
 def _parse_date_any(val):
     if not val:
         return None
     # try ISO first
-    d = parse_date(val)
+    try:
+        d = parse_date(val)
+    except ValueError:  # well formed but not a real date, e.g. 2025-13-01
+        return None
     if d:
         return d
     for fmt in ("%m/%d/%Y", "%d/%m/%Y"):
@@ -493,118 +1022,263 @@ def _parse_date_any(val):
     return None
 
 
-def stock_purchase_report(request):
-    """Report on stock purchases/restocks with export."""
-    start_raw = request.GET.get("start")
-    end_raw = request.GET.get("end")
-    download = request.GET.get("download")
+def _month_range(request, default_months=6):
+    """First days of the `start`/`end` months (YYYY-MM or any date in the month) from GET."""
+    def month(val):
+        d = _parse_date_any(f"{val}-01" if val and len(val) == 7 else val)
+        return d.replace(day=1) if d else None
 
-    start = _parse_date_any(start_raw)
-    end = _parse_date_any(end_raw)
+    end = month(request.GET.get("end")) or timezone.localdate().replace(day=1)
+    start = month(request.GET.get("start")) or add_months(end, -(default_months - 1))
+    if start > end:
+        start, end = end, start
+    return start, end
 
-    tz = timezone.get_current_timezone()
-    start_dt = timezone.make_aware(datetime.combine(start, time.min), tz) if start else None
-    end_dt = timezone.make_aware(datetime.combine(end, time.max), tz) if end else None
 
+def _drill_down(request, movement_types, start, end):
+    """Raw movements for ?item= over the month range, or None when not drilling down."""
+    item_id = request.GET.get("item")
+    if not item_id or not item_id.isdigit():
+        return None, None
+    item = get_object_or_404(InventoryItem.objects.select_related("uom"), pk=item_id)
+    return item, cube.drill_down(item.id, movement_types, start, end)
+
+
+def _purchase_rows(start, end):
+    """
+    New stock entries and IN movements as one UNION ALL queryset.
+    Both sides expose the same aliased columns so the database can order and
+    page the combined result; category and UOM come from joins.
+    """
+    tz = timezone.get_current_timezone()
     items_qs = InventoryItem.objects.all()
-    if start_dt and end_dt:
-        items_qs = items_qs.filter(created_at__range=(start_dt, end_dt))
-    elif start_dt:
-        items_qs = items_qs.filter(created_at__gte=start_dt)
-    elif end_dt:
-        items_qs = items_qs.filter(created_at__lte=end_dt)
-
-    movements_qs = StockMovement.objects.filter(movement_type=StockMovement.IN).select_related("inventory_item")
-    if start_dt and end_dt:
-        movements_qs = movements_qs.filter(created_at__range=(start_dt, end_dt))
-    elif start_dt:
-        movements_qs = movements_qs.filter(created_at__gte=start_dt)
-    elif end_dt:
-        movements_qs = movements_qs.filter(created_at__lte=end_dt)
+    movements_qs = StockMovement.objects.filter(movement_type=StockMovement.IN)
+    if start:
+        items_qs = items_qs.filter(created_at__gte=timezone.make_aware(datetime.combine(start, time.min), tz))
+        movements_qs = movements_qs.filter(business_date__gte=start)
+    if end:
+        items_qs = items_qs.filter(created_at__lte=timezone.make_aware(datetime.combine(end, time.max), tz))
+        movements_qs = movements_qs.filter(business_date__lte=end)
+
+    qty_field = DecimalField(max_digits=14, decimal_places=4)
+    amount_field = DecimalField(max_digits=14, decimal_places=2)
+    columns = ["row_date", "item_name", "category_name", "qty", "uom_abbr", "amount", "source", "row_note"]
+
+    new_stock = items_qs.annotate(
+        row_date=F("created_at"),
+        item_name=F("name"),
+        category_name=F("category__name"),
+        qty=Cast("quantity", qty_field),
+        uom_abbr=F("uom__abbreviation"),
+        amount=F("total_amount"),
+        source=Value("New Stock", output_field=CharField()),
+        row_note=Coalesce("description", Value(""), output_field=TextField()),
+    ).order_by().values(*columns)
+    restocks = movements_qs.annotate(
+        row_date=F("created_at"),
+        item_name=F("inventory_item__name"),
+        category_name=F("inventory_item__category__name"),
+        qty=F("quantity"),
+        uom_abbr=F("inventory_item__uom__abbreviation"),
+        amount=Value(None, output_field=amount_field),
+        source=Value("Restock", output_field=CharField()),
+        row_note=Cast("note", TextField()),
+    ).order_by().values(*columns)
+
+    rows = new_stock.union(restocks, all=True).order_by("-row_date")
+    return rows, items_qs, movements_qs
+
+
+def _purchase_row(r):
+    return {
+        "date": timezone.localtime(r["row_date"]).date(),
+        "item": r["item_name"],
+        "category": r["category_name"] or "",
+        "quantity": r["qty"],
+        "uom": r["uom_abbr"],
+        "amount": r["amount"] if r["amount"] is not None else "",
+        "source": r["source"],
+        "note": r["row_note"] or "",
+    }
+
+
+def _archived_rows(movement_type, start, end):
+    """Monthly totals for movements already moved out by `compact_movements`."""
+    totals = list(archived_totals(movement_type, start, end))
+    items = {
+        r[0]: r[1:] for r in InventoryItem.objects.filter(id__in={t["inventory_item_id"] for t in totals})
+        .values_list("id", "name", "category__name", "uom__abbreviation")
+    }
+    rows = [{
+        "date": t["month"].strftime("%Y-%m"),
+        "item": items[t["inventory_item_id"]][0],
+        "category": items[t["inventory_item_id"]][1],
+        "quantity": t["quantity"],
+        "uom": items[t["inventory_item_id"]][2],
+        "amount": "",
+        "source": "Archived (monthly)",
+        "note": f"{t['movement_count']} movement(s)",
+    } for t in totals]
+    rows.sort(key=lambda r: r["item"])
+    rows.sort(key=lambda r: r["date"], reverse=True)
+    return rows
 
-    rows = []
-    for itm in items_qs:
-        rows.append({
-            "date": itm.created_at.date(),
-            "item": itm.name,
-            "category": itm.category.name if itm.category else "",
-            "quantity": itm.quantity,
-            "uom": itm.uom.abbreviation,
-            "amount": itm.total_amount,
-            "source": "New Stock",
-            "note": itm.description or "",
-        })
-    for mv in movements_qs:
-        rows.append({
-            "date": mv.created_at.date(),
-            "item": mv.inventory_item.name,
-            "category": mv.inventory_item.category.name if mv.inventory_item.category else "",
-            "quantity": mv.quantity,
-            "uom": mv.inventory_item.uom.abbreviation,
-            "amount": "",
-            "source": "Restock",
-            "note": mv.note,
-        })
 
-    # Sort by date
-    rows = sorted(rows, key=lambda r: r["date"], reverse=True)
+def stock_purchase_report(request):
+    """
+    Purchases/restocks: item x month totals from the movement cube, with the
+    individual entries (paged) only when `detail` is requested.
+    """
+    start, end = _month_range(request)
+    context = {"start": start, "end": end}
+    item, movements = _drill_down(request, [StockMovement.IN], start, end)
+    if item:
+        context.update(item=item, movements=movements)
+        return render(request, "inventory/stock_purchase_report.html", context)
+
+    if request.GET.get("detail") or request.GET.get("download") == "csv":
+        last_day = add_months(end, 1) - timedelta(days=1)
+        rows_qs, items_qs, movements_qs = _purchase_rows(start, last_day)
+        archived_rows = _archived_rows(StockMovement.IN, start, last_day)
+
+        if request.GET.get("download") == "csv":
+            resp = HttpResponse(content_type="text/csv")
+            resp["Content-Disposition"] = 'attachment; filename="stock_purchases.csv"'
+            writer = csv.writer(resp)
+            writer.writerow(["Date", "Item", "Category", "Quantity", "UOM", "Amount", "Source", "Note"])
+            for raw in rows_qs.iterator(chunk_size=2000):
+                r = _purchase_row(raw)
+                writer.writerow([r["date"], r["item"], r["category"], r["quantity"], r["uom"], r["amount"], r["source"], r["note"]])
+            for r in archived_rows:
+                writer.writerow([r["date"], r["item"], r["category"], r["quantity"], r["uom"], r["amount"], r["source"], r["note"]])
+            return resp
+
+        page_obj = Paginator(rows_qs, PURCHASE_REPORT_PAGE_SIZE).get_page(request.GET.get("page"))
+        # Rollups are computed by the database over the whole range, not the page
+        item_totals = items_qs.aggregate(qty=Sum("quantity"), amount=Sum("total_amount"))
+        movement_totals = movements_qs.aggregate(qty=Sum("quantity"))
+        total_qty = Decimal(item_totals["qty"] or 0) + (movement_totals["qty"] or Decimal("0"))
+        total_qty += sum([r["quantity"] for r in archived_rows], Decimal("0"))
+        context.update(
+            detail=True,
+            total_qty=total_qty,
+            total_amount=item_totals["amount"] or Decimal("0"),
+            rows=[_purchase_row(r) for r in page_obj.object_list],
+            archived_rows=archived_rows,
+            page_obj=page_obj,
+        )
+        return render(request, "inventory/stock_purchase_report.html", context)
+
+    summary = cube.item_totals([StockMovement.IN], start, end)
+    context.update(
+        summary=summary,
+        monthly=cube.monthly_totals([StockMovement.IN], start, end),
+        total_cost=sum((r["cost"] for r in summary), Decimal("0")),
+    )
+    return render(request, "inventory/stock_purchase_report.html", context)
+
 
-    if download == "csv":
+def stock_usage_report(request):
+    """Stock usage (OUT movements): item x month totals from the movement cube, raw movements per item on demand."""
+    start, end = _month_range(request)
+    context = {"start": start, "end": end}
+    item, movements = _drill_down(request, [StockMovement.OUT], start, end)
+    if item:
+        context.update(item=item, movements=movements)
+    else:
+        summary = cube.item_totals([StockMovement.OUT], start, end)
+        context.update(
+            summary=summary,
+            monthly=cube.monthly_totals([StockMovement.OUT], start, end),
+            total_cost=sum((r["cost"] for r in summary), Decimal("0")),
+        )
+    return render(request, "inventory/stock_usage_report.html", context)
+
+
+def stock_turnover_report(request):
+    """Usage over average inventory per item for a month range, from the movement cube."""
+    start, end = _month_range(request, default_months=12)
+    data = cube.turnover(start, end)
+
+    if request.GET.get("download") == "csv":
         resp = HttpResponse(content_type="text/csv")
-        resp["Content-Disposition"] = 'attachment; filename="stock_purchases.csv"'
+        resp["Content-Disposition"] = f'attachment; filename="stock_turnover_{start:%Y-%m}_{end:%Y-%m}.csv"'
         writer = csv.writer(resp)
-        writer.writerow(["Date", "Item", "Category", "Quantity", "UOM", "Amount", "Source", "Note"])
-        for r in rows:
-            writer.writerow([r["date"], r["item"], r["category"], r["quantity"], r["uom"], r["amount"], r["source"], r["note"]])
+        writer.writerow(["Stock Code", "Item", "Category", "UOM", "Opening", "Closing", "Average", "Used", "Usage Value", "Turnover", "Days on Hand"])
+        for r in data["items"]:
+            writer.writerow([
+                r["stock_code"], r["name"], r["category"], r["uom"], r["opening"], r["closing"], r["average"],
+                r["used"], r["used_cost"], r["turnover"], r["days_on_hand"],
+            ])
         return resp
 
-    # Simple rollups
-    total_qty = sum([Decimal(r["quantity"]) for r in rows]) if rows else Decimal("0")
-    total_amount = sum([Decimal(r["amount"]) for r in rows if r["amount"]]) if rows else Decimal("0")
+    return render(request, "inventory/stock_turnover_report.html", {**data, "start": start, "end": end})
 
-    return render(request, "inventory/stock_purchase_report.html", {
-        "rows": rows,
-        "start": start_raw,
-        "end": end_raw,
-        "total_qty": total_qty,
-        "total_amount": total_amount,
-    })
 
+def inventory_valuation_report(request):
+    """Closing stock value per item and category (FIFO and weighted average)."""
+    data = valuation.get_valuation()
 
-def stock_usage_report(request):
-    """Report on stock usage (OUT movements)."""
-    start_raw = request.GET.get("start")
-    end_raw = request.GET.get("end")
-    start = _parse_date_any(start_raw)
-    end = _parse_date_any(end_raw)
-    tz = timezone.get_current_timezone()
-    start_dt = timezone.make_aware(datetime.combine(start, time.min), tz) if start else None
-    end_dt = timezone.make_aware(datetime.combine(end, time.max), tz) if end else None
-
-    qs = StockMovement.objects.filter(movement_type=StockMovement.OUT).select_related("inventory_item")
-    if start_dt and end_dt:
-        qs = qs.filter(created_at__range=(start_dt, end_dt))
-    elif start_dt:
-        qs = qs.filter(created_at__gte=start_dt)
-    elif end_dt:
-        qs = qs.filter(created_at__lte=end_dt)
+    if request.GET.get("download") == "csv":
+        resp = HttpResponse(content_type="text/csv")
+        resp["Content-Disposition"] = 'attachment; filename="inventory_valuation.csv"'
+        writer = csv.writer(resp)
+        writer.writerow(["Stock Code", "Item", "Category", "Quantity", "UOM", "Avg Unit Cost", "FIFO Value", "Weighted Avg Value"])
+        for r in data["items"]:
+            writer.writerow([r["stock_code"], r["name"], r["category"], r["quantity"], r["uom"], r["avg_cost"], r["fifo_value"], r["average_value"]])
+        return resp
 
-    rows = []
-    for mv in qs.order_by("-created_at"):
-        rows.append({
-            "date": mv.created_at.date(),
-            "item": mv.inventory_item.name,
-            "category": mv.inventory_item.category.name if mv.inventory_item.category else "",
-            "quantity": mv.quantity,
-            "uom": mv.inventory_item.uom.abbreviation,
-            "note": mv.note,
-        })
+    return render(request, "inventory/valuation_report.html", data)
 
-    total_qty = sum([Decimal(r["quantity"]) for r in rows]) if rows else Decimal("0")
 
-    return render(request, "inventory/stock_usage_report.html", {
+def demand_forecast_report(request):
+    """Per-item demand forecast and days of cover, lowest cover first."""
+    cover_days = forecasting.reorder_days()
+    forecast = forecasting.get_forecast()
+    rows = [
+        forecasting.with_stock(forecast[item_id], quantity, min_quantity)
+        for item_id, quantity, min_quantity in InventoryItem.objects.values_list("id", "quantity", "min_quantity")
+        if item_id in forecast
+    ]
+    weekdays = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    for r in rows:
+        r["low_stock"] = forecasting.is_low(r, cover_days)
+        r["busy_days"] = [(weekdays[d], idx) for d, idx in enumerate(r["weekday_index"]) if idx >= 1.2]
+    rows.sort(key=lambda r: (r["days_of_cover"] is None, r["days_of_cover"] or 0, r["name"]))
+    if request.GET.get("low") == "1":
+        rows = [r for r in rows if r["low_stock"]]
+
+    return render(request, "inventory/demand_forecast.html", {
         "rows": rows,
-        "start": start_raw,
-        "end": end_raw,
-        "total_qty": total_qty,
+        "cover_days": cover_days,
+        "low_only": request.GET.get("low") == "1",
     })
+
+
+def shrinkage_report(request):
+    """Wastage/damage and theoretical vs actual usage by item, category, event and month."""
+    start, end = _month_range(request)
+    try:
+        data = shrinkage.report(start, end)
+    except units.ConversionError as e:
+        messages.error(request, f"Cannot compute theoretical usage: {e}")
+        data = {"items": [], "categories": [], "events": [], "monthly": [], "totals": {}}
+
+    if request.GET.get("download") == "csv":
+        resp = HttpResponse(content_type="text/csv")
+        resp["Content-Disposition"] = f'attachment; filename="shrinkage_{start:%Y-%m}_{end:%Y-%m}.csv"'
+        writer = csv.writer(resp)
+        writer.writerow(["Stock Code", "Item", "Category", "UOM", "Wasted", "Damaged", "Loss Value", "Theoretical Usage", "Actual Usage", "Variance", "Variance Value"])
+        for r in data["items"]:
+            writer.writerow([
+                r["stock_code"], r["name"], r["category"], r["uom"], r["wasted"], r["damaged"], r["loss_cost"],
+                r["theoretical"], r["actual"], r["variance"], r["variance_cost"],
+            ])
+        return resp
+
+    return render(request, "inventory/shrinkage_report.html", {
+        **data,
+        "start": start,
+        "end": end,
+    })
+
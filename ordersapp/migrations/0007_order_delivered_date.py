@@ -0,0 +1,44 @@
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.utils import timezone
+
+BATCH_SIZE = 5000
+
+
+def _backfill(model, source_field, target_field):
+    last_id = 0
+    while True:
+        rows = list(
+            model.objects.filter(id__gt=last_id, **{f"{source_field}__isnull": False, f"{target_field}__isnull": True})
+            .order_by("id")
+            .values_list("id", source_field)[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        by_date = defaultdict(list)
+        for pk, stamp in rows:
+            by_date[timezone.localdate(stamp)].append(pk)
+        for day, ids in by_date.items():
+            model.objects.filter(id__in=ids).update(**{target_field: day})
+        last_id = rows[-1][0]
+
+
+def backfill_local_dates(apps, schema_editor):
+    _backfill(apps.get_model("ordersapp", "Order"), "delivered_at", "delivered_date")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ordersapp', '0006_orderitem_note_ordermenuitem_note'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='delivered_date',
+            field=models.DateField(blank=True, db_index=True, help_text='Local date of delivered_at', null=True),
+        ),
+        migrations.RunPython(backfill_local_dates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_fractional_quantity_unitconversion'),
+        ('ordersapp', '0007_order_delivered_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipeitem',
+            name='uom',
+            field=models.ForeignKey(blank=True, help_text="Unit of quantity_per_portion (blank = the stock item's unit)", null=True, on_delete=django.db.models.deletion.PROTECT, to='inventory.unitofmeasure'),
+        ),
+    ]
@@ -69,6 +69,13 @@ class RecipeItem(models.Model):
     menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name="recipe_items")
     inventory_item = models.ForeignKey("inventory.InventoryItem", on_delete=models.PROTECT)
     quantity_per_portion = models.DecimalField(max_digits=12, decimal_places=4)
+    uom = models.ForeignKey(
+        "inventory.UnitOfMeasure",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        help_text="Unit of quantity_per_portion (blank = the stock item's unit)",
+    )
 
     def __str__(self):
         return f"{self.menu_item} -> {self.inventory_item}"
@@ -129,6 +136,7 @@ class Order(models.Model):
     # Delivery/fulfilment
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
     delivered_at = models.DateTimeField(blank=True, null=True)
+    delivered_date = models.DateField(blank=True, null=True, db_index=True, help_text="Local date of delivered_at")
 
     event = models.ForeignKey(Event, on_delete=models.SET_NULL, null=True, blank=True, related_name="orders")
 
@@ -3,16 +3,20 @@ from datetime import datetime
 
 from django.contrib import messages
 from django.db import transaction
-from django.db.models import F
+from django.db.models import F, Sum, DecimalField, Case, When, Value
+from django.db.models.functions import TruncMonth
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from django.utils import timezone
 from django.utils.dateparse import parse_date
 
-from .models import Order, Payment, OrderItem, Event, MenuItem, MenuPackage, Quote, MenuCategory
+from .models import Order, Payment, OrderItem, OrderMenuItem, RecipeItem, Event, MenuItem, MenuPackage, Quote, MenuCategory
 from .forms import EventForm, MenuItemForm, MenuPackageForm, QuoteForm, QuoteItemFormSet, MenuCategoryForm
 from inventory.models import InventoryItem, StockMovement
+from inventory.units import convert_many
+from inventory.locations import apply_deltas
+from inventory.compaction import archived_totals
 from expenses.models import Expense
 
 
@@ -319,12 +323,18 @@ def profit_loss_report(request):
     if end:
         orders = orders.filter(order_date__lte=end)
 
-    # Stock usage cost (OUT movements)
-    usage = StockMovement.objects.filter(movement_type=StockMovement.OUT).select_related("inventory_item")
+    # Stock usage cost (OUT movements), costed and bucketed by month in SQL
+    usage = StockMovement.objects.filter(movement_type=StockMovement.OUT)
     if start:
-        usage = usage.filter(created_at__date__gte=start)
+        usage = usage.filter(business_date__gte=start)
     if end:
-        usage = usage.filter(created_at__date__lte=end)
+        usage = usage.filter(business_date__lte=end)
+    usage = (
+        usage.annotate(month=TruncMonth("business_date"))
+        .values("month")
+        .annotate(cost=Sum(F("quantity") * F("inventory_item__price_per_unit"), output_field=DecimalField(max_digits=20, decimal_places=6)))
+        .order_by()
+    )
 
     # Expenses
     expenses = Expense.objects.all()
@@ -343,12 +353,19 @@ def profit_loss_report(request):
         buckets.setdefault(key, {"revenue": Decimal("0.00"), "usage": Decimal("0.00"), "expenses": Decimal("0.00")})
         buckets[key]["revenue"] += o.total_amount or Decimal("0.00")
 
-    for mv in usage:
-        key = month_key(mv.created_at.date())
+    for row in usage:
+        key = month_key(row["month"])
+        buckets.setdefault(key, {"revenue": Decimal("0.00"), "usage": Decimal("0.00"), "expenses": Decimal("0.00")})
+        buckets[key]["usage"] += (row["cost"] or Decimal("0.00")).quantize(Decimal("0.01"))
+
+    # Usage that has been compacted into the archive
+    archived = list(archived_totals(StockMovement.OUT, start, end))
+    prices = dict(InventoryItem.objects.filter(id__in={a["inventory_item_id"] for a in archived}).values_list("id", "price_per_unit"))
+    for summary in archived:
+        key = month_key(summary["month"])
         buckets.setdefault(key, {"revenue": Decimal("0.00"), "usage": Decimal("0.00"), "expenses": Decimal("0.00")})
-        unit_cost = mv.inventory_item.price_per_unit or Decimal("0.00")
-        cost = (unit_cost * Decimal(mv.quantity)).quantize(Decimal("0.01"))
-        buckets[key]["usage"] += cost
+        unit_cost = prices.get(summary["inventory_item_id"]) or Decimal("0.00")
+        buckets[key]["usage"] += (unit_cost * summary["quantity"]).quantize(Decimal("0.01"))
 
     for exp in expenses:
         key = month_key(exp.date)
@@ -626,12 +643,10 @@ def deliver_order(request, order_id):
 
     try:
         with transaction.atomic():
-            # Aggregate required inventory from direct items and menu recipes
-            required = {}
-
-            # From direct inventory order items
-            for oi in items:
-                required[oi.inventory_item_id] = required.get(oi.inventory_item_id, 0) + oi.quantity
+            # Aggregate required inventory from direct items and menu recipes.
+            # Direct items are in stock units; recipe lines may use another unit
+            # (g for a kg item) and are converted in one batch below.
+            lines = [(Decimal(oi.quantity), None, oi.inventory_item_id) for oi in items]
 
             # From menu items via recipe
             if menu_items:
@@ -643,34 +658,51 @@ def deliver_order(request, order_id):
                     recipes = recipe_map.get(m.menu_item_id, [])
                     for r in recipes:
                         need = (r.quantity_per_portion or Decimal("0")) * Decimal(m.quantity)
-                        required[r.inventory_item_id] = required.get(r.inventory_item_id, Decimal("0")) + need
+                        lines.append((need, r.uom_id, r.inventory_item_id))
+
+            required = {}
+            if lines:
+                inv_map = {inv.id: inv for inv in InventoryItem.objects.select_for_update().filter(id__in={l[2] for l in lines})}
+                if len(inv_map) != len({l[2] for l in lines}):
+                    raise ValueError("Inventory item not found for deduction.")
+                converted = convert_many([
+                    (qty, uom_id or inv_map[inv_id].uom_id, inv_map[inv_id].uom_id) for qty, uom_id, inv_id in lines
+                ])
+                for (_, _, inv_id), qty in zip(lines, converted):
+                    required[inv_id] = required.get(inv_id, Decimal("0")) + qty
+                required = {k: v.quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP) for k, v in required.items() if v > 0}
 
             # Validate stock availability first
             if required:
-                inv_map = {inv.id: inv for inv in InventoryItem.objects.filter(id__in=required.keys())}
-                for inv_id, qty in required.items():
-                    inv = inv_map.get(inv_id)
-                    if not inv:
-                        raise ValueError("Inventory item not found for deduction.")
-                    if Decimal(qty) > inv.quantity:
-                        raise ValueError(f"Insufficient stock for {inv.name}. Needed {qty}, available {inv.quantity}.")
-
-                # Deduct stock
                 for inv_id, qty in required.items():
-                    InventoryItem.objects.filter(id=inv_id).update(
-                        quantity=F("quantity") - qty
-                    )
-                    StockMovement.objects.create(
+                    inv = inv_map[inv_id]
+                    if qty > inv.quantity:
+                        raise ValueError(f"Insufficient stock for {inv.name}. Needed {qty.normalize():f} {inv.uom.abbreviation}, available {inv.quantity.normalize():f}.")
+
+                # Deduct stock in one UPDATE and log all movements in one INSERT
+                InventoryItem.objects.filter(id__in=required.keys()).update(
+                    quantity=Case(
+                        *[When(id=inv_id, then=F("quantity") - Value(qty)) for inv_id, qty in required.items()],
+                        output_field=DecimalField(max_digits=14, decimal_places=4),
+                    ),
+                    updated_at=timezone.now(),
+                )
+                StockMovement.objects.bulk_create([
+                    StockMovement(
                         inventory_item_id=inv_id,
                         movement_type=StockMovement.OUT,
                         quantity=qty,
                         note=f"Order {order.id} delivery",
                     )
+                    for inv_id, qty in required.items()
+                ])
+                apply_deltas({inv_id: -qty for inv_id, qty in required.items()})
 
             # Mark order delivered
             order.status = Order.STATUS_DELIVERED
             order.delivered_at = timezone.now()
-            order.save(update_fields=["status", "delivered_at"])
+            order.delivered_date = timezone.localdate(order.delivered_at)
+            order.save(update_fields=["status", "delivered_at", "delivered_date"])
 
         messages.success(request, "✅ Order delivered and stock updated.")
     except Exception as e:
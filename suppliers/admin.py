@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Supplier, SupplierPayment, PurchaseOrder, PurchaseOrderItem
+from .models import Supplier, SupplierPayment, PurchaseOrder, PurchaseOrderItem, SupplierPriceHistory, SupplierItemPrice, PaymentAllocation, SupplierPerformance
 
 
 @admin.register(Supplier)
@@ -41,17 +41,20 @@ class PurchaseOrderItemInline(admin.TabularInline):
 
 @admin.register(PurchaseOrder)
 class PurchaseOrderAdmin(admin.ModelAdmin):
-    list_display = ['order_number', 'supplier', 'order_date', 'expected_delivery_date', 'status', 'total_amount']
+    list_display = ['order_number', 'supplier', 'order_date', 'expected_delivery_date', 'status', 'total_amount', 'amount_paid']
     list_filter = ['status', 'order_date', 'supplier']
     search_fields = ['order_number', 'supplier__name']
-    readonly_fields = ['order_number', 'total_amount', 'created_at', 'updated_at']
+    readonly_fields = ['order_number', 'total_amount', 'amount_paid', 'first_received_at', 'received_at', 'created_at', 'updated_at']
     inlines = [PurchaseOrderItemInline]
     fieldsets = (
         ('Order Information', {
             'fields': ('order_number', 'supplier', 'order_date', 'expected_delivery_date', 'status')
         }),
         ('Financial Information', {
-            'fields': ('total_amount',)
+            'fields': ('total_amount', 'amount_paid')
+        }),
+        ('Receiving', {
+            'fields': ('first_received_at', 'received_at')
         }),
         ('Additional Information', {
             'fields': ('notes',)
@@ -88,4 +91,38 @@ class PurchaseOrderItemAdmin(admin.ModelAdmin):
     list_display = ['purchase_order', 'inventory_item', 'quantity', 'unit_price', 'total_price']
     list_filter = ['purchase_order__supplier', 'purchase_order__order_date']
     search_fields = ['inventory_item__name', 'purchase_order__order_number']
-    readonly_fields = ['total_price']
\ No newline at end of file
+    readonly_fields = ['total_price']
+
+
+@admin.register(SupplierPriceHistory)
+class SupplierPriceHistoryAdmin(admin.ModelAdmin):
+    list_display = ['inventory_item', 'supplier', 'price_date', 'unit_price', 'min_price', 'quantity', 'line_count']
+    list_filter = ['supplier', 'price_date']
+    search_fields = ['inventory_item__name', 'inventory_item__stock_code', 'supplier__name']
+    readonly_fields = ['inventory_item', 'supplier', 'price_date', 'unit_price', 'min_price', 'quantity', 'line_count']
+
+
+@admin.register(SupplierItemPrice)
+class SupplierItemPriceAdmin(admin.ModelAdmin):
+    list_display = ['inventory_item', 'supplier', 'last_price', 'last_date', 'lowest_price', 'order_days']
+    list_filter = ['supplier']
+    search_fields = ['inventory_item__name', 'inventory_item__stock_code', 'supplier__name']
+    readonly_fields = ['inventory_item', 'supplier', 'last_price', 'last_date', 'lowest_price', 'total_quantity', 'order_days']
+
+
+@admin.register(PaymentAllocation)
+class PaymentAllocationAdmin(admin.ModelAdmin):
+    list_display = ['payment', 'purchase_order', 'amount']
+    list_filter = ['purchase_order__supplier']
+    search_fields = ['purchase_order__order_number', 'payment__reference_number', 'purchase_order__supplier__name']
+    readonly_fields = ['payment', 'purchase_order', 'amount']
+
+
+@admin.register(SupplierPerformance)
+class SupplierPerformanceAdmin(admin.ModelAdmin):
+    list_display = ['supplier', 'received_orders', 'avg_lead_days', 'on_time_rate', 'fill_rate', 'price_drift', 'updated_at']
+    search_fields = ['supplier__name', 'supplier__supplier_id']
+    readonly_fields = [
+        'supplier', 'received_orders', 'completed_orders', 'avg_lead_days', 'timed_orders', 'on_time_orders',
+        'on_time_rate', 'fill_rate', 'price_changes', 'price_drift', 'updated_at',
+    ]
@@ -0,0 +1,126 @@
+"""
+Supplier payables aging.
+
+Payments are applied to a supplier's purchase orders oldest first (FIFO), so
+whatever is still owed sits on the most recent orders. One SQL statement
+does the whole allocation for every supplier: a running total of PO amounts
+per supplier (window function) minus that supplier's payments gives each
+PO's open amount, which is then bucketed by order age and grouped per
+supplier. Draft and cancelled orders are not payable and are left out.
+
+Results are cached under a key that changes whenever a payment or purchase
+order is added, edited or removed (and at midnight, when ages move on).
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import Supplier, SupplierPayment, PurchaseOrder
+
+CACHE_SECONDS = 60 * 60 * 24
+BUCKETS = [
+    ("current", "0-30 days"),
+    ("days_31_60", "31-60 days"),
+    ("days_61_90", "61-90 days"),
+    ("over_90", "90+ days"),
+]
+
+_SQL = """
+WITH paid AS (
+    SELECT supplier_id, SUM(amount) AS paid
+    FROM {payment}
+    GROUP BY supplier_id
+),
+po AS (
+    SELECT supplier_id, order_date, total_amount,
+           SUM(total_amount) OVER (PARTITION BY supplier_id ORDER BY order_date, id) AS running
+    FROM {po}
+    WHERE status NOT IN (%s, %s)
+),
+open_po AS (
+    SELECT po.supplier_id, po.order_date, po.total_amount,
+           CASE
+               WHEN po.running - COALESCE(paid.paid, 0) <= 0 THEN 0
+               WHEN po.running - COALESCE(paid.paid, 0) >= po.total_amount THEN po.total_amount
+               ELSE po.running - COALESCE(paid.paid, 0)
+           END AS open_amount
+    FROM po LEFT JOIN paid ON paid.supplier_id = po.supplier_id
+)
+SELECT s.id, s.supplier_id, s.name,
+       SUM(CASE WHEN o.order_date >= %s THEN o.open_amount ELSE 0 END),
+       SUM(CASE WHEN o.order_date < %s AND o.order_date >= %s THEN o.open_amount ELSE 0 END),
+       SUM(CASE WHEN o.order_date < %s AND o.order_date >= %s THEN o.open_amount ELSE 0 END),
+       SUM(CASE WHEN o.order_date < %s THEN o.open_amount ELSE 0 END),
+       SUM(o.open_amount),
+       SUM(o.total_amount),
+       MAX(COALESCE(p.paid, 0))
+FROM {supplier} s
+LEFT JOIN open_po o ON o.supplier_id = s.id
+LEFT JOIN paid p ON p.supplier_id = s.id
+WHERE o.supplier_id IS NOT NULL OR p.supplier_id IS NOT NULL
+GROUP BY s.id, s.supplier_id, s.name
+ORDER BY COALESCE(SUM(o.open_amount), 0) DESC, s.name
+"""
+
+
+def _money(val):
+    return Decimal(str(val or 0)).quantize(Decimal("0.01"))
+
+
+def compute_aging(today=None):
+    today = today or timezone.localdate()
+    d30, d60, d90 = (today - timedelta(days=n) for n in (30, 60, 90))
+    sql = _SQL.format(
+        payment=SupplierPayment._meta.db_table,
+        po=PurchaseOrder._meta.db_table,
+        supplier=Supplier._meta.db_table,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [PurchaseOrder.DRAFT, PurchaseOrder.CANCELLED, d30, d30, d60, d60, d90, d90])
+        rows = cursor.fetchall()
+
+    suppliers = []
+    totals = {key: Decimal("0.00") for key, _ in BUCKETS}
+    totals.update(outstanding=Decimal("0.00"), unapplied=Decimal("0.00"))
+    for pk, code, name, b0, b1, b2, b3, outstanding, ordered, paid in rows:
+        row = {
+            "id": pk,
+            "supplier_id": code,
+            "name": name,
+            "current": _money(b0),
+            "days_31_60": _money(b1),
+            "days_61_90": _money(b2),
+            "over_90": _money(b3),
+            "outstanding": _money(outstanding),
+            # payments beyond everything ordered (advances / credit)
+            "unapplied": max(_money(paid) - _money(ordered), Decimal("0.00")),
+        }
+        if not row["outstanding"] and not row["unapplied"]:
+            continue
+        for key in totals:
+            totals[key] += row[key]
+        suppliers.append(row)
+    return {"as_of": today, "suppliers": suppliers, "totals": totals, "buckets": BUCKETS}
+
+
+def _cache_key(today):
+    po = PurchaseOrder.objects.aggregate(n=Count("id"), updated=Max("updated_at"))
+    pay = SupplierPayment.objects.aggregate(n=Count("id"), updated=Max("updated_at"))
+    stamp = ":".join(
+        f"{agg['n']}:{agg['updated'].timestamp() if agg['updated'] else 0}" for agg in (po, pay)
+    )
+    return f"payables_aging:{today:%Y%m%d}:{stamp}"
+
+
+def get_aging():
+    today = timezone.localdate()
+    return cache.get_or_set(_cache_key(today), lambda: compute_aging(today), CACHE_SECONDS)
+
+
+def supplier_aging(supplier_id):
+    """The aging row of one supplier (from the cached report), or None if nothing is open."""
+    return next((row for row in get_aging()["suppliers"] if row["id"] == supplier_id), None)
@@ -0,0 +1,137 @@
+"""
+FIFO allocation of supplier payments to purchase orders.
+
+Each supplier's payments (by payment date, then id) are applied to its payable
+purchase orders (by order date, then id; drafts and cancelled orders are not
+payable) oldest first, and the result is stored as PaymentAllocation rows plus
+PurchaseOrder.amount_paid, so a PO's paid/outstanding is a plain column read.
+
+Think of both streams as running totals: an allocation is the overlap of a
+PO's slice of the purchase total with a payment's slice of the payment total.
+A change to a PO or payment moves every running total from that row on, but
+nothing below the smaller of the two running totals in front of it. So
+`reallocate` only rewrites the POs whose running total reaches that point,
+and reads only the payments whose running total passes it.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value, Window
+from django.db.models.functions import Coalesce
+
+from .models import PaymentAllocation, PurchaseOrder, Supplier, SupplierPayment
+
+ZERO = Decimal("0.00")
+_MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _before(date_field, key, pk_field="pk"):
+    """Rows ordered before key = (date, id); id 0 means before everything on that date."""
+    day, pk = key
+    return Q(**{f"{date_field}__lt": day}) | Q(**{date_field: day, f"{pk_field}__lt": pk})
+
+
+def _payable(supplier_id):
+    return PurchaseOrder.objects.filter(supplier_id=supplier_id).exclude(status__in=PurchaseOrder.UNPRICED_STATUSES)
+
+
+def _running(queryset, amount_field, date_field):
+    return queryset.annotate(
+        running=Window(Sum(amount_field), order_by=[F(date_field).asc(), F("pk").asc()]),
+    ).order_by(date_field, "pk")
+
+
+def _cut(supplier_id, po_key, payment_key):
+    """Running total below which no allocation can change."""
+    cuts = []
+    if po_key:
+        cuts.append(_payable(supplier_id).filter(_before("order_date", po_key)).aggregate(t=Sum("total_amount"))["t"] or ZERO)
+    if payment_key:
+        paid = SupplierPayment.objects.filter(supplier_id=supplier_id).filter(_before("payment_date", payment_key))
+        cuts.append(paid.aggregate(t=Sum("amount"))["t"] or ZERO)
+    return min(cuts) if cuts else ZERO
+
+
+def reallocate(supplier_id, po_key=None, payment_key=None):
+    """
+    Redo one supplier's allocations from the earliest point a change can
+    affect. `po_key` / `payment_key` are the (date, id) of the earliest changed
+    purchase order / payment (id 0 = from the start of that date); with
+    neither, the supplier is reallocated from scratch. Returns the number of
+    allocations written.
+    """
+    if not supplier_id:
+        return 0
+    with transaction.atomic():
+        # one reallocation per supplier at a time
+        Supplier.objects.select_for_update().filter(pk=supplier_id).values_list("pk").first()
+        cut = _cut(supplier_id, po_key, payment_key)
+        # >= so a changed PO whose total dropped to 0 (running == cut) is redone too
+        tail = list(_running(_payable(supplier_id), "total_amount", "order_date").filter(running__gte=cut))
+
+        # Allocations from the first tail PO on are redone; allocations that no
+        # longer pair this supplier's payment with its payable PO are dropped.
+        stale = Q(purchase_order__status__in=PurchaseOrder.UNPRICED_STATUSES)
+        stale |= ~Q(purchase_order__supplier_id=supplier_id) | ~Q(payment__supplier_id=supplier_id)
+        if tail:
+            stale |= ~_before("purchase_order__order_date", (tail[0].order_date, tail[0].pk), "purchase_order_id")
+        stale_rows = PaymentAllocation.objects.filter(
+            Q(payment__supplier_id=supplier_id) | Q(purchase_order__supplier_id=supplier_id)
+        ).filter(stale)
+        touched = set(stale_rows.values_list("purchase_order_id", flat=True))
+        stale_rows.delete()
+
+        allocations = []
+        if tail:
+            start = tail[0].running - tail[0].total_amount
+            payments = iter(
+                _running(SupplierPayment.objects.filter(supplier_id=supplier_id), "amount", "payment_date")
+                .filter(running__gt=start)
+            )
+            payment, left = None, ZERO
+            for po in tail:
+                need, paid = po.total_amount, ZERO
+                while need > 0:
+                    if left <= 0:
+                        payment = next(payments, None)
+                        if payment is None:
+                            break
+                        # the first payment may be partly spent on POs before the tail
+                        left = min(payment.amount, payment.running - start)
+                        continue
+                    take = min(need, left)
+                    allocations.append(PaymentAllocation(payment_id=payment.pk, purchase_order_id=po.pk, amount=take))
+                    need, left, paid = need - take, left - take, paid + take
+                po.amount_paid = paid
+            PaymentAllocation.objects.bulk_create(allocations, batch_size=1000)
+            PurchaseOrder.objects.bulk_update(tail, ["amount_paid"], batch_size=1000)
+
+        # POs that lost allocations without being in the tail (cancelled, made
+        # draft, moved to another supplier): re-sum what is left on them
+        others = touched - {po.pk for po in tail}
+        if others:
+            _resum(PurchaseOrder.objects.filter(pk__in=others))
+    return len(allocations)
+
+
+def _resum(orders):
+    allocated = (
+        PaymentAllocation.objects.filter(purchase_order=OuterRef("pk"))
+        .order_by().values("purchase_order").annotate(total=Sum("amount")).values("total")
+    )
+    orders.update(amount_paid=Coalesce(Subquery(allocated, output_field=_MONEY), Value(ZERO), output_field=_MONEY))
+
+
+def rebuild(supplier_ids=None):
+    """Reallocate every supplier (or the given ones) from scratch. Returns the number of allocations."""
+    if supplier_ids is None:
+        supplier_ids = Supplier.objects.values_list("pk", flat=True)
+    return sum(reallocate(supplier_id) for supplier_id in supplier_ids)
+
+
+def allocations_for(purchase_order):
+    """Payments applied to a purchase order, oldest first."""
+    return (
+        purchase_order.allocations.select_related("payment")
+        .order_by("payment__payment_date", "payment_id")
+    )
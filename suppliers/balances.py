@@ -0,0 +1,167 @@
+"""
+Denormalised supplier and purchase order totals.
+
+Supplier.total_paid is maintained incrementally by SupplierPayment.save() and
+delete() and by the bulk payment import. PurchaseOrder.total_amount and
+Supplier.total_purchases are maintained by `save_order_lines`, which writes a
+PO's lines in bulk, applies one delta to each total, refreshes the supplier
+price history of the items whose price, quantity or item changed, and re-runs
+the FIFO payment allocation from that PO on. The *_drift functions
+check the stored totals against their sources with one grouped query each;
+`reconcile` writes corrected totals back.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import allocation, prices
+from .models import Supplier, SupplierPayment, PurchaseOrder, PurchaseOrderItem
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def add_paid(amounts):
+    """Add {supplier_id: amount} to total_paid with one UPDATE for the whole batch."""
+    amounts = {sid: Decimal(a) for sid, a in amounts.items() if a}
+    if not amounts:
+        return
+    Supplier.objects.filter(pk__in=amounts.keys()).update(
+        total_paid=F('total_paid') + Case(
+            *[When(pk=sid, then=Value(a)) for sid, a in amounts.items()],
+            default=Value(Decimal('0')),
+            output_field=MONEY,
+        )
+    )
+
+
+def save_order_lines(purchase_order, lines, deleted=()):
+    """
+    Create/update `lines` and delete `deleted` for one purchase order, then
+    add the net change to the PO total and (unless the PO is a draft or
+    cancelled) the supplier's total_purchases:
+    one bulk insert, one bulk update, one delete and two UPDATEs, whatever
+    the number of lines. Returns the net change.
+    """
+    lines = list(lines)
+    deleted = [line for line in deleted if line.pk]
+    with transaction.atomic():
+        status, order_date = PurchaseOrder.objects.select_for_update().filter(pk=purchase_order.pk).values_list('status', 'order_date').first()
+        existing_ids = [line.pk for line in lines if line.pk] + [line.pk for line in deleted]
+        old_lines = {
+            pk: (total, item_id, quantity, unit_price)
+            for pk, total, item_id, quantity, unit_price in PurchaseOrderItem.objects.filter(
+                pk__in=existing_ids, purchase_order=purchase_order,
+            ).values_list('pk', 'total_price', 'inventory_item_id', 'quantity', 'unit_price')
+        } if existing_ids else {}
+
+        delta = Decimal('0')
+        to_create, to_update = [], []
+        repriced = set()  # items whose price history this save changes
+        for line in lines:
+            line.purchase_order = purchase_order
+            line.total_price = (Decimal(line.quantity) * Decimal(line.unit_price)).quantize(Decimal('0.01'))
+            old = old_lines.get(line.pk) if line.pk else None
+            if old:
+                delta += line.total_price - old[0]
+                to_update.append(line)
+                if old[1:] != (line.inventory_item_id, Decimal(line.quantity), Decimal(line.unit_price)):
+                    repriced |= {old[1], line.inventory_item_id}
+            else:
+                delta += line.total_price
+                to_create.append(line)
+                repriced.add(line.inventory_item_id)
+        for line in deleted:
+            old = old_lines.get(line.pk)
+            if old:
+                delta -= old[0]
+                repriced.add(old[1])
+
+        if to_create:
+            known = set(PurchaseOrderItem.objects.filter(purchase_order=purchase_order).values_list('pk', flat=True))
+            PurchaseOrderItem.objects.bulk_create(to_create)
+            # MySQL does not return primary keys from bulk inserts; the PO row
+            # lock keeps other writers off this order, so its new ids are ours, in order.
+            if any(line.pk is None for line in to_create):
+                new_ids = PurchaseOrderItem.objects.filter(purchase_order=purchase_order).exclude(pk__in=known).order_by('pk').values_list('pk', flat=True)
+                for line, pk in zip(to_create, new_ids):
+                    line.pk = pk
+        if to_update:
+            PurchaseOrderItem.objects.bulk_update(to_update, ['inventory_item', 'quantity', 'unit_price', 'total_price'])
+        if deleted:
+            PurchaseOrderItem.objects.filter(pk__in=[line.pk for line in deleted]).delete()
+        if delta:
+            PurchaseOrder.objects.filter(pk=purchase_order.pk).update(total_amount=F('total_amount') + delta, updated_at=timezone.now())
+            if status not in PurchaseOrder.UNPRICED_STATUSES:
+                Supplier.objects.filter(pk=purchase_order.supplier_id).update(total_purchases=F('total_purchases') + delta)
+                allocation.reallocate(purchase_order.supplier_id, po_key=(order_date, purchase_order.pk))
+        # Drafts and cancelled orders are not in the price history
+        if repriced and status not in PurchaseOrder.UNPRICED_STATUSES:
+            prices.refresh(purchase_order.supplier_id, repriced, day=order_date)
+    purchase_order.refresh_from_db(fields=['total_amount', 'amount_paid'])
+    return delta
+
+
+def paid_drift():
+    """[(supplier, stored total_paid, actual sum of payments)] for suppliers that disagree."""
+    actual = (
+        SupplierPayment.objects.filter(supplier=OuterRef('pk'))
+        .order_by().values('supplier').annotate(total=Sum('amount')).values('total')
+    )
+    suppliers = Supplier.objects.annotate(
+        actual_paid=Coalesce(Subquery(actual, output_field=MONEY), Value(Decimal('0')), output_field=MONEY),
+    ).exclude(total_paid=F('actual_paid'))
+    return [(s, s.total_paid, s.actual_paid) for s in suppliers.order_by('name')]
+
+
+def order_total_drift():
+    """[(purchase order, stored total_amount, actual sum of line totals)] for POs that disagree."""
+    actual = (
+        PurchaseOrderItem.objects.filter(purchase_order=OuterRef('pk'))
+        .order_by().values('purchase_order').annotate(total=Sum('total_price')).values('total')
+    )
+    orders = PurchaseOrder.objects.annotate(
+        actual_total=Coalesce(Subquery(actual, output_field=MONEY), Value(Decimal('0')), output_field=MONEY),
+    ).exclude(total_amount=F('actual_total'))
+    return [(po, po.total_amount, po.actual_total) for po in orders.order_by('order_number')]
+
+
+def purchases_drift():
+    """[(supplier, stored total_purchases, actual sum of PO totals, drafts and cancelled left out)] for suppliers that disagree."""
+    actual = (
+        PurchaseOrder.objects.filter(supplier=OuterRef('pk')).exclude(status__in=PurchaseOrder.UNPRICED_STATUSES)
+        .order_by().values('supplier').annotate(total=Sum('total_amount')).values('total')
+    )
+    suppliers = Supplier.objects.annotate(
+        actual_purchases=Coalesce(Subquery(actual, output_field=MONEY), Value(Decimal('0')), output_field=MONEY),
+    ).exclude(total_purchases=F('actual_purchases'))
+    return [(s, s.total_purchases, s.actual_purchases) for s in suppliers.order_by('name')]
+
+
+def _write(model, field, drift):
+    model.objects.filter(pk__in=[obj.pk for obj, _, _ in drift]).update(**{
+        field: Case(*[When(pk=obj.pk, then=Value(actual)) for obj, _, actual in drift], output_field=MONEY),
+        'updated_at': timezone.now(),
+    })
+
+
+def reconcile(fix=False):
+    """
+    Report (and with fix=True correct) drifted totals. Returns
+    {"paid": [...], "orders": [...], "purchases": [...]} as from the *_drift functions.
+    PO totals are corrected before supplier purchases are checked, since the
+    latter are summed from the former.
+    """
+    with transaction.atomic():
+        drift = {'paid': paid_drift(), 'orders': order_total_drift()}
+        if fix:
+            if drift['paid']:
+                _write(Supplier, 'total_paid', drift['paid'])
+            if drift['orders']:
+                _write(PurchaseOrder, 'total_amount', drift['orders'])
+        drift['purchases'] = purchases_drift()
+        if fix and drift['purchases']:
+            _write(Supplier, 'total_purchases', drift['purchases'])
+    return drift
@@ -59,4 +59,28 @@ class PurchaseOrderItemForm(forms.ModelForm):
             'unit_price': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.0001'}),
         }
 
+    def clean_quantity(self):
+        quantity = self.cleaned_data['quantity']
+        if self.instance.pk and quantity < self.instance.received_quantity:
+            raise forms.ValidationError(f'{self.instance.received_quantity.normalize():f} already received.')
+        return quantity
 
+
+class BasePurchaseOrderItemFormSet(forms.BaseInlineFormSet):
+    def clean(self):
+        super().clean()
+        for form in self.deleted_forms:
+            if form.instance.pk and form.instance.received_quantity:
+                raise forms.ValidationError(
+                    f'{form.instance.inventory_item.name} has already been received and cannot be removed.'
+                )
+
+
+PurchaseOrderItemFormSet = forms.inlineformset_factory(
+    PurchaseOrder,
+    PurchaseOrderItem,
+    form=PurchaseOrderItemForm,
+    formset=BasePurchaseOrderItemFormSet,
+    extra=5,
+    can_delete=True,
+)
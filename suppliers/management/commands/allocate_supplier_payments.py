@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from suppliers import allocation
+from suppliers.models import Supplier
+
+
+class Command(BaseCommand):
+    help = 'Reallocate supplier payments to purchase orders oldest-first from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--supplier', action='append', default=[], help='Supplier code (supplier_id); repeat for several. Default: all')
+
+    def handle(self, *args, **options):
+        supplier_ids = None
+        if options['supplier']:
+            supplier_ids = list(Supplier.objects.filter(supplier_id__in=options['supplier']).values_list('pk', flat=True))
+        count = allocation.rebuild(supplier_ids)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {count} payment allocation(s).'))
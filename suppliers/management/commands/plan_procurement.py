@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from suppliers import planning
+
+
+class Command(BaseCommand):
+    help = 'Show net requirements for pending orders and optionally create draft purchase orders per supplier'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=14, help='Plan for pending orders due within this many days (default 14)')
+        parser.add_argument('--safety-stock', action='store_true', help="Also top up to each item's minimum stock level")
+        parser.add_argument('--create', action='store_true', help='Create draft purchase orders for lines that have a supplier')
+
+    def handle(self, *args, **options):
+        until = timezone.localdate() + timedelta(days=options['days'])
+        lines = planning.plan(until, safety_stock=options['safety_stock'])
+        if not lines:
+            self.stdout.write(self.style.SUCCESS(f'Nothing to order for pending orders due by {until}.'))
+            return
+
+        for supplier_id, name, group, total in planning.group_by_supplier(lines):
+            self.stdout.write(f'{name or "(no supplier)"}: {len(group)} line(s), est. {total}')
+            for line in group:
+                self.stdout.write(
+                    f'  {line["stock_code"]} {line["name"]}: need {line["demand"]}, on hand {line["on_hand"]}, '
+                    f'on order {line["on_order"]} -> order {line["shortfall"]} {line["uom"]} @ {line["unit_price"]}'
+                )
+
+        if options['create']:
+            orders = planning.create_drafts(lines, note=f'Planned for pending orders due by {until:%Y-%m-%d}')
+            self.stdout.write(self.style.SUCCESS(f'Created {len(orders)} draft purchase order(s).'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from suppliers import performance
+
+
+class Command(BaseCommand):
+    help = 'Recompute supplier lead time, on-time rate, fill rate and price drift from purchase orders'
+
+    def handle(self, *args, **options):
+        count = performance.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt performance metrics for {count} supplier(s).'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from suppliers import prices
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the supplier price history and best-price index from purchase order lines'
+
+    def handle(self, *args, **options):
+        history, index = prices.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {history} price history row(s) and {index} item price(s).'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from suppliers import balances
+
+
+class Command(BaseCommand):
+    help = 'Verify supplier paid/purchase totals and purchase order totals against their rows (grouped queries)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Write the recomputed totals back')
+
+    def handle(self, *args, **options):
+        drift = balances.reconcile(fix=options['fix'])
+        for supplier, stored, actual in drift['paid']:
+            self.stdout.write(f'{supplier.supplier_id} {supplier.name}: total_paid {stored} != payments {actual}')
+        for po, stored, actual in drift['orders']:
+            self.stdout.write(f'{po.order_number}: total_amount {stored} != lines {actual}')
+        for supplier, stored, actual in drift['purchases']:
+            self.stdout.write(f'{supplier.supplier_id} {supplier.name}: total_purchases {stored} != purchase orders {actual}')
+
+        count = sum(len(rows) for rows in drift.values())
+        if not count:
+            self.stdout.write(self.style.SUCCESS('All supplier and purchase order totals match.'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Corrected {count} total(s).'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{count} total(s) drifted; run with --fix to correct.'))
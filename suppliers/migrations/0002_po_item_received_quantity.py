@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:32
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseorderitem',
+            name='received_quantity',
+            field=models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=14),
+        ),
+    ]
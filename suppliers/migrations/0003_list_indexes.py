@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0002_po_item_received_quantity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['order_date'], name='po_order_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['supplier', 'order_date'], name='po_supplier_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['status', 'order_date'], name='po_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplierpayment',
+            index=models.Index(fields=['supplier', 'payment_date'], name='supplier_payment_date_idx'),
+        ),
+    ]
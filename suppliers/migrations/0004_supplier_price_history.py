@@ -0,0 +1,89 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:38
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Min, Sum
+
+
+def backfill_prices(apps, schema_editor):
+    PurchaseOrderItem = apps.get_model('suppliers', 'PurchaseOrderItem')
+    SupplierPriceHistory = apps.get_model('suppliers', 'SupplierPriceHistory')
+    SupplierItemPrice = apps.get_model('suppliers', 'SupplierItemPrice')
+    grouped = (
+        PurchaseOrderItem.objects.exclude(purchase_order__status='CANCELLED')
+        .values('inventory_item_id', supplier_id=F('purchase_order__supplier_id'), day=F('purchase_order__order_date'))
+        .annotate(
+            qty=Sum('quantity'),
+            cost=Sum(F('quantity') * F('unit_price'), output_field=DecimalField(max_digits=24, decimal_places=8)),
+            low=Min('unit_price'),
+            n=Count('id'),
+        )
+        .order_by('day')
+    )
+    history, index = [], {}
+    for r in grouped:
+        qty = r['qty'] or Decimal('0')
+        price = (Decimal(r['cost']) / qty).quantize(Decimal('0.0001')) if qty else r['low']
+        history.append(SupplierPriceHistory(
+            inventory_item_id=r['inventory_item_id'], supplier_id=r['supplier_id'], price_date=r['day'],
+            unit_price=price, min_price=r['low'], quantity=qty, line_count=r['n'],
+        ))
+        key = (r['inventory_item_id'], r['supplier_id'])
+        row = index.setdefault(key, SupplierItemPrice(
+            inventory_item_id=key[0], supplier_id=key[1], lowest_price=price, total_quantity=Decimal('0'), order_days=0,
+        ))
+        row.last_price, row.last_date = price, r['day']
+        row.lowest_price = min(row.lowest_price, price)
+        row.total_quantity += qty
+        row.order_days += 1
+    SupplierPriceHistory.objects.bulk_create(history, batch_size=2000)
+    SupplierItemPrice.objects.bulk_create(index.values(), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0017_stock_movement_cube'),
+        ('suppliers', '0003_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplierItemPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_price', models.DecimalField(decimal_places=4, max_digits=12)),
+                ('last_date', models.DateField()),
+                ('lowest_price', models.DecimalField(decimal_places=4, max_digits=12)),
+                ('total_quantity', models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=16)),
+                ('order_days', models.PositiveIntegerField(default=0)),
+                ('inventory_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='supplier_prices', to='inventory.inventoryitem')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='item_prices', to='suppliers.supplier')),
+            ],
+            options={
+                'verbose_name_plural': 'Supplier Item Prices',
+                'indexes': [models.Index(fields=['inventory_item', 'last_price'], name='supplier_item_best_idx')],
+                'unique_together': {('inventory_item', 'supplier')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SupplierPriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price_date', models.DateField()),
+                ('unit_price', models.DecimalField(decimal_places=4, help_text="Quantity-weighted average over the day's lines", max_digits=12)),
+                ('min_price', models.DecimalField(decimal_places=4, max_digits=12)),
+                ('quantity', models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=16)),
+                ('line_count', models.PositiveIntegerField(default=0)),
+                ('inventory_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='supplier_price_history', to='inventory.inventoryitem')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='suppliers.supplier')),
+            ],
+            options={
+                'verbose_name_plural': 'Supplier Price History',
+                'ordering': ['-price_date'],
+                'unique_together': {('inventory_item', 'supplier', 'price_date')},
+            },
+        ),
+        migrations.RunPython(backfill_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:43
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def allocate_payments(apps, schema_editor):
+    Supplier = apps.get_model('suppliers', 'Supplier')
+    SupplierPayment = apps.get_model('suppliers', 'SupplierPayment')
+    PurchaseOrder = apps.get_model('suppliers', 'PurchaseOrder')
+    PaymentAllocation = apps.get_model('suppliers', 'PaymentAllocation')
+    zero = Decimal('0.00')
+    for supplier_id in Supplier.objects.values_list('pk', flat=True):
+        orders = list(
+            PurchaseOrder.objects.filter(supplier_id=supplier_id).exclude(status__in=['DRAFT', 'CANCELLED'])
+            .order_by('order_date', 'pk')
+        )
+        payments = iter(SupplierPayment.objects.filter(supplier_id=supplier_id).order_by('payment_date', 'pk').values_list('pk', 'amount'))
+        allocations, payment_id, left = [], None, zero
+        for po in orders:
+            need, paid = po.total_amount, zero
+            while need > 0:
+                if left <= 0:
+                    payment_id, left = next(payments, (None, zero))
+                    if payment_id is None:
+                        break
+                    continue
+                take = min(need, left)
+                allocations.append(PaymentAllocation(payment_id=payment_id, purchase_order_id=po.pk, amount=take))
+                need, left, paid = need - take, left - take, paid + take
+            po.amount_paid = paid
+        PaymentAllocation.objects.bulk_create(allocations, batch_size=1000)
+        PurchaseOrder.objects.bulk_update(orders, ['amount_paid'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0005_purchase_order_draft_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='amount_paid',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, help_text='Payments allocated to this order (oldest order first)', max_digits=12),
+        ),
+        migrations.CreateModel(
+            name='PaymentAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('payment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='suppliers.supplierpayment')),
+                ('purchase_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='suppliers.purchaseorder')),
+            ],
+            options={
+                'verbose_name_plural': 'Payment Allocations',
+                'unique_together': {('payment', 'purchase_order')},
+            },
+        ),
+        migrations.RunPython(allocate_payments, migrations.RunPython.noop),
+    ]
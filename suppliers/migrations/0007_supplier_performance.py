@@ -0,0 +1,104 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from datetime import timedelta
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Sum
+
+
+def compute_performance(apps, schema_editor):
+    # Orders received before this migration carry no receipt dates, so only
+    # receipt counts, fill rate and price drift can be backfilled here.
+    Supplier = apps.get_model('suppliers', 'Supplier')
+    PurchaseOrder = apps.get_model('suppliers', 'PurchaseOrder')
+    PurchaseOrderItem = apps.get_model('suppliers', 'PurchaseOrderItem')
+    SupplierPriceHistory = apps.get_model('suppliers', 'SupplierPriceHistory')
+    SupplierPerformance = apps.get_model('suppliers', 'SupplierPerformance')
+    received_statuses = ['PARTIAL', 'COMPLETED']
+    value = DecimalField(max_digits=24, decimal_places=8)
+    rate = Decimal('0.0001')
+
+    received = dict(
+        PurchaseOrder.objects.filter(status__in=received_statuses)
+        .values('supplier_id').annotate(n=Count('id')).order_by().values_list('supplier_id', 'n')
+    )
+    fills = {
+        r['supplier_id']: (r['received'] or 0, r['ordered'] or 0)
+        for r in PurchaseOrderItem.objects.filter(purchase_order__status__in=received_statuses)
+        .values(supplier_id=F('purchase_order__supplier_id'))
+        .annotate(
+            ordered=Sum(F('quantity') * F('unit_price'), output_field=value),
+            received=Sum(F('received_quantity') * F('unit_price'), output_field=value),
+        ).order_by()
+    }
+    since = django.utils.timezone.localdate() - timedelta(days=365)
+    drifts, prev = {}, {}
+    for supplier_id, item_id, day, price, qty in SupplierPriceHistory.objects.order_by(
+        'supplier_id', 'inventory_item_id', 'price_date',
+    ).values_list('supplier_id', 'inventory_item_id', 'price_date', 'unit_price', 'quantity'):
+        last = prev.get((supplier_id, item_id))
+        prev[(supplier_id, item_id)] = price
+        if last and day >= since:
+            n, change, total = drifts.get(supplier_id, (0, Decimal('0'), Decimal('0')))
+            drifts[supplier_id] = (n + 1, change + qty * (price - last) / last, total + qty)
+
+    rows = []
+    for supplier_id in Supplier.objects.values_list('pk', flat=True):
+        got, ordered = fills.get(supplier_id, (0, 0))
+        n, change, total = drifts.get(supplier_id, (0, None, None))
+        rows.append(SupplierPerformance(
+            supplier_id=supplier_id,
+            received_orders=received.get(supplier_id, 0),
+            fill_rate=(Decimal(got) / Decimal(ordered)).quantize(rate) if ordered else None,
+            price_changes=n,
+            price_drift=(change / total).quantize(rate) if total else None,
+        ))
+    SupplierPerformance.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0006_payment_allocation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='first_received_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='received_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='received_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='SupplierPerformance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('received_orders', models.PositiveIntegerField(default=0, help_text='Orders with at least one goods receipt')),
+                ('completed_orders', models.PositiveIntegerField(default=0, help_text='Fully received orders with a receipt date')),
+                ('avg_lead_days', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('timed_orders', models.PositiveIntegerField(default=0, help_text='Completed orders that had an expected delivery date')),
+                ('on_time_orders', models.PositiveIntegerField(default=0)),
+                ('on_time_rate', models.DecimalField(blank=True, decimal_places=4, max_digits=5, null=True)),
+                ('fill_rate', models.DecimalField(blank=True, decimal_places=4, help_text='Received value / ordered value on received orders', max_digits=5, null=True)),
+                ('price_changes', models.PositiveIntegerField(default=0, help_text='Repeat purchases compared for price drift')),
+                ('price_drift', models.DecimalField(blank=True, decimal_places=4, help_text='Average change vs the previous price of the same item', max_digits=8, null=True)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('supplier', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='performance', to='suppliers.supplier')),
+            ],
+            options={
+                'verbose_name_plural': 'Supplier Performance',
+            },
+        ),
+        migrations.RunPython(compute_performance, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0007_supplier_performance'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(fields=['name'], name='supplier_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(fields=['phone'], name='supplier_phone_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:07
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def recount_purchases(apps, schema_editor):
+    # total_purchases used to include cancelled orders; recount it without them
+    Supplier = apps.get_model('suppliers', 'Supplier')
+    PurchaseOrder = apps.get_model('suppliers', 'PurchaseOrder')
+    totals = dict(
+        PurchaseOrder.objects.exclude(status__in=('DRAFT', 'CANCELLED'))
+        .values('supplier_id').annotate(total=Sum('total_amount')).order_by()
+        .values_list('supplier_id', 'total')
+    )
+    for supplier in Supplier.objects.only('pk', 'total_purchases'):
+        total = totals.get(supplier.pk) or Decimal('0.00')
+        if supplier.total_purchases != total:
+            Supplier.objects.filter(pk=supplier.pk).update(total_purchases=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0008_supplier_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='purchaseorder',
+            name='total_amount',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12),
+        ),
+        migrations.RunPython(recount_purchases, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import DatabaseError, IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
 from decimal import Decimal
 from core.models import TimeStampedModel
 
@@ -41,6 +43,10 @@ class Supplier(TimeStampedModel):
     
     class Meta:
         verbose_name_plural = "Suppliers"
+        indexes = [
+            models.Index(fields=['name'], name='supplier_name_idx'),
+            models.Index(fields=['phone'], name='supplier_phone_idx'),
+        ]
 
 
 class SupplierPayment(TimeStampedModel):
@@ -64,63 +70,210 @@ class SupplierPayment(TimeStampedModel):
     def __str__(self):
         return f"Payment of {self.amount} to {self.supplier.name} on {self.payment_date}"
     
+    @staticmethod
+    def _adjust_paid(supplier_id, delta):
+        if delta:
+            Supplier.objects.filter(pk=supplier_id).update(total_paid=F('total_paid') + delta)
+
+    def _refresh_supplier(self):
+        if SupplierPayment.supplier.is_cached(self):
+            self.supplier.refresh_from_db(fields=['total_paid'])
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Update supplier's total_paid when a payment is saved
-        self.supplier.total_paid = sum(
-            payment.amount for payment in self.supplier.payments.all()
-        )
-        self.supplier.save(update_fields=['total_paid'])
+        # Keep supplier.total_paid in step with an atomic increment instead of
+        # re-summing the supplier's whole payment history.
+        with transaction.atomic():
+            old = None
+            if not self._state.adding and self.pk:
+                old = SupplierPayment.objects.select_for_update().filter(pk=self.pk).values_list('supplier_id', 'amount', 'payment_date').first()
+            super().save(*args, **kwargs)
+            amount = Decimal(self.amount)
+            if old is None:
+                self._adjust_paid(self.supplier_id, amount)
+            elif old[0] != self.supplier_id:
+                self._adjust_paid(old[0], -old[1])
+                self._adjust_paid(self.supplier_id, amount)
+            else:
+                self._adjust_paid(self.supplier_id, amount - old[1])
+            self._reallocate(old)
+        self._refresh_supplier()
     
     def delete(self, *args, **kwargs):
-        supplier = self.supplier
-        super().delete(*args, **kwargs)
-        # Update supplier's total_paid when a payment is deleted
-        supplier.total_paid = sum(
-            payment.amount for payment in supplier.payments.all()
-        )
-        supplier.save(update_fields=['total_paid'])
+        with transaction.atomic():
+            pk = self.pk
+            amount, payment_date = SupplierPayment.objects.select_for_update().filter(pk=pk).values_list('amount', 'payment_date').first() or (None, None)
+            result = super().delete(*args, **kwargs)
+            if amount is not None:
+                self._adjust_paid(self.supplier_id, -amount)
+                from .allocation import reallocate
+
+                reallocate(self.supplier_id, payment_key=(payment_date, pk))
+        self._refresh_supplier()
+        return result
+
+    def _reallocate(self, old):
+        """Re-run FIFO allocation from this payment's (earliest) position."""
+        from .allocation import reallocate
+
+        key = (self.payment_date, self.pk)
+        if old is None:
+            reallocate(self.supplier_id, payment_key=key)
+        elif old[0] != self.supplier_id:
+            reallocate(old[0], payment_key=(old[2], self.pk))
+            reallocate(self.supplier_id, payment_key=key)
+        elif (old[1], old[2]) != (Decimal(self.amount), self.payment_date):
+            reallocate(self.supplier_id, payment_key=min(key, (old[2], self.pk)))
     
     class Meta:
         verbose_name_plural = "Supplier Payments"
         ordering = ['-payment_date']
+        indexes = [
+            models.Index(fields=['supplier', 'payment_date'], name='supplier_payment_date_idx'),
+        ]
 
 
 class PurchaseOrder(TimeStampedModel):
-    """Model for tracking purchase orders from suppliers."""
+    """
+    Model for tracking purchase orders from suppliers.
+
+    MAINTAINED_FIELDS are written only by balances.save_order_lines, the
+    payment allocation and receiving, with UPDATEs. A plain save() of an
+    existing order leaves them out and reloads them afterwards, so a stale
+    in-memory copy is never written back; naming one in update_fields raises.
+    """
     
+    DRAFT = "DRAFT"
     PENDING = "PENDING"
     PARTIAL = "PARTIAL"
     COMPLETED = "COMPLETED"
     CANCELLED = "CANCELLED"
     
     STATUS_CHOICES = [
+        (DRAFT, "Draft"),
         (PENDING, "Pending"),
         (PARTIAL, "Partially Received"),
         (COMPLETED, "Completed"),
         (CANCELLED, "Cancelled"),
     ]
+    # Drafts have not been sent to the supplier and cancelled orders will not be
+    # delivered: neither is owed, aged, priced or counted in total_purchases
+    UNPRICED_STATUSES = (DRAFT, CANCELLED)
+    MAINTAINED_FIELDS = ('total_amount', 'amount_paid', 'first_received_at', 'received_at', 'received_date')
     
     supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name='purchase_orders')
     order_number = models.CharField(max_length=100, unique=True)
     order_date = models.DateField()
     expected_delivery_date = models.DateField(blank=True, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
-    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"), editable=False)
+    amount_paid = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"), editable=False, help_text="Payments allocated to this order (oldest order first)")
     notes = models.TextField(blank=True)
+    # Set by receiving.receive: first goods receipt, and the receipt that completed the order
+    # (with its local calendar date, so lead times are plain date arithmetic in SQL)
+    first_received_at = models.DateTimeField(blank=True, null=True, editable=False)
+    received_at = models.DateTimeField(blank=True, null=True, editable=False)
+    received_date = models.DateField(blank=True, null=True, editable=False)
     
     def __str__(self):
         return f"PO-{self.order_number} - {self.supplier.name}"
+
+    @property
+    def outstanding_amount(self):
+        if self.status in self.UNPRICED_STATUSES:
+            return Decimal("0.00")
+        return max(self.total_amount - self.amount_paid, Decimal("0.00"))
     
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        if not self.order_number:
-            self.order_number = f"PO-{self.pk:06d}"
-            super().save(update_fields=['order_number'])
+        with transaction.atomic():
+            old = None
+            if not self._state.adding and self.pk:
+                old = PurchaseOrder.objects.filter(pk=self.pk).values('supplier_id', 'order_date', 'expected_delivery_date', 'status').first()
+            old_supplier_id = old['supplier_id'] if old else None
+            if old and kwargs.get('update_fields') is None:
+                kwargs['update_fields'] = [
+                    f.name for f in self._meta.concrete_fields if not f.primary_key and f.name not in self.MAINTAINED_FIELDS
+                ]
+            elif old and set(kwargs['update_fields']) & set(self.MAINTAINED_FIELDS):
+                raise ValueError(f"{', '.join(self.MAINTAINED_FIELDS)} are maintained automatically and cannot be saved directly.")
+            super().save(*args, **kwargs)
+            if not self.order_number:
+                self.order_number = f"PO-{self.pk:06d}"
+                super().save(update_fields=['order_number'])
+            # Moving a PO to another supplier moves its total with it; confirming
+            # a draft adds it to the supplier's purchases, cancelling takes it out
+            if old:
+                was_counted = old['status'] not in self.UNPRICED_STATUSES
+                counted = self.status not in self.UNPRICED_STATUSES
+                if (old_supplier_id, was_counted) != (self.supplier_id, counted):
+                    total = PurchaseOrder.objects.filter(pk=self.pk).values_list('total_amount', flat=True).first()
+                    if was_counted:
+                        Supplier.objects.filter(pk=old_supplier_id).update(total_purchases=F('total_purchases') - total)
+                    if counted:
+                        Supplier.objects.filter(pk=self.supplier_id).update(total_purchases=F('total_purchases') + total)
+            # Supplier, date, drafts and cancellation all feed the price history
+            # and the FIFO payment allocation
+            if old and (old_supplier_id, old['order_date'], old['status'] in self.UNPRICED_STATUSES) != (
+                self.supplier_id, self.order_date, self.status in self.UNPRICED_STATUSES
+            ):
+                self._refresh_prices(old_supplier_id)
+                self._reallocate(old_supplier_id, old['order_date'])
+            # ...and dates and status feed the supplier's delivery metrics (line
+            # edits do not: those metrics catch up on the next receipt)
+            if old and (old_supplier_id, old['order_date'], old['expected_delivery_date'], old['status']) != (
+                self.supplier_id, self.order_date, self.expected_delivery_date, self.status
+            ):
+                from .performance import refresh
+
+                refresh(old_supplier_id, self.supplier_id)
+            if old:
+                self.refresh_from_db(fields=list(self.MAINTAINED_FIELDS))
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            pk = self.pk
+            total, status, order_date = PurchaseOrder.objects.select_for_update().filter(pk=pk).values_list('total_amount', 'status', 'order_date').first()
+            item_ids = set(self.items.values_list('inventory_item_id', flat=True))
+            result = super().delete(*args, **kwargs)
+            if total and status not in self.UNPRICED_STATUSES:
+                Supplier.objects.filter(pk=self.supplier_id).update(total_purchases=F('total_purchases') - total)
+            from .allocation import reallocate
+            from .performance import refresh as refresh_performance
+            from .prices import refresh
+
+            refresh(self.supplier_id, item_ids)
+            if total and status not in self.UNPRICED_STATUSES:
+                reallocate(self.supplier_id, po_key=(order_date, pk))
+            if status in (self.PARTIAL, self.COMPLETED):
+                refresh_performance(self.supplier_id)
+        return result
+
+    def _reallocate(self, old_supplier_id, old_order_date):
+        from .allocation import reallocate
+
+        key = (self.order_date, self.pk)
+        old_key = (old_order_date, self.pk)
+        if old_supplier_id != self.supplier_id:
+            reallocate(old_supplier_id, po_key=old_key)
+            reallocate(self.supplier_id, po_key=key)
+        else:
+            reallocate(self.supplier_id, po_key=min(key, old_key))
+
+    def _refresh_prices(self, old_supplier_id):
+        from .prices import refresh
+
+        item_ids = set(PurchaseOrderItem.objects.filter(purchase_order_id=self.pk).values_list('inventory_item_id', flat=True))
+        refresh(self.supplier_id, item_ids)
+        if old_supplier_id != self.supplier_id:
+            refresh(old_supplier_id, item_ids)
     
     class Meta:
         verbose_name_plural = "Purchase Orders"
         ordering = ['-order_date']
+        indexes = [
+            models.Index(fields=['order_date'], name='po_order_date_idx'),
+            models.Index(fields=['supplier', 'order_date'], name='po_supplier_date_idx'),
+            models.Index(fields=['status', 'order_date'], name='po_status_date_idx'),
+        ]
 
 
 class PurchaseOrderItem(models.Model):
@@ -131,25 +284,137 @@ class PurchaseOrderItem(models.Model):
     quantity = models.DecimalField(max_digits=14, decimal_places=4)
     unit_price = models.DecimalField(max_digits=12, decimal_places=4)
     total_price = models.DecimalField(max_digits=12, decimal_places=2)
+    received_quantity = models.DecimalField(max_digits=14, decimal_places=4, default=Decimal("0"))
+
+    # Fields whose changes go through save_order_lines
+    PRICED_FIELDS = {'purchase_order', 'inventory_item', 'quantity', 'unit_price', 'total_price'}
     
     def __str__(self):
         return f"{self.inventory_item.name} - {self.quantity} @ {self.unit_price}"
+
+    @property
+    def outstanding_quantity(self):
+        return max(self.quantity - self.received_quantity, Decimal("0"))
     
-    def save(self, *args, **kwargs):
-        self.total_price = self.quantity * self.unit_price
-        super().save(*args, **kwargs)
-        
-        # Update purchase order total
-        self.purchase_order.total_amount = sum(
-            item.total_price for item in self.purchase_order.items.all()
-        )
-        self.purchase_order.save(update_fields=['total_amount'])
-        
-        # Update supplier's total_purchases
-        self.purchase_order.supplier.total_purchases = sum(
-            po.total_amount for po in self.purchase_order.supplier.purchase_orders.all()
-        )
-        self.purchase_order.supplier.save(update_fields=['total_purchases'])
+    def save(self, *args, force_insert=False, force_update=False, using=None, update_fields=None):
+        # Single-line saves (admin, shell) apply their own delta; the PO form
+        # saves all its lines at once through balances.save_order_lines.
+        from .balances import save_order_lines
+
+        if update_fields is not None and not self.PRICED_FIELDS & set(update_fields):
+            # e.g. received_quantity: no totals change
+            return super().save(*args, force_update=force_update, using=using, update_fields=update_fields)
+        if force_insert or force_update:
+            exists = self.pk is not None and PurchaseOrderItem.objects.filter(pk=self.pk).exists()
+            if force_insert and exists:
+                raise IntegrityError(f"Purchase order line {self.pk} already exists.")
+            if force_update and not exists:
+                raise DatabaseError("Forced update did not affect any rows.")
+        save_order_lines(self.purchase_order, [self])
+
+    def delete(self, using=None, keep_parents=False):
+        from .balances import save_order_lines
+
+        if self.pk is None:
+            raise ValueError(f"{self._meta.object_name} object can't be deleted because its id attribute is set to None.")
+        count = PurchaseOrderItem.objects.filter(pk=self.pk).count()
+        save_order_lines(self.purchase_order, [], deleted=[self])
+        self.pk = None
+        return count, {self._meta.label: count}
+    
+    class Meta:
+        verbose_name_plural = "Purchase Order Items"
+
+class SupplierPriceHistory(models.Model):
+    """Unit price paid for an item per supplier and order date, from non-cancelled PO lines."""
+    
+    inventory_item = models.ForeignKey('inventory.InventoryItem', on_delete=models.CASCADE, related_name='supplier_price_history')
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name='price_history')
+    price_date = models.DateField()
+    unit_price = models.DecimalField(max_digits=12, decimal_places=4, help_text="Quantity-weighted average over the day's lines")
+    min_price = models.DecimalField(max_digits=12, decimal_places=4)
+    quantity = models.DecimalField(max_digits=16, decimal_places=4, default=Decimal("0"))
+    line_count = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.inventory_item_id} @ {self.unit_price} from {self.supplier_id} on {self.price_date}"
+    
+    class Meta:
+        verbose_name_plural = "Supplier Price History"
+        ordering = ['-price_date']
+        unique_together = ('inventory_item', 'supplier', 'price_date')
+
+
+class SupplierItemPrice(models.Model):
+    """Latest and lowest price of an item per supplier, kept in step with SupplierPriceHistory."""
+    
+    inventory_item = models.ForeignKey('inventory.InventoryItem', on_delete=models.CASCADE, related_name='supplier_prices')
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name='item_prices')
+    last_price = models.DecimalField(max_digits=12, decimal_places=4)
+    last_date = models.DateField()
+    lowest_price = models.DecimalField(max_digits=12, decimal_places=4)
+    total_quantity = models.DecimalField(max_digits=16, decimal_places=4, default=Decimal("0"))
+    order_days = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.inventory_item_id} from {self.supplier_id}: {self.last_price}"
+    
+    class Meta:
+        verbose_name_plural = "Supplier Item Prices"
+        unique_together = ('inventory_item', 'supplier')
+        indexes = [
+            models.Index(fields=['inventory_item', 'last_price'], name='supplier_item_best_idx'),
+        ]
+
+
+class PaymentAllocation(models.Model):
+    """Part of a supplier payment applied to one purchase order (maintained by suppliers.allocation)."""
+    
+    payment = models.ForeignKey(SupplierPayment, on_delete=models.CASCADE, related_name='allocations')
+    purchase_order = models.ForeignKey(PurchaseOrder, on_delete=models.CASCADE, related_name='allocations')
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    
+    def __str__(self):
+        return f"{self.amount} of payment {self.payment_id} to {self.purchase_order_id}"
+    
+    class Meta:
+        verbose_name_plural = "Payment Allocations"
+        unique_together = ('payment', 'purchase_order')
+
+
+class SupplierPerformance(models.Model):
+    """Delivery and price metrics of one supplier (maintained by suppliers.performance)."""
+    
+    supplier = models.OneToOneField(Supplier, on_delete=models.CASCADE, related_name='performance')
+    received_orders = models.PositiveIntegerField(default=0, help_text="Orders with at least one goods receipt")
+    completed_orders = models.PositiveIntegerField(default=0, help_text="Fully received orders with a receipt date")
+    avg_lead_days = models.DecimalField(max_digits=8, decimal_places=2, blank=True, null=True)
+    timed_orders = models.PositiveIntegerField(default=0, help_text="Completed orders that had an expected delivery date")
+    on_time_orders = models.PositiveIntegerField(default=0)
+    on_time_rate = models.DecimalField(max_digits=5, decimal_places=4, blank=True, null=True)
+    fill_rate = models.DecimalField(max_digits=5, decimal_places=4, blank=True, null=True, help_text="Received value / ordered value on received orders")
+    price_changes = models.PositiveIntegerField(default=0, help_text="Repeat purchases compared for price drift")
+    price_drift = models.DecimalField(max_digits=8, decimal_places=4, blank=True, null=True, help_text="Average change vs the previous price of the same item")
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"Performance of {self.supplier_id}"
+    
+    @staticmethod
+    def _percent(rate):
+        return None if rate is None else rate * 100
+    
+    @property
+    def on_time_percent(self):
+        return self._percent(self.on_time_rate)
+    
+    @property
+    def fill_percent(self):
+        return self._percent(self.fill_rate)
+    
+    @property
+    def drift_percent(self):
+        return self._percent(self.price_drift)
     
     class Meta:
-        verbose_name_plural = "Purchase Order Items"
\ No newline at end of file
+        verbose_name_plural = "Supplier Performance"
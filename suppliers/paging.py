@@ -0,0 +1,133 @@
+"""
+Keyset (seek) pagination for the supplier and purchase order lists.
+
+Pages are addressed by the sort value and id of the row at their edge rather
+than by an OFFSET, so page 500 costs the same indexed range scan as page 1
+and rows added meanwhile do not shift later pages. Tokens are opaque URL
+parameters (`after` / `before`, optionally prefixed when one page holds
+several lists).
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 25
+
+
+def _encode(values):
+    raw = json.dumps([None if v is None else str(v) for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        value, pk = json.loads(raw)
+        return value, int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+class KeysetPage:
+    def __init__(self, rows, sort, sort_links, next_query=None, prev_query=None, first_query=None):
+        self.rows = rows
+        self.sort = sort
+        self.sort_links = sort_links
+        self.next_query = next_query
+        self.prev_query = prev_query
+        self.first_query = first_query
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def has_other_pages(self):
+        return bool(self.next_query or self.prev_query)
+
+
+def _seek(field, descending, value, pk, forward):
+    """Rows strictly after (forward) or before the (value, pk) edge in the given order."""
+    later = descending == forward  # moving towards smaller values
+    op = "lt" if later else "gt"
+    return Q(**{f"{field}__{op}": value}) | Q(**{field: value, f"pk__{op}": pk})
+
+
+def _fetch(queryset, field, descending, order, reverse_order, after, before, page_size):
+    if before:
+        rows = list(queryset.filter(_seek(field, descending, *before, forward=False)).order_by(*reverse_order)[:page_size + 1])
+        return rows[:page_size][::-1], len(rows) > page_size, True
+    qs = queryset.filter(_seek(field, descending, *after, forward=True)) if after else queryset
+    rows = list(qs.order_by(*order)[:page_size + 1])
+    return rows[:page_size], bool(after), len(rows) > page_size
+
+
+def paginate(request, queryset, sort_fields, default_sort, page_size=DEFAULT_PAGE_SIZE, prefix="", ascending_first=()):
+    """
+    Return a KeysetPage of `queryset` for the request.
+
+    `sort_fields` maps the public sort keys accepted in ?<prefix>sort= (with an
+    optional leading "-" for descending) to non-null model fields or
+    annotations; ties are broken by primary key. Sort links start descending
+    except for the keys in `ascending_first`.
+    """
+    sort = request.GET.get(f"{prefix}sort") or default_sort
+    descending = sort.startswith("-")
+    key = sort.lstrip("-")
+    if key not in sort_fields:
+        sort = default_sort
+        descending = sort.startswith("-")
+        key = sort.lstrip("-")
+    field = sort_fields[key]
+    order = [f"-{field}", "-pk"] if descending else [field, "pk"]
+    reverse_order = [field, "pk"] if descending else [f"-{field}", "-pk"]
+
+    after = _decode(request.GET.get(f"{prefix}after", ""))
+    before = _decode(request.GET.get(f"{prefix}before", "")) if not after else None
+    try:
+        rows, has_prev, has_next = _fetch(queryset, field, descending, order, reverse_order, after, before, page_size)
+    except ValidationError:  # tampered token: start from the first page
+        rows, has_prev, has_next = _fetch(queryset, field, descending, order, reverse_order, None, None, page_size)
+
+    def query(**tokens):
+        params = request.GET.copy()
+        for name in ("after", "before"):
+            params.pop(f"{prefix}{name}", None)
+        for name, token in tokens.items():
+            params[f"{prefix}{name}"] = token
+        return params.urlencode()
+
+    def edge(row):
+        return _encode([_lookup(row, field), row.pk])
+
+    sort_links = {}
+    for name in sort_fields:
+        if name == key:
+            toggled = name if descending else f"-{name}"
+        else:
+            toggled = name if name in ascending_first else f"-{name}"
+        params = request.GET.copy()
+        for token in ("after", "before"):
+            params.pop(f"{prefix}{token}", None)
+        params[f"{prefix}sort"] = toggled
+        sort_links[name] = params.urlencode()
+
+    return KeysetPage(
+        rows,
+        sort,
+        sort_links,
+        next_query=query(after=edge(rows[-1])) if rows and has_next else None,
+        prev_query=query(before=edge(rows[0])) if rows and has_prev else None,
+        first_query=query() if has_prev else None,
+    )
+
+
+def _lookup(row, path):
+    value = row
+    for part in path.split("__"):
+        value = getattr(value, part)
+    return value
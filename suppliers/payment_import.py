@@ -0,0 +1,128 @@
+"""
+Bulk supplier payment import from CSV.
+
+Used by the payment import view and the `import_supplier_payments` command.
+Suppliers are resolved with one query up front; each chunk of valid rows is
+written with one `bulk_create` and one UPDATE that adds the chunk's totals to
+every affected supplier's total_paid, inside its own transaction.
+"""
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from core.csv_import import ImportResult, normalize_key
+from .allocation import reallocate
+from .balances import add_paid
+from .models import Supplier, SupplierPayment
+
+DEFAULT_CHUNK_SIZE = 500
+
+COLUMNS = [
+    'supplier',
+    'amount',
+    'payment_date',
+    'payment_method',
+    'reference_number',
+    'notes',
+]
+
+
+class PaymentImportResult(ImportResult):
+    def __init__(self):
+        super().__init__()
+        self.total = Decimal('0')
+
+
+def _suppliers():
+    """Suppliers keyed by normalised supplier code and name."""
+    lookup = {}
+    for s in Supplier.objects.all():
+        if s.supplier_id:
+            lookup.setdefault(normalize_key(s.supplier_id), s)
+        lookup.setdefault(normalize_key(s.name), s)
+    return lookup
+
+
+def _date(val):
+    d = parse_date(val or '')
+    if d:
+        return d
+    for fmt in ('%m/%d/%Y', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(val, fmt).date()
+        except (TypeError, ValueError):
+            continue
+    raise ValueError(f"payment_date must be a date, got '{val}'.")
+
+
+def build_payment(row, suppliers):
+    """Validate one CSV row and return an unsaved SupplierPayment (raises ValueError)."""
+    supplier = suppliers.get(normalize_key(row.get('supplier')))
+    if not supplier:
+        raise ValueError(f"Unknown supplier '{row.get('supplier', '')}'.")
+    try:
+        amount = Decimal(row.get('amount') or '')
+    except InvalidOperation:
+        raise ValueError(f"amount must be a number, got '{row.get('amount', '')}'.")
+    if amount <= 0:
+        raise ValueError('amount must be greater than zero.')
+
+    methods = {normalize_key(k): k for k, _ in SupplierPayment.PAYMENT_METHODS}
+    methods.update({normalize_key(label): k for k, label in SupplierPayment.PAYMENT_METHODS})
+    method = methods.get(normalize_key(row.get('payment_method') or 'cash'))
+    if not method:
+        raise ValueError(f"Unknown payment method '{row.get('payment_method')}'.")
+
+    return SupplierPayment(
+        supplier=supplier,
+        amount=amount.quantize(Decimal('0.01')),
+        payment_date=_date(row.get('payment_date')),
+        payment_method=method,
+        reference_number=row.get('reference_number', ''),
+        notes=row.get('notes', ''),
+    )
+
+
+def _write_chunk(payments):
+    totals = {}
+    for p in payments:
+        totals[p.supplier_id] = totals.get(p.supplier_id, Decimal('0')) + p.amount
+    first_dates = {}
+    for p in payments:
+        first_dates[p.supplier_id] = min(first_dates.get(p.supplier_id, p.payment_date), p.payment_date)
+    with transaction.atomic():
+        SupplierPayment.objects.bulk_create(payments)
+        add_paid(totals)
+        # bulk-created rows may come back without ids, so reallocate from the
+        # start of each supplier's earliest imported date
+        for supplier_id, day in first_dates.items():
+            reallocate(supplier_id, payment_key=(day, 0))
+
+
+def import_payments(rows, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """
+    Import (line number, row dict) pairs. Invalid rows are reported and skipped;
+    valid rows are written in chunks of `chunk_size`.
+    """
+    result = PaymentImportResult()
+    suppliers = _suppliers()
+
+    pending = []
+    for line, row in rows:
+        try:
+            pending.append(build_payment(row, suppliers))
+        except ValueError as e:
+            result.add_error(line, str(e))
+
+    result.total = sum((p.amount for p in pending), Decimal('0'))
+    if dry_run:
+        result.created = len(pending)
+        return result
+
+    for i in range(0, len(pending), chunk_size):
+        chunk = pending[i:i + chunk_size]
+        _write_chunk(chunk)
+        result.created += len(chunk)
+    return result
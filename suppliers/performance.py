@@ -0,0 +1,153 @@
+"""
+Supplier performance: lead time, on-time rate, fill rate and price drift.
+
+- Lead time: days from order date to the receipt that completed the order.
+- On-time rate: share of completed orders with an expected delivery date that
+  were completed on or before it.
+- Fill rate: received value / ordered value (at PO prices, so mixed units add
+  up) over orders with at least one receipt.
+- Price drift: quantity-weighted average change of each purchase's unit price
+  against the previous purchase of the same item from that supplier, over the
+  last DRIFT_DAYS of price history.
+
+Each metric is one grouped query (the drift one uses LAG over the price
+history); results are stored per supplier in SupplierPerformance. `refresh`
+recomputes only the given suppliers. It runs when goods are received, when a
+purchase order's supplier, dates or status change, and when a received order
+is deleted, but not on line edits, so price drift picks up repriced lines at
+the supplier's next receipt. `rebuild` does everyone.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Avg, Count, DecimalField, DurationField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+
+from .models import PurchaseOrder, PurchaseOrderItem, Supplier, SupplierPerformance, SupplierPriceHistory
+
+DRIFT_DAYS = 365
+RATE = Decimal("0.0001")
+RECEIVED_STATUSES = (PurchaseOrder.PARTIAL, PurchaseOrder.COMPLETED)
+
+_VALUE = DecimalField(max_digits=24, decimal_places=8)
+
+_DRIFT_SQL = """
+WITH h AS (
+    SELECT supplier_id, price_date, quantity, unit_price,
+           LAG(unit_price) OVER (PARTITION BY supplier_id, inventory_item_id ORDER BY price_date) AS prev
+    FROM {history}
+    {where}
+)
+SELECT supplier_id, COUNT(*), SUM(quantity * (unit_price - prev) * 1.0 / prev), SUM(quantity)
+FROM h
+WHERE prev > 0 AND price_date >= %s
+GROUP BY supplier_id
+"""
+
+
+def _rate(part, whole):
+    return (Decimal(part) / Decimal(whole)).quantize(RATE) if whole else None
+
+
+def _order_stats(supplier_ids):
+    done = Q(status=PurchaseOrder.COMPLETED, received_date__isnull=False)
+    timed = done & Q(expected_delivery_date__isnull=False)
+    rows = (
+        PurchaseOrder.objects.filter(supplier_id__in=supplier_ids)
+        .values("supplier_id")
+        .annotate(
+            received=Count("id", filter=Q(status__in=RECEIVED_STATUSES)),
+            completed=Count("id", filter=done),
+            lead=Avg(ExpressionWrapper(F("received_date") - F("order_date"), output_field=DurationField()), filter=done),
+            timed=Count("id", filter=timed),
+            on_time=Count("id", filter=timed & Q(received_date__lte=F("expected_delivery_date"))),
+        )
+        .order_by()
+    )
+    return {r["supplier_id"]: r for r in rows}
+
+
+def _fill_stats(supplier_ids):
+    rows = (
+        PurchaseOrderItem.objects.filter(
+            purchase_order__supplier_id__in=supplier_ids, purchase_order__status__in=RECEIVED_STATUSES,
+        )
+        .values(supplier_id=F("purchase_order__supplier_id"))
+        .annotate(
+            ordered=Sum(F("quantity") * F("unit_price"), output_field=_VALUE),
+            received=Sum(F("received_quantity") * F("unit_price"), output_field=_VALUE),
+        )
+        .order_by()
+    )
+    return {r["supplier_id"]: (r["received"] or 0, r["ordered"] or 0) for r in rows}
+
+
+def _drift_stats(supplier_ids, since):
+    placeholders = ", ".join(["%s"] * len(supplier_ids))
+    sql = _DRIFT_SQL.format(
+        history=SupplierPriceHistory._meta.db_table,
+        where=f"WHERE supplier_id IN ({placeholders})",
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*supplier_ids, since])
+        rows = cursor.fetchall()
+    return {
+        supplier_id: (count, Decimal(str(change)) / Decimal(str(qty)) if qty else None)
+        for supplier_id, count, change, qty in rows
+    }
+
+
+def compute(supplier_ids, today=None):
+    """Unsaved SupplierPerformance rows for `supplier_ids`."""
+    supplier_ids = sorted({i for i in supplier_ids if i})
+    if not supplier_ids:
+        return []
+    today = today or timezone.localdate()
+    orders = _order_stats(supplier_ids)
+    fills = _fill_stats(supplier_ids)
+    drifts = _drift_stats(supplier_ids, today - timedelta(days=DRIFT_DAYS))
+    now = timezone.now()
+
+    rows = []
+    for supplier_id in supplier_ids:
+        o = orders.get(supplier_id, {})
+        received, ordered = fills.get(supplier_id, (0, 0))
+        changes, drift = drifts.get(supplier_id, (0, None))
+        lead = o.get("lead")
+        rows.append(SupplierPerformance(
+            supplier_id=supplier_id,
+            received_orders=o.get("received", 0),
+            completed_orders=o.get("completed", 0),
+            avg_lead_days=Decimal(lead.total_seconds() / 86400).quantize(Decimal("0.01")) if lead is not None else None,
+            timed_orders=o.get("timed", 0),
+            on_time_orders=o.get("on_time", 0),
+            on_time_rate=_rate(o.get("on_time", 0), o.get("timed", 0)),
+            fill_rate=_rate(received, ordered),
+            price_changes=changes,
+            price_drift=drift.quantize(RATE) if drift is not None else None,
+            updated_at=now,
+        ))
+    return rows
+
+
+def refresh(*supplier_ids):
+    """Recompute and store the metrics of the given suppliers."""
+    rows = compute(supplier_ids)
+    if not rows:
+        return
+    with transaction.atomic():
+        SupplierPerformance.objects.filter(supplier_id__in=[r.supplier_id for r in rows]).delete()
+        SupplierPerformance.objects.bulk_create(rows)
+
+
+def rebuild():
+    """Recompute every supplier's metrics. Returns the number of suppliers."""
+    supplier_ids = list(Supplier.objects.values_list("pk", flat=True))
+    rows = []
+    for start in range(0, len(supplier_ids), 500):
+        rows += compute(supplier_ids[start:start + 500])
+    with transaction.atomic():
+        SupplierPerformance.objects.all().delete()
+        SupplierPerformance.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
@@ -0,0 +1,172 @@
+"""
+Procurement planning: net requirements for pending customer orders, turned
+into draft purchase orders.
+
+For every pending order due on or before the horizon date, gross demand is
+recipe quantity x portions for menu lines plus directly ordered stock (see
+inventory.demand.stock_demand).
+Net requirement = gross demand (+ minimum stock when asked) - on hand - still
+to be received on open and draft purchase orders. Each shortfall goes to the
+item's catalog supplier, else the cheapest active supplier in the price index.
+
+`create_drafts` writes one DRAFT purchase order per supplier and all their
+lines with a single bulk_create in one transaction.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Q, Sum
+from django.utils import timezone
+
+from inventory.demand import stock_demand
+from inventory.models import InventoryItem
+from ordersapp.models import Order
+from .models import PurchaseOrder, PurchaseOrderItem, Supplier, SupplierItemPrice
+
+ZERO = Decimal("0")
+QTY = Decimal("0.0001")
+OPEN_STATUSES = (PurchaseOrder.DRAFT, PurchaseOrder.PENDING, PurchaseOrder.PARTIAL)
+
+_QTY = DecimalField(max_digits=20, decimal_places=6)
+
+
+def gross_demand(until):
+    """{item_id: quantity in stock units} needed by pending orders due on or before `until`."""
+    return stock_demand(status=Order.STATUS_PENDING, delivery_date__lte=until)
+
+
+def on_order(item_ids=None):
+    """{item_id: quantity still to be received on draft, pending and partially received POs}."""
+    lines = PurchaseOrderItem.objects.filter(purchase_order__status__in=OPEN_STATUSES)
+    if item_ids is not None:
+        lines = lines.filter(inventory_item_id__in=item_ids)
+    rows = (
+        lines.values("inventory_item_id")
+        .annotate(qty=Sum(F("quantity") - F("received_quantity"), output_field=_QTY))
+        .order_by()
+    )
+    return {r["inventory_item_id"]: max(r["qty"] or ZERO, ZERO) for r in rows}
+
+
+def _suppliers(item_ids):
+    """{item_id: (supplier_id, supplier name, unit price or None)}: catalog supplier, else cheapest."""
+    cheapest = {}
+    for item_id, supplier_id, name, price in (
+        SupplierItemPrice.objects.filter(inventory_item_id__in=item_ids, supplier__is_active=True)
+        .order_by("inventory_item_id", "last_price", "-last_date")
+        .values_list("inventory_item_id", "supplier_id", "supplier__name", "last_price")
+    ):
+        cheapest.setdefault(item_id, (supplier_id, name, price))
+    # the catalog's preferred supplier wins; use its last price when it has one
+    preferred = dict(
+        InventoryItem.objects.filter(id__in=item_ids, base_item__supplier__is_active=True)
+        .values_list("id", "base_item__supplier_id")
+    )
+    preferred_prices = dict(
+        ((item_id, supplier_id), price)
+        for item_id, supplier_id, price in SupplierItemPrice.objects.filter(
+            inventory_item_id__in=preferred.keys(), supplier_id__in=set(preferred.values()),
+        ).values_list("inventory_item_id", "supplier_id", "last_price")
+    )
+    names = dict(Supplier.objects.filter(id__in=set(preferred.values())).values_list("id", "name"))
+    result = dict(cheapest)
+    for item_id, supplier_id in preferred.items():
+        result[item_id] = (supplier_id, names[supplier_id], preferred_prices.get((item_id, supplier_id)))
+    return result
+
+
+def plan(until, safety_stock=False):
+    """
+    Shortfall lines for pending orders due on or before `until`, largest first
+    within each supplier. Each line is a dict with the item, gross demand,
+    on-hand and on-order quantities, shortfall, proposed supplier and price.
+    """
+    demand = gross_demand(until)
+    wanted = Q(id__in=demand.keys())
+    if safety_stock:
+        wanted |= Q(min_quantity__gt=0)
+    items = list(InventoryItem.objects.filter(wanted).values("id", "stock_code", "name", "quantity", "min_quantity", "price_per_unit", unit=F("uom__abbreviation")))
+    incoming = on_order([item["id"] for item in items])
+
+    lines = []
+    for item in items:
+        need = demand.get(item["id"], ZERO) + (Decimal(item["min_quantity"]) if safety_stock else ZERO)
+        on_hand = max(item["quantity"], ZERO)
+        shortfall = (need - on_hand - incoming.get(item["id"], ZERO)).quantize(QTY, rounding=ROUND_HALF_UP)
+        if shortfall > 0:
+            lines.append({
+                "item_id": item["id"],
+                "stock_code": item["stock_code"],
+                "name": item["name"],
+                "uom": item["unit"],
+                "demand": demand.get(item["id"], ZERO).quantize(QTY, rounding=ROUND_HALF_UP),
+                "min_quantity": item["min_quantity"] if safety_stock else 0,
+                "on_hand": on_hand,
+                "on_order": incoming.get(item["id"], ZERO),
+                "shortfall": shortfall,
+                "fallback_price": item["price_per_unit"],
+            })
+
+    sources = _suppliers([line["item_id"] for line in lines])
+    for line in lines:
+        supplier_id, supplier_name, price = sources.get(line["item_id"], (None, "", None))
+        line["supplier_id"] = supplier_id
+        line["supplier_name"] = supplier_name
+        line["unit_price"] = price if price is not None else line["fallback_price"]
+        line["estimated_cost"] = (line["shortfall"] * line["unit_price"]).quantize(Decimal("0.01"))
+    lines.sort(key=lambda l: (l["supplier_id"] is None, l["supplier_name"], -l["estimated_cost"], l["name"]))
+    return lines
+
+
+def group_by_supplier(lines):
+    """[(supplier_id, supplier name, lines, estimated total)] in plan order; unassigned lines last."""
+    groups = {}
+    for line in lines:
+        key = (line["supplier_id"], line["supplier_name"])
+        groups.setdefault(key, []).append(line)
+    return [
+        (supplier_id, name, group, sum((l["estimated_cost"] for l in group), Decimal("0.00")))
+        for (supplier_id, name), group in groups.items()
+    ]
+
+
+def create_drafts(lines, order_date=None, expected_delivery_date=None, note=""):
+    """
+    Create one DRAFT purchase order per supplier for `lines` (dicts with
+    supplier_id, item_id, shortfall and unit_price; lines without a supplier
+    are skipped). Returns the new purchase orders.
+    """
+    order_date = order_date or timezone.localdate()
+    by_supplier = {}
+    for line in lines:
+        if line["supplier_id"] and line["shortfall"] > 0:
+            by_supplier.setdefault(line["supplier_id"], []).append(line)
+    if not by_supplier:
+        return []
+
+    with transaction.atomic():
+        orders = []
+        for supplier_id in by_supplier:
+            po = PurchaseOrder(
+                supplier_id=supplier_id, order_date=order_date, expected_delivery_date=expected_delivery_date,
+                status=PurchaseOrder.DRAFT, notes=note,
+            )
+            po.save()
+            orders.append(po)
+
+        items, totals = [], {}
+        for po in orders:
+            for line in by_supplier[po.supplier_id]:
+                quantity, unit_price = Decimal(line["shortfall"]), Decimal(line["unit_price"])
+                total_price = (quantity * unit_price).quantize(Decimal("0.01"))
+                items.append(PurchaseOrderItem(
+                    purchase_order=po, inventory_item_id=line["item_id"],
+                    quantity=quantity, unit_price=unit_price, total_price=total_price,
+                ))
+                totals[po.pk] = totals.get(po.pk, Decimal("0.00")) + total_price
+        PurchaseOrderItem.objects.bulk_create(items)
+        # Drafts are not owed yet, so only the PO totals move (not total_purchases)
+        for po in orders:
+            po.total_amount = totals[po.pk]
+        PurchaseOrder.objects.bulk_update(orders, ["total_amount"])
+    return orders
@@ -0,0 +1,121 @@
+"""
+Supplier price history and best-price index.
+
+SupplierPriceHistory holds one row per (item, supplier, order date) with the
+quantity-weighted unit price paid that day; SupplierItemPrice holds one row per
+(item, supplier) with the latest and lowest price. Both are derived from
+purchase order lines, leaving out drafts and cancelled orders, and refreshed
+for the affected items whenever a line's item, quantity or price changes
+(balances.save_order_lines, which rewrites only that order date's history
+rows) or a purchase order changes supplier, date or status, or is deleted.
+
+`compare` answers "cheapest supplier for these items" with one query on the
+index, ordered so the first offer per item is the best.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Min, Sum
+
+from .models import PurchaseOrder, PurchaseOrderItem, SupplierItemPrice, SupplierPriceHistory
+
+ZERO = Decimal("0")
+PRICE = Decimal("0.0001")
+_COST = DecimalField(max_digits=24, decimal_places=8)
+
+
+def _history(lines):
+    """SupplierPriceHistory rows (unsaved) grouped from a PurchaseOrderItem queryset."""
+    grouped = (
+        lines.exclude(purchase_order__status__in=PurchaseOrder.UNPRICED_STATUSES)
+        .values('inventory_item_id', supplier_id=F('purchase_order__supplier_id'), day=F('purchase_order__order_date'))
+        .annotate(
+            qty=Sum('quantity'),
+            cost=Sum(F('quantity') * F('unit_price'), output_field=_COST),
+            low=Min('unit_price'),
+            n=Count('id'),
+        )
+        .order_by()
+    )
+    rows = []
+    for r in grouped:
+        qty = r['qty'] or ZERO
+        price = (Decimal(r['cost']) / qty).quantize(PRICE) if qty else r['low']
+        rows.append(SupplierPriceHistory(
+            inventory_item_id=r['inventory_item_id'], supplier_id=r['supplier_id'], price_date=r['day'],
+            unit_price=price, min_price=r['low'], quantity=qty, line_count=r['n'],
+        ))
+    return rows
+
+
+def _index(history):
+    """SupplierItemPrice rows (unsaved) summarising history rows."""
+    index = {}
+    for h in sorted(history, key=lambda h: h.price_date):
+        key = (h.inventory_item_id, h.supplier_id)
+        row = index.get(key)
+        if row is None:
+            row = index[key] = SupplierItemPrice(
+                inventory_item_id=h.inventory_item_id, supplier_id=h.supplier_id,
+                lowest_price=h.unit_price, total_quantity=ZERO, order_days=0,
+            )
+        row.last_price, row.last_date = h.unit_price, h.price_date
+        row.lowest_price = min(row.lowest_price, h.unit_price)
+        row.total_quantity += h.quantity
+        row.order_days += 1
+    return list(index.values())
+
+
+def refresh(supplier_id, item_ids, day=None):
+    """
+    Recompute history and index rows of `item_ids` for one supplier from its
+    PO lines. With `day`, only that order date's history rows are rewritten
+    and the index rows are re-summarised from the stored history.
+    """
+    item_ids = {i for i in item_ids if i}
+    if not supplier_id or not item_ids:
+        return
+    lines = PurchaseOrderItem.objects.filter(purchase_order__supplier_id=supplier_id, inventory_item_id__in=item_ids)
+    stored = SupplierPriceHistory.objects.filter(supplier_id=supplier_id, inventory_item_id__in=item_ids)
+    if day is not None:
+        lines = lines.filter(purchase_order__order_date=day)
+    history = _history(lines)
+    with transaction.atomic():
+        (stored.filter(price_date=day) if day is not None else stored).delete()
+        SupplierPriceHistory.objects.bulk_create(history)
+        if day is not None:
+            history = list(stored)
+        SupplierItemPrice.objects.filter(supplier_id=supplier_id, inventory_item_id__in=item_ids).delete()
+        SupplierItemPrice.objects.bulk_create(_index(history))
+
+
+def rebuild():
+    """Recompute both tables from all purchase order lines. Returns (history rows, index rows)."""
+    history = _history(PurchaseOrderItem.objects.all())
+    index = _index(history)
+    with transaction.atomic():
+        SupplierPriceHistory.objects.all().delete()
+        SupplierItemPrice.objects.all().delete()
+        SupplierPriceHistory.objects.bulk_create(history, batch_size=2000)
+        SupplierItemPrice.objects.bulk_create(index, batch_size=2000)
+    return len(history), len(index)
+
+
+def compare(item_ids, since=None, active_only=True):
+    """
+    {item_id: [offer, ...]} for the items, each list cheapest first (ties go to
+    the most recent price). Offers are dicts of supplier and latest price
+    fields; `since` drops suppliers whose latest price is older than that date.
+    """
+    offers = SupplierItemPrice.objects.filter(inventory_item_id__in=item_ids)
+    if since:
+        offers = offers.filter(last_date__gte=since)
+    if active_only:
+        offers = offers.filter(supplier__is_active=True)
+    result = {}
+    for offer in offers.values(
+        'inventory_item_id', 'supplier_id', 'last_price', 'last_date', 'lowest_price', 'order_days',
+        supplier_name=F('supplier__name'), supplier_code=F('supplier__supplier_id'),
+    ).order_by('inventory_item_id', 'last_price', '-last_date'):
+        result.setdefault(offer['inventory_item_id'], []).append(offer)
+    return result
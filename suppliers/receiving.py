@@ -0,0 +1,94 @@
+"""
+Goods receipt against purchase orders.
+
+`receive` books received quantities for any number of PO lines at once: one
+set-based UPDATE adds them to InventoryItem.quantity, one bulk_create logs the
+IN movements (at the PO unit price, so valuation and the movement cube see
+the purchase cost), location balances are updated in one call and the PO
+status advances to PARTIAL or COMPLETED.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from inventory.locations import apply_deltas
+from inventory.models import InventoryItem, StockMovement
+from . import performance
+from .models import PurchaseOrder, PurchaseOrderItem
+
+ZERO = Decimal("0")
+
+
+def receive(purchase_order, quantities, location=None, note=""):
+    """
+    Receive {line_id: quantity} for `purchase_order`. Quantities may not
+    exceed what is still outstanding on a line. Raises ValueError (nothing is
+    received) on bad input. Returns the IN movements created.
+    """
+    if purchase_order.status == PurchaseOrder.CANCELLED:
+        raise ValueError("A cancelled purchase order cannot be received.")
+    if purchase_order.status == PurchaseOrder.DRAFT:
+        raise ValueError("Confirm the draft purchase order before receiving it.")
+    quantities = {int(line_id): Decimal(qty) for line_id, qty in quantities.items() if qty not in (None, "")}
+    quantities = {line_id: qty for line_id, qty in quantities.items() if qty}
+    if any(qty < 0 for qty in quantities.values()):
+        raise ValueError("Received quantities cannot be negative.")
+    if not quantities:
+        raise ValueError("Enter a received quantity for at least one line.")
+
+    with transaction.atomic():
+        purchase_order = PurchaseOrder.objects.select_for_update().get(pk=purchase_order.pk)
+        lines = list(
+            PurchaseOrderItem.objects.select_for_update().select_related("inventory_item")
+            .filter(purchase_order=purchase_order)
+        )
+        by_id = {line.id: line for line in lines}
+        unknown = quantities.keys() - by_id.keys()
+        if unknown:
+            raise ValueError("Some lines do not belong to this purchase order.")
+        for line_id, qty in quantities.items():
+            line = by_id[line_id]
+            if qty > line.outstanding_quantity:
+                raise ValueError(
+                    f"Only {line.outstanding_quantity.normalize():f} of {line.inventory_item.name} still to receive."
+                )
+
+        per_item = {}
+        for line_id, qty in quantities.items():
+            item_id = by_id[line_id].inventory_item_id
+            per_item[item_id] = per_item.get(item_id, ZERO) + qty
+        InventoryItem.objects.filter(id__in=per_item.keys()).update(
+            quantity=F("quantity") + Case(
+                *[When(id=item_id, then=Value(qty)) for item_id, qty in per_item.items()],
+                output_field=DecimalField(max_digits=14, decimal_places=4),
+            ),
+            updated_at=timezone.now(),
+        )
+        note = note or f"Goods receipt {purchase_order.order_number}"
+        movements = StockMovement.objects.bulk_create([
+            StockMovement(
+                inventory_item_id=by_id[line_id].inventory_item_id,
+                movement_type=StockMovement.IN,
+                quantity=qty,
+                unit_cost=by_id[line_id].unit_price,
+                note=note,
+            )
+            for line_id, qty in quantities.items()
+        ])
+        apply_deltas(per_item, location)
+
+        for line_id, qty in quantities.items():
+            by_id[line_id].received_quantity += qty
+        PurchaseOrderItem.objects.bulk_update([by_id[i] for i in quantities], ["received_quantity"])
+
+        status = PurchaseOrder.COMPLETED if all(not l.outstanding_quantity for l in lines) else PurchaseOrder.PARTIAL
+        now = timezone.now()
+        stamps = {"first_received_at": Coalesce(F("first_received_at"), Value(now))}
+        if status == PurchaseOrder.COMPLETED:
+            stamps.update(received_at=now, received_date=timezone.localdate(now))
+        PurchaseOrder.objects.filter(pk=purchase_order.pk).update(status=status, updated_at=now, **stamps)
+        performance.refresh(purchase_order.supplier_id)
+    return movements
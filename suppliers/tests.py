@@ -1,3 +1,457 @@
-from django.test import TestCase
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection
+from django.test import RequestFactory, TestCase
+
+from inventory.models import InventoryCategory, InventoryItem, StockBalance, StockLocation, StockMovement, UnitOfMeasure
+from . import aging, allocation, balances, paging, performance, prices, receiving
+from .forms import PurchaseOrderItemFormSet
+from .balances import save_order_lines
+from .models import (
+    PaymentAllocation, PurchaseOrder, PurchaseOrderItem, Supplier, SupplierItemPrice, SupplierPayment,
+    SupplierPerformance, SupplierPriceHistory,
+)
+
+D0 = date(2026, 1, 1)
+
+
+class SupplierTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        uom, _ = UnitOfMeasure.objects.get_or_create(name="Piece", defaults={"abbreviation": "pc"})
+        category, _ = InventoryCategory.objects.get_or_create(name="General")
+        cls.item = InventoryItem.objects.create(
+            name="Rice", category=category, uom=uom, quantity=Decimal("0"),
+            price_per_unit=Decimal("1"), total_amount=Decimal("0"), supplier_name="Test",
+        )
+        cls.supplier = Supplier.objects.create(name="Supplier A")
+
+    def order(self, supplier=None, day=0, lines=((1, "10"),), **kwargs):
+        po = PurchaseOrder(supplier=supplier or self.supplier, order_date=D0 + timedelta(days=day), **kwargs)
+        po.save()
+        save_order_lines(po, [
+            PurchaseOrderItem(inventory_item=self.item, quantity=Decimal(qty), unit_price=Decimal(price))
+            for qty, price in lines
+        ])
+        return po
+
+    def pay(self, amount, day=0, supplier=None):
+        return SupplierPayment.objects.create(
+            supplier=supplier or self.supplier, amount=Decimal(amount), payment_date=D0 + timedelta(days=day),
+        )
+
+
+class AllocationTests(SupplierTestCase):
+    def snapshot(self, supplier_ids):
+        return (
+            sorted(PaymentAllocation.objects.filter(purchase_order__supplier_id__in=supplier_ids)
+                   .values_list("payment_id", "purchase_order_id", "amount")),
+            sorted(PurchaseOrder.objects.filter(supplier_id__in=supplier_ids).values_list("pk", "amount_paid")),
+        )
+
+    def assertMatchesRebuild(self, supplier_ids, msg=None):
+        incremental = self.snapshot(supplier_ids)
+        allocation.rebuild(supplier_ids)
+        self.assertEqual(incremental, self.snapshot(supplier_ids), msg)
+
+    def test_fifo_oldest_order_first(self):
+        first = self.order(day=0, lines=((1, "10"),))
+        second = self.order(day=5, lines=((1, "20"),))
+        self.pay("15", day=6)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.amount_paid, Decimal("10.00"))
+        self.assertEqual(second.amount_paid, Decimal("5.00"))
+
+    def test_order_total_dropping_to_zero_clears_its_allocations(self):
+        po = self.order(lines=((1, "10"),))
+        self.pay("4", day=1)
+        po.items.get().delete()
+        po.refresh_from_db()
+        self.assertEqual(po.total_amount, Decimal("0.00"))
+        self.assertEqual(po.amount_paid, Decimal("0.00"))
+        self.assertFalse(PaymentAllocation.objects.filter(purchase_order=po).exists())
+        self.assertMatchesRebuild([self.supplier.pk])
+
+    def test_incremental_matches_rebuild(self):
+        rng = random.Random(7)
+        other = Supplier.objects.create(name="Supplier B")
+        suppliers = [self.supplier, other]
+        ids = [s.pk for s in suppliers]
+        orders, payments = [], []
+        for step in range(120):
+            op = rng.random()
+            supplier = rng.choice(suppliers)
+            day = rng.randint(0, 30)
+            if op < 0.25 or not orders:
+                orders.append(self.order(supplier, day, lines=[(rng.randint(1, 4), rng.randint(1, 20)) for _ in range(rng.randint(1, 3))]))
+                tag = "add order"
+            elif op < 0.45:
+                payments.append(self.pay(rng.randint(5, 60), day, supplier))
+                tag = "add payment"
+            elif op < 0.5 and payments:
+                payment = rng.choice(payments)
+                payment.amount, payment.payment_date = Decimal(rng.randint(1, 60)), D0 + timedelta(days=day)
+                payment.save()
+                tag = "edit payment"
+            elif op < 0.55 and payments:
+                payments.pop(rng.randrange(len(payments))).delete()
+                tag = "delete payment"
+            elif op < 0.62:
+                po = rng.choice(orders)
+                line = po.items.first()
+                if line:
+                    line.quantity = Decimal(rng.randint(0, 5))
+                    line.save()
+                tag = "edit line"
+            elif op < 0.7:
+                po = rng.choice(orders)
+                line = po.items.first()
+                if line:
+                    line.delete()
+                tag = "delete line"
+            elif op < 0.76:
+                po = rng.choice(orders)
+                po.order_date = D0 + timedelta(days=day)
+                po.save()
+                tag = "move date"
+            elif op < 0.82:
+                po = rng.choice(orders)
+                po.status = rng.choice([PurchaseOrder.PENDING, PurchaseOrder.CANCELLED, PurchaseOrder.DRAFT])
+                po.save()
+                tag = "change status"
+            elif op < 0.88:
+                po = rng.choice(orders)
+                po.supplier = rng.choice(suppliers)
+                po.save()
+                tag = "change supplier"
+            else:
+                orders.pop(rng.randrange(len(orders))).delete()
+                tag = "delete order"
+            self.assertMatchesRebuild(ids, f"step {step}: {tag}")
+
+
+class OrderLinesTests(SupplierTestCase):
+    def test_deltas_agree_with_reconcile(self):
+        po = self.order(lines=((2, "10"), (1, "5")))
+        self.assertEqual(po.total_amount, Decimal("25.00"))
+        first, second = po.items.order_by("pk")
+        first.quantity = Decimal("3")
+        added = PurchaseOrderItem(inventory_item=self.item, quantity=Decimal("0.5"), unit_price=Decimal("7"))
+        self.assertEqual(save_order_lines(po, [first, added], deleted=[second]), Decimal("8.50"))
+        self.assertEqual(save_order_lines(po, [first]), Decimal("0"))
+        self.assertEqual(po.total_amount, Decimal("33.50"))
+        draft = self.order(lines=((1, "4"),), status=PurchaseOrder.DRAFT)
+        self.assertEqual(draft.total_amount, Decimal("4.00"))
+        self.supplier.refresh_from_db()
+        self.assertEqual(self.supplier.total_purchases, Decimal("33.50"))
+        self.assertEqual(balances.reconcile(), {"paid": [], "orders": [], "purchases": []})
+
+    def test_reconcile_fixes_drifted_totals(self):
+        po = self.order(lines=((2, "10"),))
+        PurchaseOrder.objects.filter(pk=po.pk).update(total_amount=Decimal("1"))
+        Supplier.objects.filter(pk=self.supplier.pk).update(total_purchases=Decimal("2"))
+        drift = balances.reconcile(fix=True)
+        self.assertEqual([(o.pk, actual) for o, _, actual in drift["orders"]], [(po.pk, Decimal("20.00"))])
+        self.assertEqual([actual for _, _, actual in drift["purchases"]], [Decimal("20.00")])
+        self.assertEqual(balances.reconcile(), {"paid": [], "orders": [], "purchases": []})
+
+
+class OrderLineSaveTests(SupplierTestCase):
+    def test_created_lines_get_ids_without_returning_inserts(self):
+        po = self.order(lines=())
+        with mock.patch.object(type(connection.features), "can_return_rows_from_bulk_insert", False):
+            lines = [PurchaseOrderItem(inventory_item=self.item, quantity=Decimal(q), unit_price=Decimal("2")) for q in ("1", "2")]
+            save_order_lines(po, lines)
+            line = PurchaseOrderItem(purchase_order=po, inventory_item=self.item, quantity=Decimal("3"), unit_price=Decimal("2"))
+            line.save()
+        self.assertEqual([l.pk for l in lines + [line]], list(po.items.order_by("pk").values_list("pk", flat=True)))
+        line.save()
+        self.assertEqual(po.items.count(), 3)
+        self.assertEqual(po.total_amount, Decimal("12.00"))
+
+    def test_save_and_delete_follow_django(self):
+        po = self.order(lines=((2, "10"),))
+        line = po.items.get()
+        line.received_quantity = Decimal("1")
+        line.quantity = Decimal("9")  # not in update_fields: left alone
+        line.save(update_fields=["received_quantity"])
+        line.refresh_from_db()
+        self.assertEqual((line.quantity, line.received_quantity), (Decimal("2"), Decimal("1")))
+        with self.assertRaises(IntegrityError):
+            line.save(force_insert=True)
+        self.assertEqual(line.delete(), (1, {"suppliers.PurchaseOrderItem": 1}))
+        self.assertIsNone(line.pk)
+        po.refresh_from_db()
+        self.assertEqual(po.total_amount, Decimal("0.00"))
+
+
+class PurchaseOrderTotalsTests(SupplierTestCase):
+    def purchases(self):
+        self.supplier.refresh_from_db()
+        return self.supplier.total_purchases
+
+    def test_cancelled_orders_leave_total_purchases(self):
+        po = self.order(lines=((2, "10"),))
+        self.assertEqual(self.purchases(), Decimal("20.00"))
+        po.status = PurchaseOrder.CANCELLED
+        po.save()
+        self.assertEqual(self.purchases(), Decimal("0.00"))
+        line = po.items.get()
+        line.quantity = Decimal("3")
+        line.save()
+        self.assertEqual(self.purchases(), Decimal("0.00"))
+        po.status = PurchaseOrder.PENDING
+        po.save()
+        self.assertEqual(self.purchases(), Decimal("30.00"))
+        po.status = PurchaseOrder.CANCELLED
+        po.save()
+        po.delete()
+        self.assertEqual(self.purchases(), Decimal("0.00"))
+        self.assertEqual(balances.purchases_drift(), [])
+
+    def test_maintained_fields_are_not_written_by_save(self):
+        po = self.order(lines=((1, "10"),))
+        stale = PurchaseOrder.objects.get(pk=po.pk)
+        save_order_lines(po, [PurchaseOrderItem(inventory_item=self.item, quantity=Decimal("1"), unit_price=Decimal("5"))])
+        stale.notes = "checked"
+        stale.save()
+        self.assertEqual(stale.total_amount, Decimal("15.00"))
+        self.assertEqual(PurchaseOrder.objects.get(pk=po.pk).notes, "checked")
+        stale.total_amount = Decimal("1")
+        with self.assertRaises(ValueError):
+            stale.save(update_fields=["total_amount"])
+
+
+class AgingTests(SupplierTestCase):
+    def test_fifo_payments_leave_the_newest_orders_open(self):
+        self.order(day=0, lines=((1, "100"),))    # 120 days old on the report date
+        self.order(day=40, lines=((1, "50"),))    # 80
+        self.order(day=75, lines=((2, "15"),))    # 45
+        self.order(day=110, lines=((1, "20"),))   # 10
+        self.order(day=5, lines=((1, "500"),), status=PurchaseOrder.CANCELLED)
+        self.order(day=6, lines=((1, "500"),), status=PurchaseOrder.DRAFT)
+        self.pay("70", day=10)
+        self.pay("60", day=100)
+        advance = Supplier.objects.create(name="Supplier B")
+        self.order(advance, day=100, lines=((1, "10"),))
+        self.pay("25", day=101, supplier=advance)
+        Supplier.objects.create(name="Supplier C")
+
+        report = aging.compute_aging(today=D0 + timedelta(days=120))
+        rows = {r["name"]: r for r in report["suppliers"]}
+        self.assertEqual(set(rows), {"Supplier A", "Supplier B"})
+        a = rows["Supplier A"]
+        self.assertEqual(
+            [a["over_90"], a["days_61_90"], a["days_31_60"], a["current"], a["outstanding"], a["unapplied"]],
+            [Decimal("0.00"), Decimal("20.00"), Decimal("30.00"), Decimal("20.00"), Decimal("70.00"), Decimal("0.00")],
+        )
+        self.assertEqual((rows["Supplier B"]["outstanding"], rows["Supplier B"]["unapplied"]), (Decimal("0.00"), Decimal("15.00")))
+        self.assertEqual((report["totals"]["outstanding"], report["totals"]["unapplied"]), (Decimal("70.00"), Decimal("15.00")))
+        # The stored FIFO allocation agrees with the report
+        pending = PurchaseOrder.objects.filter(supplier=self.supplier, status=PurchaseOrder.PENDING)
+        self.assertEqual(sum(po.total_amount - po.amount_paid for po in pending), a["outstanding"])
+
+
+class PerformanceTests(SupplierTestCase):
+    def test_receipt_refreshes_metrics(self):
+        po = self.order(day=0, lines=((10, "2"),), expected_delivery_date=D0 + timedelta(days=3))
+        line = po.items.get()
+        receiving.receive(po, {line.pk: Decimal("4")})
+        stored = SupplierPerformance.objects.get(supplier=self.supplier)
+        self.assertEqual(stored.received_orders, 1)
+        self.assertEqual(stored.completed_orders, 0)
+        self.assertEqual(stored.fill_rate, Decimal("0.4000"))
+
+        receiving.receive(po, {line.pk: Decimal("6")})
+        po.refresh_from_db()
+        self.assertEqual(po.status, PurchaseOrder.COMPLETED)
+        self.assertIsNotNone(po.first_received_at)
+        self.assertIsNotNone(po.received_at)
+        stored = SupplierPerformance.objects.get(supplier=self.supplier)
+        self.assertEqual((stored.completed_orders, stored.fill_rate), (1, Decimal("1.0000")))
+        fresh = performance.compute([self.supplier.pk])[0]
+        self.assertEqual(stored.avg_lead_days, fresh.avg_lead_days)
+        self.assertEqual(stored.on_time_rate, fresh.on_time_rate)
+
+    def test_line_edit_does_not_recompute(self):
+        po = self.order(lines=((1, "5"),))
+        line = po.items.get()
+        line.unit_price = Decimal("6")
+        line.save()
+        self.assertFalse(SupplierPerformance.objects.filter(supplier=self.supplier).exists())
+
+
+class ReceivingTests(SupplierTestCase):
+    def test_receipt_books_stock_at_po_price(self):
+        store = StockLocation.objects.create(name="Test Store")
+        po = self.order(lines=((5, "3"), (2, "4")))
+        first, second = po.items.order_by("pk")
+        movements = receiving.receive(po, {first.pk: "5", second.pk: "1"}, location=store)
+        self.assertEqual(sorted((m.quantity, m.unit_cost) for m in movements), [(Decimal("1"), Decimal("4")), (Decimal("5"), Decimal("3"))])
+        self.assertEqual(StockMovement.objects.filter(movement_type=StockMovement.IN).count(), 2)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, Decimal("6"))
+        self.assertEqual(StockBalance.objects.get(location=store, inventory_item=self.item).quantity, Decimal("6"))
+        po.refresh_from_db()
+        self.assertEqual(po.status, PurchaseOrder.PARTIAL)
+
+    def test_bad_receipts_book_nothing(self):
+        po = self.order(lines=((2, "3"),))
+        line = po.items.get()
+        other = self.order(lines=((1, "1"),)).items.get()
+        for quantities in ({line.pk: "3"}, {line.pk: "-1"}, {line.pk: "0"}, {line.pk: "1", other.pk: "1"}):
+            with self.assertRaises(ValueError):
+                receiving.receive(po, quantities)
+        draft = self.order(lines=((1, "1"),), status=PurchaseOrder.DRAFT)
+        with self.assertRaises(ValueError):
+            receiving.receive(draft, {draft.items.get().pk: "1"})
+        self.assertFalse(StockMovement.objects.exists())
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, Decimal("0"))
+        self.assertEqual(PurchaseOrderItem.objects.get(pk=line.pk).received_quantity, Decimal("0"))
+
+
+    def test_non_numeric_location_is_refused(self):
+        self.client.force_login(User.objects.create_user("tester", password="x"))
+        po = self.order(lines=((2, "3"),))
+        line = po.items.get()
+        response = self.client.post(f"/suppliers/purchase-orders/{po.pk}/receive/", {f"recv_{line.pk}": "1", "location": "abc"}, follow=True)
+        self.assertContains(response, "Choose a valid location.")
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_received_lines_cannot_be_deleted(self):
+        po = self.order(lines=((2, "3"), (1, "4")))
+        received, other = po.items.order_by("pk")
+        receiving.receive(po, {received.pk: Decimal("1")})
+
+        def formset(delete):
+            data = {"items-TOTAL_FORMS": "2", "items-INITIAL_FORMS": "2", "items-MIN_NUM_FORMS": "0", "items-MAX_NUM_FORMS": "1000"}
+            for i, line in enumerate([received, other]):
+                data.update({
+                    f"items-{i}-id": line.pk, f"items-{i}-purchase_order": po.pk, f"items-{i}-inventory_item": self.item.pk,
+                    f"items-{i}-quantity": line.quantity, f"items-{i}-unit_price": line.unit_price,
+                })
+                if line == delete:
+                    data[f"items-{i}-DELETE"] = "on"
+            return PurchaseOrderItemFormSet(data, instance=po, prefix="items")
+
+        refused = formset(delete=received)
+        self.assertFalse(refused.is_valid())
+        self.assertIn("already been received", str(refused.non_form_errors()))
+        self.assertTrue(formset(delete=other).is_valid())
+
+
+class PagingTests(SupplierTestCase):
+    sorts = {"name": "name", "status": "is_active", "date": "order_date"}
+
+    def page(self, queryset, query):
+        return paging.paginate(RequestFactory().get(f"/?{query}"), queryset, self.sorts, "name", page_size=2)
+
+    def test_pages_cover_ties_both_ways(self):
+        for i in range(4):
+            Supplier.objects.create(name=f"Supplier {'BCDE'[i]}", is_active=i % 2 == 0)
+        queryset = Supplier.objects.all()
+        expected = list(queryset.order_by("-is_active", "-pk"))
+        pages = [self.page(queryset, "sort=-status")]
+        while pages[-1].next_query:
+            pages.append(self.page(queryset, pages[-1].next_query))
+        self.assertEqual([s for p in pages for s in p], expected)
+        self.assertEqual([len(p) for p in pages], [2, 2, 1])
+        self.assertIsNone(pages[0].prev_query)
+        self.assertIsNone(pages[-1].next_query)
+
+        back = self.page(queryset, pages[-1].prev_query)
+        self.assertEqual(list(back), list(pages[1]))
+        self.assertEqual(list(self.page(queryset, back.prev_query)), list(pages[0]))
+        self.assertEqual(list(self.page(queryset, "sort=bogus")), list(queryset.order_by("name", "pk")[:2]))
+
+    def test_bad_tokens_fall_back_to_first_page(self):
+        self.order(day=0)
+        self.order(day=1)
+        self.order(day=2)
+        queryset = PurchaseOrder.objects.all()
+        first = list(self.page(queryset, "sort=date"))
+        for token in ("!!!", "e30", paging._encode(["not a date", 1]), paging._encode(["2026-01-01"])):
+            self.assertEqual(list(self.page(queryset, f"sort=date&before={token}")), first, token)
+
+    def test_edge_of_last_row_gives_empty_page(self):
+        self.order(day=0)
+        last = self.page(PurchaseOrder.objects.all(), "sort=date")
+        self.assertIsNone(last.next_query)
+        token = paging._encode([last.rows[-1].order_date, last.rows[-1].pk])
+        page = self.page(PurchaseOrder.objects.all(), f"sort=date&after={token}")
+        self.assertEqual((len(page), page.next_query, page.prev_query), (0, None, None))
+
+
+class PriceIndexTests(SupplierTestCase):
+    def snapshot(self):
+        return (
+            sorted(SupplierPriceHistory.objects.values_list("inventory_item_id", "supplier_id", "price_date", "unit_price", "quantity")),
+            sorted(SupplierItemPrice.objects.values_list("inventory_item_id", "supplier_id", "last_price", "lowest_price", "order_days")),
+        )
+
+    def test_line_edits_match_rebuild(self):
+        first = self.order(day=0, lines=((2, "10"), (1, "12")))
+        self.order(day=4, lines=((1, "9"),))
+        line = first.items.first()
+        line.unit_price = Decimal("8")
+        line.save()
+        first.items.last().delete()
+        draft = self.order(day=2, lines=((5, "1"),), status=PurchaseOrder.DRAFT)
+        draft.items.get().delete()
+        incremental = self.snapshot()
+        prices.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+        self.assertEqual(SupplierItemPrice.objects.get().last_price, Decimal("9.0000"))
+
+    def test_unchanged_line_does_not_rewrite_prices(self):
+        po = self.order(lines=((2, "10"),))
+        history_id = SupplierPriceHistory.objects.get().pk
+        line = po.items.get()
+        line.save()
+        self.assertEqual(SupplierPriceHistory.objects.get().pk, history_id)
+
+
+class DateFilterTests(SupplierTestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("tester", password="x"))
+
+    def test_impossible_dates_are_ignored(self):
+        self.order()
+        for url in (f"/suppliers/{self.supplier.pk}/", "/suppliers/purchase-orders/"):
+            response = self.client.get(url, {"start": "2025-02-30", "end": "2025-13-01"})
+            self.assertEqual(response.status_code, 200, url)
+
+    def test_procurement_plan_reports_impossible_dates(self):
+        response = self.client.get("/suppliers/purchase-orders/planning/", {"until": "2025-02-30"})
+        self.assertContains(response, "is not a valid date")
+        response = self.client.post("/suppliers/purchase-orders/planning/", {"expected_delivery_date": "2025-02-30"}, follow=True)
+        self.assertContains(response, "Enter a valid expected delivery date.")
+        self.assertFalse(PurchaseOrder.objects.exists())
+
+
+class PaymentImportTests(SupplierTestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("tester", password="x"))
+
+    def upload(self, content):
+        return self.client.post("/suppliers/payments/import/", {"file": SimpleUploadedFile("payments.csv", content)}, follow=True)
+
+    def test_imports_rows_and_reports_bad_ones(self):
+        self.order(lines=((1, "50"),))
+        response = self.upload(b"supplier,amount,payment_date\nsupplier a,30,2026-01-02\nNobody,5,2026-01-02\n")
+        self.assertContains(response, "1 row(s) were skipped")
+        self.supplier.refresh_from_db()
+        self.assertEqual(self.supplier.total_paid, Decimal("30.00"))
+        self.assertEqual(PurchaseOrder.objects.get().amount_paid, Decimal("30.00"))
+
+    def test_undecodable_file_is_reported(self):
+        response = self.upload(b"supplier,amount\n\xff\xfe,1\n")
+        self.assertContains(response, "Could not read the file")
+        self.assertFalse(SupplierPayment.objects.exists())
@@ -11,11 +11,20 @@ urlpatterns = [
     path('<int:supplier_id>/edit/', views.supplier_edit, name='supplier_edit'),
     path('<int:supplier_id>/delete/', views.supplier_delete, name='supplier_delete'),
     path('<int:supplier_id>/payment/', views.payment_create, name='payment_create'),
+    path('payments/import/', views.payment_import, name='payment_import'),
+    path('aging/', views.payables_aging, name='payables_aging'),
+    path('performance/', views.supplier_performance, name='supplier_performance'),
+    path('prices/', views.price_comparison, name='price_comparison'),
+    path('prices/item/<int:item_id>/', views.item_price_history, name='item_price_history'),
     
     # Purchase Order URLs
     path('purchase-orders/', views.purchase_order_list, name='purchase_order_list'),
     path('purchase-orders/create/', views.purchase_order_create, name='purchase_order_create'),
     path('purchase-orders/<int:po_id>/', views.purchase_order_detail, name='purchase_order_detail'),
+    path('purchase-orders/<int:po_id>/edit/', views.purchase_order_edit, name='purchase_order_edit'),
+    path('purchase-orders/<int:po_id>/receive/', views.purchase_order_receive, name='purchase_order_receive'),
+    path('purchase-orders/<int:po_id>/confirm/', views.purchase_order_confirm, name='purchase_order_confirm'),
+    path('purchase-orders/planning/', views.procurement_plan, name='procurement_plan'),
 ]
 
 
@@ -1,22 +1,114 @@
+import csv
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
-from django.db.models import Sum
-from .models import Supplier, SupplierPayment, PurchaseOrder, PurchaseOrderItem
-from .forms import SupplierForm, SupplierPaymentForm, PurchaseOrderForm
-from inventory.models import InventoryItem
+from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .models import Supplier, SupplierPayment, PurchaseOrder, PurchaseOrderItem, SupplierItemPrice, SupplierPerformance
+from .forms import SupplierForm, SupplierPaymentForm, PurchaseOrderForm, PurchaseOrderItemFormSet
+from .balances import save_order_lines
+from . import aging, allocation, performance, planning, prices, receiving
+from .paging import paginate
+from .payment_import import COLUMNS as PAYMENT_IMPORT_COLUMNS, import_payments
+from core.csv_import import READ_ERRORS, read_csv
+from inventory.models import InventoryCategory, InventoryItem, StockLocation
+from inventory.units import ConversionError
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+PAGE_SIZE_DETAIL = 20
+PLAN_HORIZON_DAYS = 14
+
+
+SUPPLIER_SORTS = {
+    'name': 'name',
+    'balance': 'balance',
+    'purchases': 'total_purchases',
+    'paid': 'total_paid',
+    'created': 'created_at',
+    'status': 'is_active',
+}
+PURCHASE_ORDER_SORTS = {
+    'date': 'order_date',
+    'number': 'order_number',
+    'supplier': 'supplier__name',
+    'status': 'status',
+    'total': 'total_amount',
+    'paid': 'amount_paid',
+}
+PAYMENT_SORTS = {
+    'date': 'payment_date',
+    'amount': 'amount',
+}
+PRICE_HISTORY_SORTS = {
+    'date': 'price_date',
+    'price': 'unit_price',
+}
+OPEN_PO_STATUSES = [PurchaseOrder.PENDING, PurchaseOrder.PARTIAL]
+
+
+def _parse_date(value):
+    """ISO date or None, also for well-formed but impossible dates such as 2025-02-30."""
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+def _date_range(request):
+    start = _parse_date(request.GET.get('start'))
+    end = _parse_date(request.GET.get('end'))
+    return start, end
 
 
 def supplier_list(request):
-    """Display list of all suppliers"""
-    suppliers = Supplier.objects.all().order_by('name')
-    return render(request, 'suppliers/supplier_list.html', {'suppliers': suppliers})
+    """Display suppliers, sortable by balance, totals, date added or status, one keyset page at a time"""
+    query = (request.GET.get('q') or '').strip()
+    active = request.GET.get('active', '')
+    suppliers = Supplier.objects.annotate(
+        balance=ExpressionWrapper(F('total_purchases') - F('total_paid'), output_field=MONEY),
+        open_orders=Count('purchase_orders', filter=Q(purchase_orders__status__in=OPEN_PO_STATUSES)),
+    )
+    if query:
+        suppliers = suppliers.filter(
+            Q(name__icontains=query) | Q(supplier_id__icontains=query) | Q(phone__icontains=query) | Q(contact_person__icontains=query)
+        )
+    if active in ('1', '0'):
+        suppliers = suppliers.filter(is_active=active == '1')
+
+    page = paginate(request, suppliers, SUPPLIER_SORTS, 'name', ascending_first=('name',))
+    return render(request, 'suppliers/supplier_list.html', {
+        'suppliers': page,
+        'page': page,
+        'query': query,
+        'active': active,
+    })
 
 
 def supplier_detail(request, supplier_id):
-    """Display detailed view of a supplier with payments and purchase orders"""
+    """Display a supplier with payments and purchase orders, date-filtered and paged"""
     supplier = get_object_or_404(Supplier, id=supplier_id)
-    payments = supplier.payments.all().order_by('-payment_date')
-    purchase_orders = supplier.purchase_orders.all().order_by('-order_date')
+    start, end = _date_range(request)
+
+    payments = supplier.payments.all()
+    purchase_orders = supplier.purchase_orders.annotate(line_count=Count('items'))
+    if start:
+        payments = payments.filter(payment_date__gte=start)
+        purchase_orders = purchase_orders.filter(order_date__gte=start)
+    if end:
+        payments = payments.filter(payment_date__lte=end)
+        purchase_orders = purchase_orders.filter(order_date__lte=end)
+
+    range_totals = None
+    if start or end:
+        range_totals = {
+            'paid': payments.aggregate(total=Sum('amount'))['total'] or Decimal('0'),
+            'ordered': purchase_orders.exclude(status__in=PurchaseOrder.UNPRICED_STATUSES).aggregate(total=Sum('total_amount'))['total'] or Decimal('0'),
+        }
     
     # Calculate summary statistics
     total_purchases = supplier.total_purchases
@@ -25,11 +117,23 @@ def supplier_detail(request, supplier_id):
     
     context = {
         'supplier': supplier,
-        'payments': payments,
-        'purchase_orders': purchase_orders,
+        'payments': paginate(request, payments, PAYMENT_SORTS, '-date', page_size=PAGE_SIZE_DETAIL, prefix='pay_'),
+        'purchase_orders': paginate(request, purchase_orders, PURCHASE_ORDER_SORTS, '-date', page_size=PAGE_SIZE_DETAIL, prefix='po_'),
+        'start': start,
+        'end': end,
+        'range_totals': range_totals,
         'total_purchases': total_purchases,
         'total_paid': total_paid,
         'balance_due': balance_due,
+        'aging': aging.supplier_aging(supplier.id),
+        'performance': SupplierPerformance.objects.filter(supplier=supplier).first(),
+        'stock': supplier.stock_items.aggregate(
+            items=Count('id'),
+            value=Sum(F('quantity') * F('price_per_unit'), output_field=DecimalField(max_digits=20, decimal_places=2)),
+            bought=Sum('total_amount'),
+            unpaid=Sum(F('total_amount') - F('paid_amount'), output_field=MONEY),
+        ),
+        'aging_buckets': aging.BUCKETS,
     }
     return render(request, 'suppliers/supplier_detail.html', context)
 
@@ -93,42 +197,396 @@ def payment_create(request, supplier_id):
     })
 
 
+def payables_aging(request):
+    """Amounts owed to each supplier, aged by purchase order date (payments applied oldest PO first)"""
+    data = aging.get_aging()
+
+    if request.GET.get('download') == 'csv':
+        resp = HttpResponse(content_type='text/csv')
+        resp['Content-Disposition'] = f'attachment; filename="payables_aging_{data["as_of"]:%Y-%m-%d}.csv"'
+        writer = csv.writer(resp)
+        writer.writerow(['Supplier ID', 'Supplier'] + [label for _, label in aging.BUCKETS] + ['Outstanding', 'Unapplied Payments'])
+        for row in data['suppliers']:
+            writer.writerow(
+                [row['supplier_id'], row['name']] + [row[key] for key, _ in aging.BUCKETS] + [row['outstanding'], row['unapplied']]
+            )
+        return resp
+
+    return render(request, 'suppliers/payables_aging.html', data)
+
+
+# Ranking orders: best supplier first (short lead times, low price drift)
+PERFORMANCE_SORTS = {
+    'on_time': F('on_time_rate').desc(nulls_last=True),
+    'fill': F('fill_rate').desc(nulls_last=True),
+    'lead': F('avg_lead_days').asc(nulls_last=True),
+    'drift': F('price_drift').asc(nulls_last=True),
+    'orders': F('received_orders').desc(),
+}
+
+
+def supplier_performance(request):
+    """Rank active suppliers by lead time, on-time rate, fill rate or price drift (stored metrics)"""
+    sort = request.GET.get('sort', 'on_time')
+    if sort not in PERFORMANCE_SORTS:
+        sort = 'on_time'
+    rows = (
+        SupplierPerformance.objects.select_related('supplier')
+        .filter(supplier__is_active=True)
+        .filter(Q(received_orders__gt=0) | Q(price_changes__gt=0))
+        .order_by(PERFORMANCE_SORTS[sort], 'supplier__name')
+    )
+
+    if request.GET.get('download') == 'csv':
+        resp = HttpResponse(content_type='text/csv')
+        resp['Content-Disposition'] = f'attachment; filename="supplier_performance_{timezone.localdate():%Y-%m-%d}.csv"'
+        writer = csv.writer(resp)
+        writer.writerow([
+            'Supplier ID', 'Supplier', 'Received Orders', 'Completed Orders', 'Avg Lead Days',
+            'On-time Rate', 'Fill Rate', 'Price Drift', 'Price Changes',
+        ])
+        for row in rows:
+            writer.writerow([
+                row.supplier.supplier_id, row.supplier.name, row.received_orders, row.completed_orders,
+                row.avg_lead_days if row.avg_lead_days is not None else '',
+                row.on_time_rate if row.on_time_rate is not None else '',
+                row.fill_rate if row.fill_rate is not None else '',
+                row.price_drift if row.price_drift is not None else '',
+                row.price_changes,
+            ])
+        return resp
+
+    return render(request, 'suppliers/supplier_performance.html', {
+        'rows': rows,
+        'sort': sort,
+        'drift_days': performance.DRIFT_DAYS,
+    })
+
+
+def price_comparison(request):
+    """Cheapest active supplier for the selected items, read from the price index in one query"""
+    item_ids = [int(i) for i in request.GET.getlist('items') if i.isdigit()]
+    category_id = request.GET.get('category', '')
+    max_age = request.GET.get('max_age', '')
+
+    items = InventoryItem.objects.none()
+    if item_ids:
+        items = InventoryItem.objects.filter(id__in=item_ids)
+    elif category_id.isdigit():
+        items = InventoryItem.objects.filter(category_id=category_id, supplier_prices__isnull=False).distinct()
+    items = list(items.select_related('uom').order_by('name'))
+    since = timezone.localdate() - timedelta(days=int(max_age)) if max_age.isdigit() else None
+
+    offers = prices.compare([item.id for item in items], since=since) if items else {}
+    rows = []
+    for item in items:
+        item_offers = offers.get(item.id, [])
+        best = item_offers[0] if item_offers else None
+        runner_up = item_offers[1] if len(item_offers) > 1 else None
+        rows.append({
+            'item': item,
+            'best': best,
+            'runner_up': runner_up,
+            'saving': runner_up['last_price'] - best['last_price'] if runner_up else None,
+            'offers': item_offers,
+        })
+
+    if rows and request.GET.get('download') == 'csv':
+        resp = HttpResponse(content_type='text/csv')
+        resp['Content-Disposition'] = 'attachment; filename="supplier_price_comparison.csv"'
+        writer = csv.writer(resp)
+        writer.writerow(['Stock Code', 'Item', 'Best Supplier', 'Best Price', 'Price Date', 'Next Supplier', 'Next Price', 'Suppliers'])
+        for row in rows:
+            best, runner_up = row['best'] or {}, row['runner_up'] or {}
+            writer.writerow([
+                row['item'].stock_code, row['item'].name,
+                best.get('supplier_name', ''), best.get('last_price', ''), best.get('last_date', ''),
+                runner_up.get('supplier_name', ''), runner_up.get('last_price', ''), len(row['offers']),
+            ])
+        return resp
+
+    return render(request, 'suppliers/price_comparison.html', {
+        'rows': rows,
+        'selected_items': item_ids,
+        'item_choices': InventoryItem.objects.filter(supplier_prices__isnull=False).distinct().order_by('name').values_list('id', 'name', 'stock_code'),
+        'categories': InventoryCategory.objects.order_by('name').values_list('id', 'name'),
+        'category': category_id,
+        'max_age': max_age,
+        'priced_count': sum(1 for row in rows if row['best']),
+    })
+
+
+def item_price_history(request, item_id):
+    """Prices paid for one inventory item, per supplier over time"""
+    item = get_object_or_404(InventoryItem.objects.select_related('uom'), id=item_id)
+    supplier_id = request.GET.get('supplier', '')
+    history = item.supplier_price_history.select_related('supplier')
+    if supplier_id.isdigit():
+        history = history.filter(supplier_id=supplier_id)
+
+    return render(request, 'suppliers/item_price_history.html', {
+        'item': item,
+        'offers': prices.compare([item.id], active_only=False).get(item.id, []),
+        'history': paginate(request, history, PRICE_HISTORY_SORTS, '-date', ascending_first=('price',)),
+        'supplier_filter': supplier_id,
+    })
+
+
+def payment_import(request):
+    """Bulk supplier payment import from an uploaded CSV file"""
+    result = None
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, 'Please choose a CSV file to upload.')
+        else:
+            try:
+                result = import_payments(
+                    read_csv(upload),
+                    dry_run=bool(request.POST.get('dry_run')),
+                )
+                if result.created:
+                    verb = 'Validated' if request.POST.get('dry_run') else 'Imported'
+                    messages.success(request, f'{verb} {result.created} payment(s) totalling {result.total}.')
+                if result.errors:
+                    messages.error(request, f'{len(result.errors)} row(s) were skipped.')
+            except READ_ERRORS as e:
+                messages.error(request, f'Could not read the file as UTF-8 CSV: {e}')
+
+    return render(request, 'suppliers/payment_import.html', {
+        'result': result,
+        'columns': PAYMENT_IMPORT_COLUMNS,
+    })
+
+
 def purchase_order_list(request):
-    """Display list of all purchase orders"""
-    purchase_orders = PurchaseOrder.objects.all().order_by('-order_date')
+    """Display purchase orders with their suppliers, filtered, sorted and keyset-paged"""
+    status = request.GET.get('status', '')
+    supplier_id = request.GET.get('supplier', '')
+    query = (request.GET.get('q') or '').strip()
+    start, end = _date_range(request)
+
+    purchase_orders = PurchaseOrder.objects.select_related('supplier').annotate(line_count=Count('items'))
+    if status in dict(PurchaseOrder.STATUS_CHOICES):
+        purchase_orders = purchase_orders.filter(status=status)
+    if supplier_id.isdigit():
+        purchase_orders = purchase_orders.filter(supplier_id=supplier_id)
+    if query:
+        purchase_orders = purchase_orders.filter(Q(order_number__icontains=query) | Q(supplier__name__icontains=query))
+    if start:
+        purchase_orders = purchase_orders.filter(order_date__gte=start)
+    if end:
+        purchase_orders = purchase_orders.filter(order_date__lte=end)
+
+    page = paginate(request, purchase_orders, PURCHASE_ORDER_SORTS, '-date', ascending_first=('supplier', 'number'))
     return render(request, 'suppliers/purchase_order_list.html', {
-        'purchase_orders': purchase_orders
+        'purchase_orders': page,
+        'page': page,
+        'status': status,
+        'status_choices': PurchaseOrder.STATUS_CHOICES,
+        'supplier_filter': supplier_id,
+        'suppliers': Supplier.objects.order_by('name').values_list('id', 'name'),
+        'query': query,
+        'start': start,
+        'end': end,
     })
 
 
 def purchase_order_detail(request, po_id):
     """Display detailed view of a purchase order"""
     purchase_order = get_object_or_404(PurchaseOrder, id=po_id)
-    items = purchase_order.items.all()
+    items = purchase_order.items.select_related('inventory_item', 'inventory_item__uom')
+    can_receive = purchase_order.status not in PurchaseOrder.UNPRICED_STATUSES and any(i.outstanding_quantity for i in items)
     
     return render(request, 'suppliers/purchase_order_detail.html', {
         'purchase_order': purchase_order,
-        'items': items
+        'items': items,
+        'can_receive': can_receive,
+        'locations': StockLocation.objects.filter(is_active=True).order_by('-is_default', 'name') if can_receive else [],
+        'allocations': allocation.allocations_for(purchase_order),
+    })
+
+
+def purchase_order_receive(request, po_id):
+    """Receive goods for any number of PO lines in one post"""
+    purchase_order = get_object_or_404(PurchaseOrder, id=po_id)
+    if request.method != 'POST':
+        return redirect('suppliers:purchase_order_detail', po_id=po_id)
+
+    quantities = {}
+    try:
+        for key, val in request.POST.items():
+            if key.startswith('recv_') and val.strip():
+                quantities[int(key[len('recv_'):])] = Decimal(val)
+    except (ValueError, InvalidOperation):
+        messages.error(request, 'Received quantities must be numbers.')
+        return redirect('suppliers:purchase_order_detail', po_id=po_id)
+
+    location = None
+    if request.POST.get('location'):
+        if not request.POST['location'].isdigit():
+            messages.error(request, 'Choose a valid location.')
+            return redirect('suppliers:purchase_order_detail', po_id=po_id)
+        location = StockLocation.objects.filter(pk=request.POST['location'], is_active=True).first()
+
+    try:
+        movements = receiving.receive(purchase_order, quantities, location=location, note=request.POST.get('note', '').strip())
+    except ValueError as e:
+        messages.error(request, str(e))
+    else:
+        purchase_order.refresh_from_db(fields=['status'])
+        messages.success(
+            request,
+            f'Received {len(movements)} line(s) into stock. {purchase_order.order_number} is now {purchase_order.get_status_display().lower()}.',
+        )
+    return redirect('suppliers:purchase_order_detail', po_id=po_id)
+
+
+def purchase_order_confirm(request, po_id):
+    """Confirm a draft purchase order: it becomes pending and counts towards the supplier's purchases"""
+    purchase_order = get_object_or_404(PurchaseOrder, id=po_id)
+    if request.method == 'POST':
+        if purchase_order.status != PurchaseOrder.DRAFT:
+            messages.info(request, f'{purchase_order.order_number} is not a draft.')
+        elif not purchase_order.items.exists():
+            messages.error(request, 'Add at least one line before confirming the purchase order.')
+        else:
+            purchase_order.status = PurchaseOrder.PENDING
+            purchase_order.save()
+            messages.success(request, f'{purchase_order.order_number} confirmed.')
+    return redirect('suppliers:purchase_order_detail', po_id=po_id)
+
+
+def procurement_plan(request):
+    """Net requirements for pending orders, grouped by supplier, and draft POs created from them"""
+    today = timezone.localdate()
+    params = request.POST if request.method == 'POST' else request.GET
+    until = _parse_date(params.get('until'))
+    if params.get('until') and not until:
+        messages.error(request, f"'{params['until']}' is not a valid date; showing the next {PLAN_HORIZON_DAYS} days.")
+    until = until or today + timedelta(days=PLAN_HORIZON_DAYS)
+    safety_stock = params.get('safety') == '1'
+
+    try:
+        lines = planning.plan(until, safety_stock=safety_stock)
+    except ConversionError as e:
+        messages.error(request, f'Could not work out requirements: {e}')
+        lines = []
+
+    if request.method == 'POST':
+        plan_url = f"{request.path}?until={until:%Y-%m-%d}{'&safety=1' if safety_stock else ''}"
+        chosen = []
+        overrides = {}
+        try:
+            for line in lines:
+                item_id = line['item_id']
+                if not request.POST.get(f'include_{item_id}'):
+                    continue
+                quantity = Decimal(request.POST.get(f'qty_{item_id}') or line['shortfall'])
+                supplier_id = request.POST.get(f'supplier_{item_id}', '')
+                if quantity <= 0:
+                    continue
+                line = dict(line, shortfall=quantity)
+                if supplier_id.isdigit() and int(supplier_id) != line['supplier_id']:
+                    line['supplier_id'] = int(supplier_id)
+                    overrides[(item_id, int(supplier_id))] = line
+                chosen.append(line)
+        except InvalidOperation:
+            messages.error(request, 'Quantities must be numbers.')
+            return redirect(plan_url)
+        expected = _parse_date(request.POST.get('expected_delivery_date'))
+        if request.POST.get('expected_delivery_date') and not expected:
+            messages.error(request, 'Enter a valid expected delivery date.')
+            return redirect(plan_url)
+        # A supplier picked by hand is priced at what we last paid that supplier
+        if overrides:
+            known = {
+                (item_id, supplier_id): price
+                for item_id, supplier_id, price in SupplierItemPrice.objects.filter(
+                    inventory_item_id__in={i for i, _ in overrides}, supplier_id__in={s for _, s in overrides},
+                ).values_list('inventory_item_id', 'supplier_id', 'last_price')
+            }
+            for key, line in overrides.items():
+                line['unit_price'] = known.get(key, line['fallback_price'])
+
+        orders = planning.create_drafts(
+            chosen,
+            order_date=today,
+            expected_delivery_date=expected,
+            note=f'Planned for pending orders due by {until:%Y-%m-%d}',
+        )
+        skipped = sum(1 for line in chosen if not line['supplier_id'])
+        if orders:
+            messages.success(request, f'Created {len(orders)} draft purchase order(s): ' + ', '.join(po.order_number for po in orders) + '.')
+        else:
+            messages.warning(request, 'No draft purchase orders were created. Select lines that have a supplier.')
+        if skipped:
+            messages.warning(request, f'{skipped} selected line(s) had no supplier and were skipped.')
+        return redirect(plan_url)
+
+    return render(request, 'suppliers/procurement_plan.html', {
+        'until': until,
+        'safety_stock': safety_stock,
+        'groups': planning.group_by_supplier(lines),
+        'line_count': len(lines),
+        'estimated_total': sum((line['estimated_cost'] for line in lines), Decimal('0.00')),
+        'suppliers': Supplier.objects.filter(is_active=True).order_by('name').values_list('id', 'name'),
+        'drafts': PurchaseOrder.objects.filter(status=PurchaseOrder.DRAFT).select_related('supplier').order_by('-created_at')[:20],
     })
 
 
+def _save_purchase_order(form, formset):
+    """Save the PO header, then all of its lines in one batch with a single total update."""
+    with transaction.atomic():
+        purchase_order = form.save()
+        formset.instance = purchase_order
+        lines = formset.save(commit=False)
+        save_order_lines(purchase_order, lines, deleted=formset.deleted_objects)
+    return purchase_order
+
+
 def purchase_order_create(request):
-    """Create a new purchase order"""
+    """Create a new purchase order with its lines"""
     if request.method == 'POST':
         form = PurchaseOrderForm(request.POST)
-        if form.is_valid():
-            purchase_order = form.save()
+        formset = PurchaseOrderItemFormSet(request.POST, prefix='items')
+        if form.is_valid() and formset.is_valid():
+            purchase_order = _save_purchase_order(form, formset)
             messages.success(request, f'Purchase Order {purchase_order.order_number} created successfully!')
             return redirect('suppliers:purchase_order_detail', po_id=purchase_order.id)
     else:
-        form = PurchaseOrderForm()
+        form = PurchaseOrderForm(initial={'supplier': request.GET.get('supplier')})
+        formset = PurchaseOrderItemFormSet(prefix='items')
     
     return render(request, 'suppliers/purchase_order_form.html', {
         'form': form,
+        'formset': formset,
         'title': 'Create New Purchase Order'
     })
 
 
+def purchase_order_edit(request, po_id):
+    """Edit a purchase order and its lines"""
+    purchase_order = get_object_or_404(PurchaseOrder, id=po_id)
+    if request.method == 'POST':
+        form = PurchaseOrderForm(request.POST, instance=purchase_order)
+        formset = PurchaseOrderItemFormSet(request.POST, instance=purchase_order, prefix='items')
+        if form.is_valid() and formset.is_valid():
+            _save_purchase_order(form, formset)
+            messages.success(request, f'Purchase Order {purchase_order.order_number} updated successfully!')
+            return redirect('suppliers:purchase_order_detail', po_id=purchase_order.id)
+    else:
+        form = PurchaseOrderForm(instance=purchase_order)
+        formset = PurchaseOrderItemFormSet(instance=purchase_order, prefix='items')
+
+    return render(request, 'suppliers/purchase_order_form.html', {
+        'form': form,
+        'formset': formset,
+        'purchase_order': purchase_order,
+        'title': f'Edit {purchase_order.order_number}'
+    })
+
+
 def supplier_delete(request, supplier_id):
     """Delete a supplier (soft delete by deactivating if referenced)."""
     supplier = get_object_or_404(Supplier, id=supplier_id)